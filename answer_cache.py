@@ -0,0 +1,132 @@
+# answer_cache.py
+# Semantic answer cache — serves repeat questions without touching Endee or the LLM
+# Answers are grouped per (index name, index content version, mode) and matched
+# by cosine similarity of the question embedding against earlier questions
+
+import os
+import time
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.95"))
+ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", "3600"))            # seconds
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "2000"))
+
+
+class _Entry:
+    __slots__ = ("group", "question", "vector", "answer", "created")
+
+    def __init__(self, group, question, vector, answer):
+        self.group = group
+        self.question = question
+        self.vector = vector
+        self.answer = answer
+        self.created = time.monotonic()
+
+
+class AnswerCache:
+    """
+    Thread-safe cache shared by every Streamlit session.
+
+    Entries live in one global LRU (OrderedDict, oldest first) so the cap
+    applies across all indexes; each group keeps its own list of entry ids
+    so lookups only compare against questions asked of the same index version.
+    """
+
+    def __init__(self, threshold: float = ANSWER_CACHE_THRESHOLD,
+                 ttl: float = ANSWER_CACHE_TTL,
+                 max_entries: int = ANSWER_CACHE_MAX_ENTRIES):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[int, _Entry]" = OrderedDict()
+        self._groups: Dict[Tuple, List[int]] = {}
+        self._next_id = 0
+
+    @staticmethod
+    def _unit(vector) -> np.ndarray:
+        v = np.asarray(vector, dtype=np.float32).reshape(-1)
+        return v / max(float(np.linalg.norm(v)), 1e-10)
+
+    def _drop(self, entry_id: int):
+        entry = self._entries.pop(entry_id, None)
+        if entry is not None:
+            ids = self._groups.get(entry.group)
+            if ids is not None:
+                ids.remove(entry_id)
+                if not ids:
+                    del self._groups[entry.group]
+
+    def lookup(self, index_name: str, version, mode: str, question_vector) -> Optional[str]:
+        """Cached answer for the closest earlier question above threshold, else None."""
+        group = (index_name, version, mode)
+        q = self._unit(question_vector)
+        now = time.monotonic()
+
+        with self._lock:
+            ids = list(self._groups.get(group, ()))
+            for entry_id in ids:
+                if now - self._entries[entry_id].created > self.ttl:
+                    self._drop(entry_id)
+            ids = self._groups.get(group, [])
+            if not ids:
+                self.misses += 1
+                return None
+
+            matrix = np.stack([self._entries[i].vector for i in ids])
+            scores = matrix @ q
+            best = int(np.argmax(scores))
+            if scores[best] < self.threshold:
+                self.misses += 1
+                return None
+
+            entry_id = ids[best]
+            self._entries.move_to_end(entry_id)
+            self.hits += 1
+            return self._entries[entry_id].answer
+
+    def store(self, index_name: str, version, mode: str, question: str, question_vector, answer: str):
+        group = (index_name, version, mode)
+        entry = _Entry(group, question, self._unit(question_vector), answer)
+        with self._lock:
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = entry
+            self._groups.setdefault(group, []).append(entry_id)
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+
+    def invalidate(self, index_name: str):
+        """Drop every cached answer for an index (all versions) — called on re-ingest."""
+        with self._lock:
+            for group in [g for g in self._groups if g[0] == index_name]:
+                for entry_id in list(self._groups.get(group, ())):
+                    self._drop(entry_id)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "entries": len(self._entries),
+        }
+
+
+# Process-wide instance — ingestion invalidates it, app.py reads through it
+answer_cache = AnswerCache()
+
+
+def is_cacheable(answer: str) -> bool:
+    """Errors and 'nothing found' replies are never cached."""
+    return bool(answer) and not answer.startswith(("Error", "I couldn't find relevant information"))
@@ -4,14 +4,25 @@
 # Powered by Endee Vector Database + Gemini LLM
 
 import streamlit as st
-import tempfile
 import os
 import time
-from endee_client import create_index, insert_vectors, query_index, list_indexes
-from embedder import get_embeddings, get_single_embedding
-from document_processor import process_document
-from web_researcher import research_topic
-from llm_handler import get_answer, get_summary
+from telemetry import request_context, start_exporters
+from index_manifest import index_name_for
+
+# With DOCUSPHERE_SERVICE_URL set the UI is a thin client of service.py;
+# otherwise retrieval and generation run inside this process
+SERVICE_URL = os.getenv("DOCUSPHERE_SERVICE_URL", "")
+if SERVICE_URL:
+    from service_client import (
+        list_indexes, ingest_document, research, stream_query_and_answer, stream_document_summary
+    )
+else:
+    from endee_client import list_indexes
+    from embedder import warm_up
+    from ingest_pipeline import ingest_document, store_chunks
+    from document_store import document_store
+    from web_researcher import research_topic
+    from query_engine import stream_query_and_answer, stream_document_summary
 
 # ─────────────────────────────────────────────
 # PAGE CONFIG
@@ -23,6 +34,12 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+if not SERVICE_URL:
+    # Start loading the embedding model now; the page renders while it loads
+    warm_up()
+# Prometheus /metrics endpoint and/or metrics file, if configured (once per process)
+start_exporters()
+
 # ─────────────────────────────────────────────
 # CUSTOM CSS
 # ─────────────────────────────────────────────
@@ -92,8 +109,10 @@ if "knowledge_base_ready" not in st.session_state:
 if "current_source" not in st.session_state:
     st.session_state.current_source = None
 
-if "raw_content" not in st.session_state:
-    st.session_state.raw_content = None
+# Key of the active document's text in the shared document store — sessions
+# keep only this, never a copy of the text
+if "doc_id" not in st.session_state:
+    st.session_state.doc_id = None
 
 if "summary" not in st.session_state:
     st.session_state.summary = None
@@ -103,27 +122,38 @@ if "summary" not in st.session_state:
 # HELPER FUNCTIONS
 # ─────────────────────────────────────────────
 def process_and_store(chunks, metadata, index_name):
-    """Embed chunks and store in Endee."""
-    with st.spinner("🔢 Generating embeddings..."):
-        vectors = get_embeddings(chunks)
-
-    with st.spinner("📦 Storing vectors in Endee..."):
-        create_index(index_name, dimension=384)
-        success = insert_vectors(index_name, vectors, metadata)
+    """Embed chunks and store in Endee — only new or changed chunks are embedded."""
+    with st.spinner("🔢 Embedding and storing vectors in Endee..."):
+        success = store_chunks(chunks, metadata, index_name)
 
     return success
 
 
-def query_and_answer(question, index_name, mode):
-    """Embed question, query Endee, get Gemini answer."""
-    question_vector = get_single_embedding(question)
-    context_chunks = query_index(index_name, question_vector, top_k=5)
 
-    if not context_chunks:
-        return "I couldn't find relevant information to answer your question."
+def render_summary_stream():
+    """Stream the summary into the page and keep the final text in session state."""
+    timings = {}
+    with st.spinner("✍️ Generating summary..."), request_context():
+        summary = st.write_stream(stream_document_summary(st.session_state.doc_id, timings))
+    st.session_state.summary = summary
+    if timings.get("total_ms") is not None:
+        st.caption(
+            f"⏱️ {timings['input_chars']:,} chars · {timings['groups']} partial summaries "
+            f"({timings['cache_hits']} cached) in {timings['map_ms'] / 1000:.1f}s · "
+            f"total {timings['total_ms'] / 1000:.1f}s"
+        )
+
 
-    answer = get_answer(question, context_chunks, mode)
-    return answer
+def render_ingest_progress(progress_bar):
+    """Build a progress_callback for ingest_document that drives a st.progress bar."""
+    def callback(counts):
+        total = counts.get("total_pages")
+        label = f"📦 {counts['stored']} chunks stored · {counts['pages']} pages read"
+        if total:
+            progress_bar.progress(min(counts["pages"] / total, 1.0), text=label)
+        else:
+            progress_bar.progress(0.0, text=label)
+    return callback
 
 
 # ─────────────────────────────────────────────
@@ -157,7 +187,7 @@ with st.sidebar:
     def get_indexes():
         return list_indexes()
     try:
-        indexes = list_indexes()
+        indexes = get_indexes()
         st.markdown('<p class="status-success">● Connected</p>', unsafe_allow_html=True)
         if indexes:
             st.markdown(f"**Active Indexes:** {len(indexes)}")
@@ -182,7 +212,7 @@ with st.sidebar:
         st.session_state.knowledge_base_ready = False
         st.session_state.current_index = None
         st.session_state.current_source = None
-        st.session_state.raw_content = None
+        st.session_state.doc_id = None
         st.session_state.chat_history = []
         st.session_state.summary = None    # Add this line
         st.rerun()
@@ -217,44 +247,36 @@ with col1:
 
             with col_a:
                 if st.button("🚀 Process & Store in Endee", use_container_width=True):
-                    # Save file temporarily
-                    with tempfile.NamedTemporaryFile(
-                        delete=False,
-                        suffix=f".{uploaded_file.name.split('.')[-1]}"
-                    ) as tmp:
-                        tmp.write(uploaded_file.read())
-                        tmp_path = tmp.name
-
-                    with st.spinner("📖 Extracting text from document..."):
-                        result = process_document(tmp_path)
+                    index_name = index_name_for(uploaded_file.name)
+                    progress_bar = st.progress(0.0, text="📖 Extracting text from document...")
+                    # The upload's buffer is parsed in place — no copy, no temp file
+                    result = ingest_document(
+                        uploaded_file.getbuffer(),
+                        index_name,
+                        source_name=uploaded_file.name,
+                        progress_callback=render_ingest_progress(progress_bar)
+                    )
+                    progress_bar.empty()
 
                     if result:
-                        index_name = uploaded_file.name.replace(".", "_").replace(" ", "_").lower()
-                        success = process_and_store(
-                            result["chunks"],
-                            result["metadata"],
-                            index_name
-                        )
-
-                        if success:
-                            st.session_state.knowledge_base_ready = True
-                            st.session_state.current_index = index_name
-                            st.session_state.current_mode = "document"
-                            st.session_state.current_source = uploaded_file.name
-                            st.session_state.raw_content = " ".join(result["chunks"])
-                            st.success(f"✅ Knowledge base ready! {len(result['chunks'])} chunks stored in Endee.")
+                        st.session_state.knowledge_base_ready = True
+                        st.session_state.current_index = index_name
+                        st.session_state.current_mode = "document"
+                        st.session_state.current_source = uploaded_file.name
+                        st.session_state.doc_id = result["doc_id"]
+                        if result["unchanged"]:
+                            st.success(f"✅ Document unchanged — reusing {result['chunk_count']} chunks already in Endee.")
                         else:
-                            st.error("❌ Failed to store in Endee. Check if Docker is running.")
+                            st.success(
+                                f"✅ Knowledge base ready! {result['chunk_count']} chunks "
+                                f"({result['upserted']} new or changed) stored in Endee."
+                            )
                     else:
-                        st.error("❌ Could not extract text from document.")
-
-                    os.unlink(tmp_path)
+                        st.error("❌ Could not process document. Check the file and that Docker is running.")
 
             with col_b:
-                if st.session_state.raw_content and st.button("📝 Summarize Document", use_container_width=True):
-                    with st.spinner("✍️ Generating summary..."):
-                        summary = get_summary(st.session_state.raw_content)
-                    st.session_state.summary = summary
+                if st.session_state.doc_id and st.button("📝 Summarize Document", use_container_width=True):
+                    render_summary_stream()
 
 
     # ── RESEARCH MODE ──
@@ -274,34 +296,46 @@ with col1:
                 if not topic.strip():
                     st.warning("Please enter a topic first.")
                 else:
-                    with st.spinner(f"🔍 Researching '{topic}'..."):
-                        result = research_topic(topic)
-
-                    if result:
-                        index_name = topic.strip().replace(" ", "_").lower()[:30]
-                        success = process_and_store(
-                            result["chunks"],
-                            result["metadata"],
-                            index_name
-                        )
-
-                        if success:
+                    index_name = index_name_for(topic, max_length=30)
+                    if SERVICE_URL:
+                        with request_context(), st.spinner(f"🔍 Researching '{topic}'..."):
+                            result = research(topic, index_name)
+                        if result:
                             st.session_state.knowledge_base_ready = True
                             st.session_state.current_index = index_name
                             st.session_state.current_mode = "research"
                             st.session_state.current_source = topic
-                            st.session_state.raw_content = " ".join(result["chunks"])
-                            st.success(f"✅ Research complete! {len(result['chunks'])} chunks stored in Endee.")
+                            st.session_state.doc_id = result["doc_id"]
+                            st.success(f"✅ Research complete! {result['chunk_count']} chunks stored in Endee.")
                         else:
-                            st.error("❌ Failed to store in Endee.")
+                            st.error("❌ Research failed — no content found or could not store in Endee.")
                     else:
-                        st.error("❌ No content found for this topic.")
+                        with request_context():
+                            with st.spinner(f"🔍 Researching '{topic}'..."):
+                                result = research_topic(topic)
+
+                            if result:
+                                success = process_and_store(
+                                    result["chunks"],
+                                    result["metadata"],
+                                    index_name
+                                )
+
+                                if success:
+                                    st.session_state.knowledge_base_ready = True
+                                    st.session_state.current_index = index_name
+                                    st.session_state.current_mode = "research"
+                                    st.session_state.current_source = topic
+                                    st.session_state.doc_id = document_store.put(result["text"])
+                                    st.success(f"✅ Research complete! {len(result['chunks'])} chunks stored in Endee.")
+                                else:
+                                    st.error("❌ Failed to store in Endee.")
+                            else:
+                                st.error("❌ No content found for this topic.")
 
         with col_b:
-            if st.session_state.raw_content and st.button("📝 Summarize Research", use_container_width=True):
-                    with st.spinner("✍️ Generating summary..."):
-                        summary = get_summary(st.session_state.raw_content)
-                    st.session_state.summary = summary
+            if st.session_state.doc_id and st.button("📝 Summarize Research", use_container_width=True):
+                    render_summary_stream()
 
 
 with col2:
@@ -329,6 +363,15 @@ with col2:
                         f'<div class="chat-message-ai">🤖 <b>DocuSphere:</b> {message["content"]}</div>',
                         unsafe_allow_html=True
                     )
+                    timings = message.get("timings") or {}
+                    if timings.get("cached"):
+                        st.caption("⚡ Answered from cache")
+                    elif timings.get("ttft_ms") is not None:
+                        st.caption(
+                            f"⏱️ First token {timings['ttft_ms']:.0f}ms · "
+                            f"total {timings['total_ms'] / 1000:.1f}s · "
+                            f"{timings.get('saved_tokens', 0)} prompt tokens saved"
+                        )
 
         # Question input
         question = st.chat_input("Ask anything about your knowledge base...")
@@ -338,15 +381,33 @@ with col2:
                 "role": "user",
                 "content": question
             })
-            with st.spinner("🤔 Thinking..."):
-                answer = query_and_answer(
-                    question,
-                    st.session_state.current_index,
-                    st.session_state.current_mode
+
+            # Render the answer token by token inside the chat panel
+            timings = {}
+            with chat_container:
+                st.markdown(
+                    f'<div class="chat-message-user">🧑 <b>You:</b> {question}</div>',
+                    unsafe_allow_html=True
                 )
+                answer_placeholder = st.empty()
+                answer = ""
+                with request_context():
+                    for token in stream_query_and_answer(
+                        question,
+                        st.session_state.current_index,
+                        st.session_state.current_mode,
+                        timings
+                    ):
+                        answer += token
+                        answer_placeholder.markdown(
+                            f'<div class="chat-message-ai">🤖 <b>DocuSphere:</b> {answer}▌</div>',
+                            unsafe_allow_html=True
+                        )
+
             st.session_state.chat_history.append({
                 "role": "assistant",
-                "content": answer
+                "content": answer,
+                "timings": timings
             })
             st.rerun()
 
@@ -0,0 +1,79 @@
+# benchmarks/bench_chunking.py
+# Time and peak memory: span chunker vs RecursiveCharacterTextSplitter
+# The splitter runs the old way (pages joined into one string, then split);
+# the span chunker consumes the same pages as a stream
+# Run from the project root: python benchmarks/bench_chunking.py [--pages 1000]
+
+import argparse
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from chunker import CHUNK_OVERLAP, CHUNK_SIZE, iter_page_chunks  # noqa: E402
+
+WORDS = ("pressure valve assembly torque housing coolant sensor calibration drift firmware "
+         "bearing lithium compound controller wiring reset inspect cartridge filter").split()
+
+
+def synthetic_pages(n: int, seed: int = 5):
+    """Pages of ~3000 chars: paragraphs of sentences, like extracted PDF text."""
+    rng = random.Random(seed)
+    pages = []
+    for page_number in range(1, n + 1):
+        paragraphs = []
+        for _ in range(rng.randint(3, 6)):
+            sentences = [" ".join(rng.choice(WORDS) for _ in range(rng.randint(6, 18))).capitalize() + "."
+                         for _ in range(rng.randint(3, 8))]
+            paragraphs.append(" ".join(sentences))
+        pages.append((page_number, "\n\n".join(paragraphs)))
+    return pages
+
+
+def measure(label, fn):
+    tracemalloc.start()
+    start = time.perf_counter()
+    count, sizes = fn()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<28} {elapsed * 1000:8.1f}ms  peak {peak / 2**20:7.2f}MB  "
+          f"{count} chunks, avg {sizes / max(count, 1):.0f} chars")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pages", type=int, default=1000)
+    args = parser.parse_args()
+
+    pages = synthetic_pages(args.pages)
+    print(f"{args.pages} pages, {sum(len(t) for _, t in pages) / 2**20:.1f}MB of text\n")
+
+    def splitter():
+        from langchain_text_splitters import RecursiveCharacterTextSplitter
+        text_splitter = RecursiveCharacterTextSplitter(
+            chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP,
+            separators=["\n\n", "\n", ".", " ", ""])
+        raw_text = "".join(f"\n[Page {n}]\n{t}" for n, t in pages)
+        chunks = text_splitter.split_text(raw_text)
+        return len(chunks), sum(len(c) for c in chunks)
+
+    def span_chunker():
+        count = sizes = 0
+        for chunk in iter_page_chunks(iter(pages)):
+            count += 1
+            sizes += len(chunk.text)
+        return count, sizes
+
+    try:
+        measure("RecursiveCharacterTextSplitter", splitter)
+    except ImportError:
+        print("langchain_text_splitters not installed — skipping the splitter baseline")
+    measure("span chunker (streamed)", span_chunker)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+# benchmarks/bench_embedding.py
+# Chunks/sec for the default model.encode(...).tolist() path vs length-bucketed encoding
+# Run from the project root: python benchmarks/bench_embedding.py [--chunks 500]
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import embedder  # noqa: E402
+
+
+WORDS = ("vector index query document page section chunk model token embedding "
+         "retrieval latency throughput cache batch manual contract report").split()
+
+
+def synthetic_chunks(n: int, seed: int = 7):
+    """Chunks of mixed length, like a real document: headings, short paragraphs, full 1000-char chunks."""
+    rng = random.Random(seed)
+    chunks = []
+    for _ in range(n):
+        words = rng.choice([8, 40, 90, 160])
+        chunks.append(" ".join(rng.choice(WORDS) for _ in range(words))[:1000])
+    return chunks
+
+
+def timed(label, fn, chunks, repeats):
+    fn(chunks[:8])  # warm-up
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn(chunks)
+        best = min(best, time.perf_counter() - start)
+    print(f"{label:<28} {len(chunks) / best:8.1f} chunks/sec  ({best:.2f}s)")
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chunks", type=int, default=500)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--batch-size", type=int, default=embedder.EMBED_BATCH_SIZE)
+    parser.add_argument("--threads", type=int, default=embedder.EMBED_NUM_THREADS)
+    args = parser.parse_args()
+
+    chunks = synthetic_chunks(args.chunks)
+
+    before = timed(
+        "baseline encode + tolist",
+        lambda t: embedder.load_model().encode(t, show_progress_bar=False).tolist(),
+        chunks, args.repeats
+    )
+    after = timed(
+        "bucketed float32 ndarray",
+        lambda t: embedder.encode_bucketed(t, batch_size=args.batch_size, num_threads=args.threads),
+        chunks, args.repeats
+    )
+    print(f"speedup: {before / after:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+# benchmarks/bench_embedding_backends.py
+# Load time, chunks/sec and peak RSS for each embedding backend
+# (torch, onnx, onnx-int8). Every backend runs in its own interpreter so
+# RSS isn't shared and torch is only imported where it is actually used
+# Run from the project root: python benchmarks/bench_embedding_backends.py [--chunks 500]
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+BACKENDS = ["torch", "onnx", "onnx-int8"]
+
+
+def run_worker(chunk_count: int, repeats: int):
+    """Child process: measure the backend selected by EMBED_BACKEND, print JSON."""
+    import resource
+    from bench_embedding import synthetic_chunks
+    import embedder
+
+    chunks = synthetic_chunks(chunk_count)
+    started = time.perf_counter()
+    embedder.load_model()
+    load_s = time.perf_counter() - started
+
+    embedder.encode_bucketed(chunks[:8])    # warm-up
+    best = float("inf")
+    for _ in range(repeats):
+        started = time.perf_counter()
+        embedder.encode_bucketed(chunks)
+        best = min(best, time.perf_counter() - started)
+
+    print(json.dumps({
+        "backend": embedder.EMBED_BACKEND,
+        "load_s": load_s,
+        "chunks_per_sec": chunk_count / best,
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "torch_loaded": "torch" in sys.modules,
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chunks", type=int, default=500)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--backends", nargs="+", default=BACKENDS, choices=BACKENDS)
+    parser.add_argument("--json", help="also write the results to this file")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args.chunks, args.repeats)
+        return
+
+    results = []
+    print(f"{'backend':<10} {'load s':>7} {'chunks/sec':>11} {'peak RSS MB':>12} {'torch':>6}")
+    for backend in args.backends:
+        proc = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--worker",
+             "--chunks", str(args.chunks), "--repeats", str(args.repeats)],
+            env={**os.environ, "EMBED_BACKEND": backend}, capture_output=True, text=True
+        )
+        if proc.returncode != 0:
+            print(f"{backend:<10} failed: {proc.stderr.strip().splitlines()[-1]}")
+            continue
+        result = json.loads(proc.stdout.strip().splitlines()[-1])
+        results.append(result)
+        print(f"{backend:<10} {result['load_s']:>7.2f} {result['chunks_per_sec']:>11.1f} "
+              f"{result['peak_rss_mb']:>12.0f} {'yes' if result['torch_loaded'] else 'no':>6}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,243 @@
+# benchmarks/bench_pipeline.py
+# End-to-end benchmark: synthetic PDF/DOCX → process_document → get_embeddings
+# → insert_vectors (+ BM25) → query_and_answer, against an in-process fake Endee
+# server and a stubbed Groq client — no Docker, no API key, no network once the
+# embedding model is cached
+# Reports pages/sec, chunks/sec, peak RSS and p50/p95/p99 per stage; --json
+# writes the results (with the git commit) so runs can be diffed, --baseline
+# prints the change against an earlier JSON file
+# Run from the project root: python benchmarks/bench_pipeline.py [--pages 10 100 --json results.json]
+
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path.insert(0, ROOT)
+
+_tmp = tempfile.mkdtemp(prefix="docusphere-bench-")
+os.environ["VECTOR_BACKEND"] = "endee"
+os.environ["ENDEE_TOKEN"] = ""
+os.environ["ENDEE_RESCORE_DIR"] = os.path.join(_tmp, "rescore")
+os.environ["BM25_DIR"] = os.path.join(_tmp, "bm25")
+os.environ["INDEX_MANIFEST_DIR"] = os.path.join(_tmp, "manifests")
+os.environ["EMBED_CACHE_DIR"] = os.path.join(_tmp, "embeddings")    # cold cache: measure real encoding
+os.environ["ANSWER_CACHE_THRESHOLD"] = "2"                         # never hit: every query runs every stage
+
+from fake_endee import FakeEndeeServer  # noqa: E402
+from fake_groq import install_fake_groq  # noqa: E402
+from synthetic_docs import make_document, make_questions  # noqa: E402
+
+import numpy as np  # noqa: E402
+
+PERCENTILES = (50, 95, 99)
+
+
+def peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2**20 if sys.platform == "darwin" else peak / 1024   # bytes on macOS, KiB on Linux
+
+
+def summarize(samples_ms) -> dict:
+    arr = np.asarray(samples_ms, dtype=np.float64)
+    stats = {"count": int(len(arr)), "mean_ms": float(arr.mean())}
+    for p in PERCENTILES:
+        stats[f"p{p}_ms"] = float(np.percentile(arr, p))
+    return stats
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                              capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return ""
+
+
+class Timer:
+    """Collects wall-clock samples (ms) per stage."""
+
+    def __init__(self):
+        self.samples = defaultdict(list)
+
+    def time(self, stage: str, fn, *args, **kwargs):
+        started = time.perf_counter()
+        result = fn(*args, **kwargs)
+        self.samples[stage].append((time.perf_counter() - started) * 1000)
+        return result
+
+
+def run_ingest(timer: Timer, workdir: str, fmt: str, pages: int, docs: int) -> dict:
+    """Ingest `docs` fresh documents of one format and size; returns throughput totals."""
+    from document_processor import process_document
+    from embedder import get_embeddings
+    from endee_client import create_index, insert_vectors
+    from bm25_index import build_bm25
+    from index_manifest import chunk_ids
+
+    totals = {"docs": 0, "pages": 0, "chunks": 0, "extract_s": 0.0, "embed_s": 0.0, "insert_s": 0.0}
+    index_names = []
+    for i in range(docs):
+        path = make_document(os.path.join(workdir, f"bench_{pages}p_{i}.{fmt}"), pages, seed=pages * 1000 + i)
+        index_name = f"bench_{fmt}_{pages}p_{i}"
+
+        started = time.perf_counter()
+        doc = timer.time(f"{fmt}.process_document", process_document, path)
+        extract_s = time.perf_counter() - started
+        chunks, metadata = doc["chunks"], doc["metadata"]
+
+        started = time.perf_counter()
+        vectors = timer.time("get_embeddings", get_embeddings, chunks)
+        embed_s = time.perf_counter() - started
+
+        create_index(index_name, vectors.shape[1])
+        started = time.perf_counter()
+        ok = timer.time("insert_vectors", insert_vectors, index_name, vectors, metadata,
+                        ids=list(chunk_ids(chunks)))
+        insert_s = time.perf_counter() - started
+        if not ok:
+            raise RuntimeError(f"insert into {index_name} failed")
+        timer.time("build_bm25", build_bm25, index_name, chunks, metadata)
+
+        totals["docs"] += 1
+        totals["pages"] += pages
+        totals["chunks"] += len(chunks)
+        totals["extract_s"] += extract_s
+        totals["embed_s"] += embed_s
+        totals["insert_s"] += insert_s
+        index_names.append(index_name)
+        os.remove(path)
+
+    return {
+        **totals,
+        "pages_per_sec": totals["pages"] / totals["extract_s"],
+        "chunks_per_sec_extract": totals["chunks"] / totals["extract_s"],
+        "chunks_per_sec_embed": totals["chunks"] / totals["embed_s"],
+        "vectors_per_sec_insert": totals["chunks"] / totals["insert_s"],
+        "chunks_per_sec_end_to_end": totals["chunks"] / (totals["extract_s"] + totals["embed_s"] + totals["insert_s"]),
+        "index_names": index_names,
+    }
+
+
+def run_queries(timer: Timer, index_names, n: int) -> dict:
+    from query_engine import query_and_answer
+
+    for i, question in enumerate(make_questions(n)):
+        index_name = index_names[i % len(index_names)]
+        timings = {}
+        timer.time("query.total", query_and_answer, question, index_name, "document", timings)
+        for stage in ("embed", "retrieve", "llm"):
+            if f"{stage}_ms" in timings:
+                timer.samples[f"query.{stage}"].append(timings[f"{stage}_ms"])
+    total = summarize(timer.samples["query.total"])
+    return {"queries": n, "qps_serial": 1000 / total["mean_ms"]}
+
+
+def print_report(result: dict, baseline: dict = None):
+    print(f"\nIngest ({result['meta']['embed_backend']} embeddings, fake Endee at {result['meta']['endee_url']})")
+    print(f"{'format':<6} {'pages':>6} {'docs':>5} {'chunks':>7} {'pages/s':>9} {'chunks/s extract':>17} "
+          f"{'chunks/s embed':>15} {'vectors/s insert':>17} {'chunks/s e2e':>13}")
+    for run in result["ingest"]:
+        print(f"{run['format']:<6} {run['pages_per_doc']:>6} {run['docs']:>5} {run['chunks']:>7} "
+              f"{run['pages_per_sec']:>9.1f} {run['chunks_per_sec_extract']:>17.1f} "
+              f"{run['chunks_per_sec_embed']:>15.1f} {run['vectors_per_sec_insert']:>17.1f} "
+              f"{run['chunks_per_sec_end_to_end']:>13.1f}")
+
+    base_stages = (baseline or {}).get("stages", {})
+    print(f"\n{'stage':<26} {'count':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}" +
+          (f" {'Δp50':>8} {'Δp95':>8}" if baseline else ""))
+    for stage, stats in result["stages"].items():
+        line = (f"{stage:<26} {stats['count']:>6} {stats['p50_ms']:>9.2f} "
+                f"{stats['p95_ms']:>9.2f} {stats['p99_ms']:>9.2f}")
+        old = base_stages.get(stage)
+        if old:
+            line += "".join(f" {(stats[k] / old[k] - 1) * 100:>+7.1f}%" if old[k] else f" {'n/a':>8}"
+                            for k in ("p50_ms", "p95_ms"))
+        print(line)
+
+    print(f"\nserial query throughput: {result['query']['qps_serial']:.1f} q/s")
+    print("peak RSS MB: " + ", ".join(f"{phase} {mb:.0f}" for phase, mb in result["peak_rss_mb"].items()))
+    if baseline:
+        print(f"(Δ vs {baseline['meta'].get('commit') or 'baseline'})")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pages", type=int, nargs="+", default=[10, 100], help="document sizes to generate")
+    parser.add_argument("--formats", nargs="+", default=["pdf", "docx"], choices=["pdf", "docx"])
+    parser.add_argument("--docs", type=int, default=3, help="documents per format and size")
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--llm-ttft-ms", type=float, default=150.0, help="fake Groq time to first token")
+    parser.add_argument("--llm-token-ms", type=float, default=2.0, help="fake Groq delay per token")
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--baseline", help="earlier --json output to compare against")
+    args = parser.parse_args()
+
+    server = FakeEndeeServer(root=os.path.join(_tmp, "endee")).start()
+    os.environ["ENDEE_URL"] = server.url
+    install_fake_groq(ttft_ms=args.llm_ttft_ms, token_ms=args.llm_token_ms)
+
+    import embedder
+    rss = {"baseline": peak_rss_mb()}
+    started = time.perf_counter()
+    embedder.load_model()
+    embedder.get_embeddings(["warm-up"])
+    load_s = time.perf_counter() - started
+    rss["model_loaded"] = peak_rss_mb()
+
+    timer = Timer()
+    ingest_runs, index_names = [], []
+    workdir = os.path.join(_tmp, "docs")
+    os.makedirs(workdir, exist_ok=True)
+    for fmt in args.formats:
+        for pages in args.pages:
+            run = run_ingest(timer, workdir, fmt, pages, args.docs)
+            index_names += run.pop("index_names")
+            ingest_runs.append({"format": fmt, "pages_per_doc": pages, **run})
+            print(f"[Bench] {fmt} × {pages} pages: {run['chunks']} chunks in {args.docs} docs.")
+    rss["after_ingest"] = peak_rss_mb()
+
+    query = run_queries(timer, index_names, args.queries)
+    rss["after_query"] = peak_rss_mb()
+    server.stop()
+
+    result = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "embed_backend": embedder.EMBED_BACKEND,
+            "model_load_s": load_s,
+            "endee_url": server.url,
+            "args": vars(args),
+        },
+        "ingest": ingest_runs,
+        "query": query,
+        "stages": {stage: summarize(samples) for stage, samples in timer.samples.items()},
+        "peak_rss_mb": rss,
+    }
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+    print_report(result, baseline)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+        print(f"Results written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+# benchmarks/bench_quantization.py
+# Memory footprint, query latency and recall@k per storage precision
+# Same synthetic corpus for every precision; recall is measured against exact
+# float32 search, with and without the sidecar rescoring step
+# Uses the local vector engine by default; --backend endee runs against a live
+# Endee server (memory is then reported from the local engine's encoding sizes)
+# Run from the project root: python benchmarks/bench_quantization.py [--vectors 20000]
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+_tmp = tempfile.mkdtemp(prefix="docusphere-bench-")
+os.environ.setdefault("VECTOR_BACKEND", "local")
+os.environ["LOCAL_VECTOR_DIR"] = os.path.join(_tmp, "vectors")
+os.environ["ENDEE_RESCORE_DIR"] = os.path.join(_tmp, "rescore")
+os.environ["LOCAL_IVF_MIN_VECTORS"] = str(10 ** 9)    # exact scans: recall reflects precision only
+os.environ["BM25_DIR"] = os.path.join(_tmp, "bm25")
+os.environ["INDEX_MANIFEST_DIR"] = os.path.join(_tmp, "manifests")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np  # noqa: E402
+import endee_client  # noqa: E402
+from local_vector_store import PRECISIONS, bytes_per_vector  # noqa: E402
+
+DIMENSION = 384
+
+
+def synthetic_corpus(n: int, n_queries: int, seed: int = 7):
+    """Clustered unit vectors (like sentence embeddings) and nearby queries."""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((max(n // 100, 1), DIMENSION)).astype(np.float32)
+    vectors = centers[rng.integers(len(centers), size=n)] + \
+        0.6 * rng.standard_normal((n, DIMENSION)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    queries = vectors[rng.choice(n, n_queries, replace=False)] + \
+        0.3 * rng.standard_normal((n_queries, DIMENSION)).astype(np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+    return vectors, queries
+
+
+def recall(results, truth) -> float:
+    return len(set(results) & set(truth)) / len(truth)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--vectors", type=int, default=20000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--precisions", nargs="+", default=["float32", "float16", "int8", "binary"],
+                        choices=PRECISIONS)
+    parser.add_argument("--rescore-factor", type=int, default=endee_client.RESCORE_FACTOR)
+    parser.add_argument("--backend", choices=["local", "endee"], default=os.environ["VECTOR_BACKEND"])
+    args = parser.parse_args()
+    endee_client.VECTOR_BACKEND = args.backend
+    endee_client.RESCORE_FACTOR = args.rescore_factor
+
+    vectors, queries = synthetic_corpus(args.vectors, args.queries)
+    truth = np.argsort(-(queries @ vectors.T), axis=1)[:, :args.top_k]
+    ids = [str(i) for i in range(args.vectors)]
+    metadata = [{"chunk_id": i} for i in range(args.vectors)]
+    print(f"{args.vectors} vectors × {DIMENSION} dims, {args.queries} queries, "
+          f"top_k={args.top_k}, rescore factor {endee_client.RESCORE_FACTOR}\n")
+    print(f"{'precision':<10} {'bytes/vec':>9} {'index MB':>9} {'sidecar MB':>11} "
+          f"{'recall raw':>11} {'recall':>7} {'p50 ms':>8} {'p95 ms':>8}")
+
+    for precision in args.precisions:
+        name = f"bench_quant_{precision}"
+        endee_client.delete_index(name)
+        endee_client.create_index(name, DIMENSION, precision=precision)
+        endee_client.insert_vectors(name, vectors, metadata, ids=ids)
+
+        raw_hits, hits, latencies = 0.0, 0.0, []
+        index = endee_client._get_index(name)
+        for q, expected in zip(queries, truth):
+            raw = index.query(vector=q.tolist(), top_k=args.top_k)
+            raw_hits += recall([int(r["id"]) for r in raw], expected)
+
+            started = time.perf_counter()
+            metas = endee_client.query_index(name, q.tolist(), top_k=args.top_k)
+            latencies.append((time.perf_counter() - started) * 1000)
+            hits += recall([m["chunk_id"] for m in metas], expected)
+
+        per_vector = bytes_per_vector(precision, DIMENSION)
+        sidecar_mb = args.vectors * DIMENSION * 4 / 2**20 if precision != "float32" else 0.0
+        lat = np.asarray(latencies)
+        print(f"{precision:<10} {per_vector:>9} {per_vector * args.vectors / 2**20:>9.2f} "
+              f"{sidecar_mb:>11.2f} {raw_hits / args.queries:>11.3f} {hits / args.queries:>7.3f} "
+              f"{np.percentile(lat, 50):>8.2f} {np.percentile(lat, 95):>8.2f}")
+        endee_client.delete_index(name)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+# benchmarks/bench_research.py
+# research_topic latency: cold (live network) vs warm (research cache)
+# With --offline only cached responses are used, so runs are reproducible without network —
+# populate the cache once with a normal run first
+# Run from the project root: python benchmarks/bench_research.py "Quantum Computing" [--offline]
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("topics", nargs="+")
+    parser.add_argument("--offline", action="store_true")
+    args = parser.parse_args()
+
+    if args.offline:
+        os.environ["RESEARCH_OFFLINE"] = "1"
+
+    from web_researcher import research_topic
+    from research_cache import research_cache
+
+    for topic in args.topics:
+        for run in ("first", "repeat"):
+            start = time.perf_counter()
+            result = research_topic(topic)
+            elapsed = time.perf_counter() - start
+            print(f"{topic!r:<30} {run:<7} {elapsed:6.2f}s  {len(result.get('chunks', []))} chunks")
+
+    print(f"cache: {research_cache.stats()}")
+
+
+if __name__ == "__main__":
+    main()
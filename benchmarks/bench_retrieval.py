@@ -0,0 +1,77 @@
+# benchmarks/bench_retrieval.py
+# Recall@k and latency: vector-only vs hybrid (vector + BM25, RRF) retrieval
+# Uses the local vector engine, so no Endee server is needed
+# Run from the project root: python benchmarks/bench_retrieval.py [--chunks 2000]
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+_tmp = tempfile.mkdtemp(prefix="docusphere-bench-")
+os.environ["VECTOR_BACKEND"] = "local"
+os.environ["LOCAL_VECTOR_DIR"] = os.path.join(_tmp, "vectors")
+os.environ["BM25_DIR"] = os.path.join(_tmp, "bm25")
+os.environ["INDEX_MANIFEST_DIR"] = os.path.join(_tmp, "manifests")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np  # noqa: E402
+from embedder import get_single_embedding  # noqa: E402
+from ingest_pipeline import store_chunks  # noqa: E402
+from retrieval import retrieve  # noqa: E402
+
+TEMPLATES = [
+    "Replace the {part} filter cartridge every 500 operating hours. Torque the housing to {n} Nm.",
+    "If the controller shows error {part}, reset the drive and inspect the coolant pump wiring.",
+    "The {part} bearing assembly must be greased with lithium compound before the first start-up.",
+    "Firmware {part} fixes a calibration drift in the pressure sensor at temperatures above {n} C.",
+]
+
+
+def synthetic_corpus(n: int, seed: int = 3):
+    rng = random.Random(seed)
+    chunks, parts = [], []
+    for i in range(n):
+        part = f"{rng.choice('ABCDEFGH')}{rng.choice('KLMNPQRS')}-{rng.randint(10000, 99999)}"
+        chunks.append(rng.choice(TEMPLATES).format(part=part, n=rng.randint(5, 90)))
+        parts.append(part)
+    return chunks, parts
+
+
+def evaluate(index_name, queries, truth, top_k, mode):
+    latencies, hits = [], 0
+    for question, chunk_id in zip(queries, truth):
+        vector = get_single_embedding(question)
+        start = time.perf_counter()
+        results = retrieve(index_name, question, vector, top_k=top_k, mode=mode)
+        latencies.append((time.perf_counter() - start) * 1000)
+        hits += any(r.get("chunk_id") == chunk_id for r in results)
+    lat = np.asarray(latencies)
+    print(f"{mode:<7} recall@{top_k} {hits / len(queries):.3f}   "
+          f"p50 {np.percentile(lat, 50):6.2f}ms  p95 {np.percentile(lat, 95):6.2f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chunks", type=int, default=2000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=5)
+    args = parser.parse_args()
+
+    chunks, parts = synthetic_corpus(args.chunks)
+    metadata = [{"text": c, "source": "bench.pdf", "chunk_id": i} for i, c in enumerate(chunks)]
+    store_chunks(chunks, metadata, "bench_retrieval")
+
+    rng = random.Random(11)
+    truth = rng.sample(range(args.chunks), min(args.queries, args.chunks))
+    queries = [f"What does the manual say about {parts[i]}?" for i in truth]
+
+    evaluate("bench_retrieval", queries, truth, args.top_k, "vector")
+    evaluate("bench_retrieval", queries, truth, args.top_k, "hybrid")
+
+
+if __name__ == "__main__":
+    main()
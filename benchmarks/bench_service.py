@@ -0,0 +1,193 @@
+# benchmarks/bench_service.py
+# Load test for service.py: closed-loop clients issue POST /query at rising
+# concurrency and the highest requests/sec whose p95 latency stays within
+# --target-p95-ms is reported — throughput at a fixed latency budget
+# Without --url it starts service.py in-process against the fake Endee server
+# and a stubbed Groq client, and ingests one synthetic document to query
+# --distinct sets how many different questions the clients cycle through;
+# fewer than the concurrency means identical requests are in flight together
+# and get coalesced. The answer cache is off unless --answer-cache is given
+# Run from the project root: python benchmarks/bench_service.py [--levels 1 4 16 64 --target-p95-ms 500]
+
+import argparse
+import asyncio
+import http.client
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from urllib.parse import urlsplit
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path.insert(0, ROOT)
+
+import numpy as np  # noqa: E402
+
+
+def start_local_service(args) -> str:
+    """Fake Endee + fake Groq + service.py on an ephemeral port; returns its URL."""
+    tmp = tempfile.mkdtemp(prefix="docusphere-service-bench-")
+    os.environ["VECTOR_BACKEND"] = "endee"
+    os.environ["ENDEE_TOKEN"] = ""
+    for name, sub in (("ENDEE_RESCORE_DIR", "rescore"), ("BM25_DIR", "bm25"),
+                      ("INDEX_MANIFEST_DIR", "manifests"), ("EMBED_CACHE_DIR", "embeddings"),
+                      ("SUMMARY_CACHE_DIR", "summaries")):
+        os.environ[name] = os.path.join(tmp, sub)
+    if not args.answer_cache:
+        os.environ["ANSWER_CACHE_THRESHOLD"] = "2"
+
+    from fake_endee import FakeEndeeServer
+    from fake_groq import install_fake_groq
+    server = FakeEndeeServer(root=os.path.join(tmp, "endee")).start()
+    os.environ["ENDEE_URL"] = server.url
+    install_fake_groq(ttft_ms=args.llm_ttft_ms, token_ms=args.llm_token_ms)
+
+    import embedder
+    from service import DocuSphereService
+    embedder.load_model()
+
+    ready = threading.Event()
+    bound = {}
+
+    def on_ready(port: int):
+        bound["port"] = port
+        ready.set()
+
+    service = DocuSphereService(workers=args.workers, queue_size=args.queue_size)
+    threading.Thread(target=lambda: asyncio.run(service.serve("127.0.0.1", 0, on_ready)),
+                     name="bench-service", daemon=True).start()
+    ready.wait()
+    return f"http://127.0.0.1:{bound['port']}"
+
+
+def ingest_fixture(url: str, pages: int) -> str:
+    from synthetic_docs import make_document
+    path = make_document(os.path.join(tempfile.mkdtemp(), "service_bench.pdf"), pages, seed=7)
+    with open(path, "rb") as f:
+        body = f.read()
+    status, result = call(url, "POST", "/ingest?filename=service_bench.pdf&index=service_bench", body,
+                          "application/pdf")
+    if status != 200:
+        raise RuntimeError(f"ingest failed: {status} {result}")
+    print(f"[Bench] Ingested {result['chunk_count']} chunks into '{result['index']}'.")
+    return result["index"]
+
+
+def call(url: str, method: str, path: str, body: bytes = b"", content_type: str = "application/json",
+         connection: http.client.HTTPConnection = None):
+    parts = urlsplit(url)
+    conn = connection or http.client.HTTPConnection(parts.hostname, parts.port, timeout=300)
+    conn.request(method, path, body=body, headers={"Content-Type": content_type})
+    response = conn.getresponse()
+    data = response.read()
+    if connection is None:
+        conn.close()
+    return response.status, json.loads(data) if data else None
+
+
+def run_level(url: str, index_name: str, questions, concurrency: int, duration: float) -> dict:
+    """`concurrency` clients, each on its own keep-alive connection, for `duration` seconds."""
+    parts = urlsplit(url)
+    latencies, statuses, shared = [], {}, [0]
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def client(worker: int):
+        conn = http.client.HTTPConnection(parts.hostname, parts.port, timeout=300)
+        i = worker
+        while time.perf_counter() < deadline:
+            payload = json.dumps({"question": questions[i % len(questions)],
+                                  "index": index_name, "mode": "document"}).encode("utf-8")
+            i += concurrency
+            started = time.perf_counter()
+            try:
+                status, result = call(url, "POST", "/query", payload, connection=conn)
+            except (OSError, http.client.HTTPException):
+                conn.close()
+                conn = http.client.HTTPConnection(parts.hostname, parts.port, timeout=300)
+                status, result = 0, None
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            with lock:
+                statuses[status] = statuses.get(status, 0) + 1
+                if status == 200:
+                    latencies.append(elapsed_ms)
+                    shared[0] += bool(result.get("shared"))
+            if status == 503:
+                time.sleep(0.05)
+        conn.close()
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=client, args=(w,), daemon=True) for w in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - started
+
+    arr = np.asarray(latencies or [float("nan")])
+    return {
+        "concurrency": concurrency,
+        "ok": len(latencies),
+        "rps": len(latencies) / wall,
+        "p50_ms": float(np.percentile(arr, 50)),
+        "p95_ms": float(np.percentile(arr, 95)),
+        "p99_ms": float(np.percentile(arr, 99)),
+        "rejected": statuses.get(503, 0),
+        "errors": sum(n for status, n in statuses.items() if status not in (200, 503)),
+        "shared": shared[0],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", help="an already running service (default: start one in-process)")
+    parser.add_argument("--index", help="index to query on --url (default: ingest a synthetic one)")
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32, 64],
+                        help="client concurrency levels to sweep")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per level")
+    parser.add_argument("--target-p95-ms", type=float, default=500.0)
+    parser.add_argument("--distinct", type=int, default=20, help="different questions in rotation")
+    parser.add_argument("--pages", type=int, default=20, help="size of the synthetic document")
+    parser.add_argument("--workers", type=int, default=8, help="in-process service workers")
+    parser.add_argument("--queue-size", type=int, default=64, help="in-process service queue")
+    parser.add_argument("--answer-cache", action="store_true", help="leave the semantic answer cache on")
+    parser.add_argument("--llm-ttft-ms", type=float, default=150.0, help="fake Groq time to first token")
+    parser.add_argument("--llm-token-ms", type=float, default=2.0, help="fake Groq delay per token")
+    parser.add_argument("--json", help="write the results to this file")
+    args = parser.parse_args()
+
+    url = args.url.rstrip("/") if args.url else start_local_service(args)
+    index_name = args.index or ingest_fixture(url, args.pages)
+    from synthetic_docs import make_questions
+    questions = make_questions(args.distinct)
+
+    print(f"\n{'clients':>7} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} "
+          f"{'shared':>7} {'503s':>6} {'errors':>7}")
+    levels, best = [], None
+    for concurrency in args.levels:
+        level = run_level(url, index_name, questions, concurrency, args.duration)
+        levels.append(level)
+        print(f"{level['concurrency']:>7} {level['rps']:>8.1f} {level['p50_ms']:>9.1f} "
+              f"{level['p95_ms']:>9.1f} {level['p99_ms']:>9.1f} {level['shared']:>7} "
+              f"{level['rejected']:>6} {level['errors']:>7}")
+        if level["ok"] and level["p95_ms"] <= args.target_p95_ms and (best is None or level["rps"] > best["rps"]):
+            best = level
+
+    if best:
+        print(f"\n{best['rps']:.1f} req/s at p95 ≤ {args.target_p95_ms:.0f}ms "
+              f"({best['concurrency']} clients, p95 {best['p95_ms']:.0f}ms)")
+    else:
+        print(f"\nNo level kept p95 within {args.target_p95_ms:.0f}ms")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"args": vars(args), "levels": levels,
+                       "rps_at_target": best["rps"] if best else None}, f, indent=2)
+        print(f"Results written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+# benchmarks/bench_startup.py
+# Import-time profile of the modules app.py loads at startup
+# Runs `python -X importtime` in a fresh interpreter, reports the slowest
+# imports and flags heavy dependencies that were loaded eagerly
+# Run from the project root: python benchmarks/bench_startup.py [--top 15] [--json out.json]
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Everything app.py imports from the project
+APP_MODULES = [
+    "endee_client", "retrieval", "reranker", "embedder", "ingest_pipeline",
+    "document_processor", "web_researcher", "llm_handler", "answer_cache", "index_manifest",
+]
+
+# Should only be imported on first use
+HEAVY_MODULES = [
+    "torch", "sentence_transformers", "transformers", "fitz", "docx",
+    "groq", "endee", "duckduckgo_search", "wikipedia", "requests",
+]
+
+
+def profile_imports(modules):
+    """[(module, self_us, cumulative_us)] from -X importtime, plus the heavy modules loaded."""
+    code = (
+        "import sys, json\n"
+        + "".join(f"import {m}\n" for m in modules)
+        + f"print(json.dumps([m for m in {HEAVY_MODULES!r} if m in sys.modules]))\n"
+    )
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                          cwd=ROOT, capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise SystemExit(proc.stderr.strip().splitlines()[-1])
+
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        rows.append((name.rstrip(), int(self_us), int(cumulative_us)))
+    return rows, json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--json", help="also write the report to this file")
+    parser.add_argument("--modules", nargs="+", default=APP_MODULES)
+    args = parser.parse_args()
+
+    rows, heavy = profile_imports(args.modules)
+    # Top-level imports (no leading indentation) add up to the total
+    top_level = [(name.strip(), cum) for name, _, cum in rows if not name.startswith("  ")]
+    total_ms = sum(cum for _, cum in top_level) / 1000
+    project = {name: cum / 1000 for name, cum in top_level if name in args.modules}
+    slowest = sorted(rows, key=lambda r: -r[2])[:args.top]
+
+    print(f"Total import time: {total_ms:.0f}ms\n")
+    print("Project modules (cumulative, first import wins shared dependencies):")
+    for name, ms in sorted(project.items(), key=lambda kv: -kv[1]):
+        print(f"  {name:<22} {ms:8.1f}ms")
+    print(f"\nSlowest {args.top} imports (cumulative):")
+    for name, self_us, cum_us in slowest:
+        print(f"  {name.strip():<40} {cum_us / 1000:8.1f}ms  (self {self_us / 1000:.1f}ms)")
+    print(f"\nHeavy modules loaded at import: {', '.join(heavy) if heavy else 'none'}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({
+                "total_ms": total_ms,
+                "project_ms": project,
+                "slowest": [{"module": n.strip(), "self_ms": s / 1000, "cumulative_ms": c / 1000}
+                            for n, s, c in slowest],
+                "heavy_loaded": heavy,
+            }, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
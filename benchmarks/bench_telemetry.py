@@ -0,0 +1,70 @@
+# benchmarks/bench_telemetry.py
+# Per-span cost of telemetry.span / timed_iter, enabled vs TELEMETRY_ENABLED=0
+# Each setting runs in its own interpreter, since the flag is read at import
+# Run from the project root: python benchmarks/bench_telemetry.py [--spans 200000]
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def run_worker(n: int):
+    import telemetry
+
+    def best_of(fn, repeats=5) -> float:
+        best = float("inf")
+        for _ in range(repeats):
+            started = time.perf_counter()
+            fn()
+            best = min(best, time.perf_counter() - started)
+        return best / n * 1e9     # ns per iteration
+
+    def bare():
+        for _ in range(n):
+            pass
+
+    def spans():
+        for _ in range(n):
+            with telemetry.span("bench"):
+                pass
+
+    def iterated():
+        for _ in telemetry.timed_iter("bench", range(n)):
+            pass
+
+    baseline = best_of(bare)
+    print(json.dumps({
+        "enabled": telemetry.TELEMETRY_ENABLED,
+        "span_ns": best_of(spans) - baseline,
+        "timed_iter_ns": best_of(iterated) - baseline,
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--spans", type=int, default=200_000)
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args.spans)
+        return
+
+    print(f"{'telemetry':<10} {'span ns':>9} {'timed_iter ns':>14}")
+    for enabled in ("1", "0"):
+        proc = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--worker", "--spans", str(args.spans)],
+            env={**os.environ, "TELEMETRY_ENABLED": enabled}, capture_output=True, text=True, check=True
+        )
+        result = json.loads(proc.stdout.strip().splitlines()[-1])
+        print(f"{'on' if result['enabled'] else 'off':<10} {result['span_ns']:>9.0f} "
+              f"{result['timed_iter_ns']:>14.0f}")
+
+
+if __name__ == "__main__":
+    main()
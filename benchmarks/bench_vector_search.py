@@ -0,0 +1,72 @@
+# benchmarks/bench_vector_search.py
+# Local vector engine: exact vs IVF query latency and recall@k on random unit vectors
+# Run from the project root: python benchmarks/bench_vector_search.py [--vectors 50000]
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np  # noqa: E402
+import local_vector_store  # noqa: E402
+from local_vector_store import LocalVectorStore  # noqa: E402
+
+
+def clustered_vectors(n: int, dim: int, clusters: int = 200, seed: int = 0) -> np.ndarray:
+    """Gaussian blobs around random centres — closer to real embeddings than uniform noise."""
+    rng = np.random.default_rng(seed)
+    centres = rng.standard_normal((clusters, dim)).astype(np.float32)
+    vectors = centres[rng.integers(0, clusters, n)] + 0.5 * rng.standard_normal((n, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def run_queries(index, queries, top_k):
+    latencies, results = [], []
+    for q in queries:
+        start = time.perf_counter()
+        hits = index.query(vector=q, top_k=top_k)
+        latencies.append((time.perf_counter() - start) * 1000)
+        results.append({h["id"] for h in hits})
+    return np.array(latencies), results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--vectors", type=int, default=50_000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=5)
+    args = parser.parse_args()
+
+    data = clustered_vectors(args.vectors + args.queries, args.dim)
+    vectors, queries = data[:args.vectors], data[args.vectors:]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = LocalVectorStore(tmp)
+        store.create_index(name="bench", dimension=args.dim)
+        index = store.get_index(name="bench")
+
+        start = time.perf_counter()
+        for lo in range(0, args.vectors, 1000):
+            index.upsert([{"id": str(i), "vector": vectors[i], "meta": {"chunk_id": i}}
+                          for i in range(lo, min(lo + 1000, args.vectors))])
+        print(f"upsert: {args.vectors / (time.perf_counter() - start):,.0f} vectors/sec")
+
+        local_vector_store.IVF_MIN_VECTORS = args.vectors + 1
+        exact_lat, exact = run_queries(index, queries, args.top_k)
+
+        local_vector_store.IVF_MIN_VECTORS = 0
+        index.query(vector=queries[0], top_k=args.top_k)   # trains the IVF lists
+        ivf_lat, approx = run_queries(index, queries, args.top_k)
+
+    recall = np.mean([len(a & e) / len(e) for a, e in zip(approx, exact)])
+    for label, lat in (("exact", exact_lat), ("ivf", ivf_lat)):
+        print(f"{label:<6} p50 {np.percentile(lat, 50):6.2f}ms  p95 {np.percentile(lat, 95):6.2f}ms")
+    print(f"ivf recall@{args.top_k}: {recall:.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+# benchmarks/check_embedding_parity.py
+# Parity check: ONNX Runtime embeddings vs the PyTorch SentenceTransformer
+# Fails (exit 1) if any text's cosine similarity to the torch embedding is
+# below the backend's tolerance
+# Run from the project root: python benchmarks/check_embedding_parity.py [--chunks 200]
+
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np  # noqa: E402
+from bench_embedding import synthetic_chunks  # noqa: E402
+from embedder import MODEL_NAME  # noqa: E402
+from onnx_embedder import OnnxEmbedder  # noqa: E402
+
+# Minimum cosine to the torch output. The fp32 graph should match to float
+# rounding; int8 weights move embeddings slightly but keep rankings
+TOLERANCES = {"onnx": 0.9999, "onnx-int8": 0.98}
+
+EDGE_CASES = [
+    "",
+    "a",
+    "Error E-404: valve PX-300 pressure exceeds 12 bar.",
+    "word " * 600,     # longer than max_seq_length — exercises truncation
+]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chunks", type=int, default=200)
+    parser.add_argument("--backends", nargs="+", default=list(TOLERANCES), choices=list(TOLERANCES))
+    args = parser.parse_args()
+
+    from sentence_transformers import SentenceTransformer
+    texts = EDGE_CASES + synthetic_chunks(args.chunks)
+    reference = SentenceTransformer(MODEL_NAME).encode(texts, batch_size=32, convert_to_numpy=True)
+    reference /= np.maximum(np.linalg.norm(reference, axis=1, keepdims=True), 1e-12)
+
+    failed = False
+    for backend in args.backends:
+        model = OnnxEmbedder(MODEL_NAME, quantize=backend == "onnx-int8")
+        vectors = model.encode(texts, batch_size=32)
+        vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        cosines = np.sum(vectors * reference, axis=1)
+        worst = int(np.argmin(cosines))
+        ok = cosines[worst] >= TOLERANCES[backend]
+        failed |= not ok
+        print(f"{backend:<10} min cosine {cosines[worst]:.6f}  mean {cosines.mean():.6f}  "
+              f"tolerance {TOLERANCES[backend]}  {'OK' if ok else 'FAIL'}")
+        if not ok:
+            print(f"           worst text: {texts[worst][:80]!r}")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
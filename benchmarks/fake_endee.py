@@ -0,0 +1,175 @@
+# benchmarks/fake_endee.py
+# In-process stand-in for the Endee server, speaking the same REST/msgpack
+# protocol as the official SDK so endee_client runs unmodified against it
+# Vectors are stored in the local engine (local_vector_store.py) — good enough
+# to exercise the client, serialization and HTTP round trips without Docker
+# Point the client at it with ENDEE_URL=<server.url>
+
+import json
+import os
+import re
+import sys
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import msgpack
+import orjson
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from endee.compression import json_unzip, json_zip  # noqa: E402
+from local_vector_store import LocalVectorStore  # noqa: E402
+
+_ROUTES = [
+    ("POST", re.compile(r"^/api/v1/index/create$"), "_create_index"),
+    ("GET", re.compile(r"^/api/v1/index/list$"), "_list_indexes"),
+    ("DELETE", re.compile(r"^/api/v1/index/([^/]+)/delete$"), "_delete_index"),
+    ("GET", re.compile(r"^/api/v1/index/([^/]+)/info$"), "_index_info"),
+    ("POST", re.compile(r"^/api/v1/index/([^/]+)/vector/insert$"), "_insert"),
+    ("POST", re.compile(r"^/api/v1/index/([^/]+)/search$"), "_search"),
+    ("DELETE", re.compile(r"^/api/v1/index/([^/]+)/vector/([^/]+)/delete$"), "_delete_vector"),
+]
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"       # keep-alive, like the real server
+    disable_nagle_algorithm = True      # headers + body in one segment, no delayed-ACK stalls
+    wbufsize = -1
+    store: LocalVectorStore = None
+
+    def log_message(self, *args):
+        pass
+
+    def _dispatch(self, method: str):
+        for route_method, pattern, handler in _ROUTES:
+            match = pattern.match(self.path) if route_method == method else None
+            if match:
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length) if length else b""
+                try:
+                    status, content_type, payload = getattr(self, handler)(body, *match.groups())
+                except ValueError as e:
+                    status, content_type, payload = 404, "application/json", \
+                        json.dumps({"error": str(e)}).encode("utf-8")
+                self._reply(status, content_type, payload)
+                return
+        self._reply(404, "application/json", b'{"error": "Not found"}')
+
+    def _reply(self, status: int, content_type: str, payload: bytes):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+    def do_DELETE(self):
+        self._dispatch("DELETE")
+
+    # ── Endpoints ──────────────────────────────
+    def _create_index(self, body: bytes):
+        spec = json.loads(body)
+        try:
+            self.store.create_index(spec["index_name"], spec["dim"], spec.get("space_type", "cosine"),
+                                    precision=spec.get("precision"))
+        except ValueError as e:
+            return 409, "application/json", json.dumps({"error": str(e)}).encode("utf-8")
+        return 200, "text/plain", b"Index created successfully"
+
+    def _list_indexes(self, body: bytes):
+        return 200, "application/json", json.dumps(self.store.list_indexes()).encode("utf-8")
+
+    def _delete_index(self, body: bytes, name: str):
+        self.store.delete_index(name)
+        return 200, "text/plain", f"Index {name} deleted successfully".encode("utf-8")
+
+    def _index_info(self, body: bytes, name: str):
+        info = self.store.get_index(name).describe()
+        return 200, "application/json", json.dumps({
+            "name": name,
+            "lib_token": "fake-endee",
+            "total_elements": info["count"],
+            "space_type": info["space_type"],
+            "dimension": info["dimension"],
+            "precision": info["precision"],
+            "M": 16,
+            "ef_con": 128,
+            "sparse_model": "None",     # what the server reports for dense-only indexes
+        }).encode("utf-8")
+
+    def _insert(self, body: bytes, name: str):
+        rows = msgpack.unpackb(body, raw=False)
+        # [id, json_zip(meta), filter_json, norm, vector] — the SDK normalized the vector
+        self.store.get_index(name).upsert([
+            {"id": row[0], "meta": json_unzip(row[1]), "vector": row[4]} for row in rows
+        ])
+        return 200, "text/plain", b"Vectors inserted successfully"
+
+    def _search(self, body: bytes, name: str):
+        request = json.loads(body)
+        results = self.store.get_index(name).query(
+            vector=request["vector"], top_k=request.get("k", 10),
+            include_vectors=request.get("include_vectors", False)
+        )
+        rows = [
+            [r["similarity"], r["id"], json_zip(r["meta"]), orjson.dumps({}).decode("utf-8"), 1.0, r["vector"]]
+            for r in results
+        ]
+        return 200, "application/msgpack", msgpack.packb(rows, use_bin_type=True)
+
+    def _delete_vector(self, body: bytes, name: str, vector_id: str):
+        deleted = self.store.get_index(name).delete_vector(vector_id)
+        return 200, "text/plain", deleted.split()[0].encode("utf-8")
+
+
+class FakeEndeeServer:
+    """
+    Threaded fake Endee server on 127.0.0.1 (port 0 = any free port).
+    Use as a context manager, or start() / stop().
+    """
+
+    def __init__(self, port: int = 0, root: str = None):
+        self.root = root or tempfile.mkdtemp(prefix="fake-endee-")
+        handler = type("Handler", (_Handler,), {"store": LocalVectorStore(self.root)})
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeEndeeServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=8080)
+    args = parser.parse_args()
+    server = FakeEndeeServer(args.port).start()
+    print(f"Fake Endee listening on {server.url} (data in {server.root}). Ctrl+C to stop.")
+    try:
+        server._thread.join()
+    except KeyboardInterrupt:
+        server.stop()
@@ -0,0 +1,54 @@
+# benchmarks/fake_groq.py
+# Stand-in for the Groq client: same chat.completions.create() surface that
+# llm_handler uses, with a configurable time-to-first-token and per-token delay
+# so benchmarks measure our pipeline, not the network or a rate limit
+# Install with install_fake_groq() before any llm_handler call
+
+import time
+from types import SimpleNamespace
+from typing import Dict, List
+
+
+class _Completions:
+    def __init__(self, ttft_ms: float, token_ms: float, tokens: int):
+        self.ttft_ms = ttft_ms
+        self.token_ms = token_ms
+        self.tokens = tokens
+        self.calls = 0
+
+    def _tokens(self, messages: List[Dict]) -> List[str]:
+        # Echo a slice of the prompt so answers differ per question and aren't empty
+        words = messages[-1]["content"].split()[:self.tokens] or ["ok"]
+        return [word + " " for word in words]
+
+    def _stream(self, tokens: List[str]):
+        time.sleep(self.ttft_ms / 1000)
+        for i, token in enumerate(tokens):
+            if i:
+                time.sleep(self.token_ms / 1000)
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=token))])
+
+    def create(self, model: str, messages: List[Dict], stream: bool = False, **_ignored):
+        self.calls += 1
+        tokens = self._tokens(messages)
+        if stream:
+            return self._stream(tokens)
+        time.sleep((self.ttft_ms + self.token_ms * (len(tokens) - 1)) / 1000)
+        message = SimpleNamespace(content="".join(tokens).strip())
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+
+class FakeGroq:
+    """Fake Groq client — llm_handler only touches client.chat.completions.create()."""
+
+    def __init__(self, ttft_ms: float = 150.0, token_ms: float = 2.0, tokens: int = 120):
+        self.chat = SimpleNamespace(completions=_Completions(ttft_ms, token_ms, tokens))
+
+
+def install_fake_groq(**kwargs) -> FakeGroq:
+    """Make llm_handler use a FakeGroq (and skip its missing-API-key guard)."""
+    import llm_handler
+    client = FakeGroq(**kwargs)
+    llm_handler._client = client
+    llm_handler.GROQ_API_KEY = llm_handler.GROQ_API_KEY or "fake-groq"
+    return client
@@ -0,0 +1,58 @@
+# benchmarks/synthetic_docs.py
+# Generates PDF and DOCX files of a controlled size for the benchmarks
+# Text is seeded prose from a small technical vocabulary — every seed gives a
+# different document, so embedding caches can't hide the cost of re-ingesting
+
+import random
+
+WORDS = ("vector index query document page section chunk model token embedding "
+         "retrieval latency throughput cache batch manual contract report pump valve "
+         "pressure assembly torque warranty clause invoice schedule supplier audit").split()
+
+LINES_PER_PAGE = 50          # ~3.5k chars per page, a dense technical manual
+WORDS_PER_LINE = 12
+
+
+def _sentence(rng: random.Random, page: int, line: int) -> str:
+    words = " ".join(rng.choice(WORDS) for _ in range(WORDS_PER_LINE))
+    return f"Section {page}.{line}: {words}."
+
+
+def page_lines(page: int, seed: int = 0):
+    rng = random.Random(seed * 1_000_003 + page)
+    return [_sentence(rng, page, line) for line in range(LINES_PER_PAGE)]
+
+
+def make_pdf(path: str, pages: int, seed: int = 0) -> str:
+    """A `pages`-page PDF with one dense text box per page."""
+    import fitz
+    with fitz.open() as doc:
+        for p in range(pages):
+            page = doc.new_page()
+            page.insert_textbox(fitz.Rect(36, 36, 576, 806), "\n".join(page_lines(p, seed)), fontsize=7)
+        doc.save(path)
+    return path
+
+
+def make_docx(path: str, pages: int, seed: int = 0) -> str:
+    """A DOCX holding the same amount of text as a `pages`-page PDF (a heading and paragraphs per page)."""
+    from docx import Document
+    doc = Document()
+    for p in range(pages):
+        doc.add_heading(f"Chapter {p + 1}", level=2)
+        lines = page_lines(p, seed)
+        for start in range(0, len(lines), 5):
+            doc.add_paragraph(" ".join(lines[start:start + 5]))
+    doc.save(path)
+    return path
+
+
+def make_document(path: str, pages: int, seed: int = 0) -> str:
+    return make_docx(path, pages, seed) if path.endswith(".docx") else make_pdf(path, pages, seed)
+
+
+def make_questions(n: int, seed: int = 0):
+    """Distinct questions — repeated text would be served by the query-embedding cache."""
+    rng = random.Random(seed)
+    return [f"What does section {rng.randrange(50)}.{i} say about {rng.choice(WORDS)} "
+            f"and {rng.choice(WORDS)}?" for i in range(n)]
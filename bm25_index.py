@@ -0,0 +1,257 @@
+# bm25_index.py
+# Compact BM25 inverted index, built at ingest time and persisted per index name
+# Catches exact part numbers, error codes and names that vector search misses
+# Postings are CSR arrays: offsets[term] .. offsets[term + 1] into doc_ids / tfs
+# Arrays and the vocab + chunk metadata (index.json) share one .npz file, so a
+# rebuild replaces both at once
+
+import io
+import os
+import re
+import json
+import tempfile
+import zipfile
+import threading
+from array import array
+from collections import Counter
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+from dotenv import load_dotenv
+from telemetry import get_logger, span
+
+load_dotenv()
+
+log = get_logger("BM25")
+
+BM25_DIR = os.getenv("BM25_DIR", ".docusphere_cache/bm25")
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Keeps identifiers like "AB-1234", "E.404" and "v2_final" as single tokens
+_TOKEN_RE = re.compile(r"[a-z0-9]+(?:[-_./][a-z0-9]+)*")
+
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN_RE.findall(text.lower())
+
+
+def _postings(rows: np.ndarray, n_terms: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """(term_id, doc_id, tf) rows → CSR offsets, doc_ids and tfs, grouped by term."""
+    if len(rows):
+        rows = rows[np.lexsort((rows[:, 1], rows[:, 0]))]
+        term_ids, doc_ids, tfs = rows[:, 0], rows[:, 1], rows[:, 2]
+    else:
+        term_ids = doc_ids = tfs = np.empty(0, dtype=np.int64)
+    offsets = np.searchsorted(term_ids, np.arange(n_terms + 1)).astype(np.int64)
+    return (offsets, doc_ids.astype(np.int32),
+            np.minimum(tfs, np.iinfo(np.uint16).max).astype(np.uint16))
+
+
+def _save(index_name: str, arrays: Dict[str, np.ndarray], write_json: Callable):
+    """
+    Write an index's arrays and its vocab + metas (streamed by write_json(file)
+    into an index.json member) to one .npz, replaced in a single step.
+    """
+    os.makedirs(BM25_DIR, exist_ok=True)
+    base = os.path.join(BM25_DIR, index_name)
+    np.savez(f"{base}.tmp.npz", **arrays)
+    with zipfile.ZipFile(f"{base}.tmp.npz", "a") as archive, \
+            archive.open("index.json", "w") as raw, io.TextIOWrapper(raw, encoding="utf-8") as f:
+        write_json(f)
+    os.replace(f"{base}.tmp.npz", f"{base}.npz")
+    try:
+        os.remove(f"{base}.json")     # written by older versions next to the arrays
+    except OSError:
+        pass
+
+
+class BM25Index:
+    """Immutable BM25 index over one Endee index's chunks."""
+
+    def __init__(self, vocab: Dict[str, int], offsets: np.ndarray, doc_ids: np.ndarray,
+                 tfs: np.ndarray, doc_lens: np.ndarray, metas: List[Dict]):
+        self.vocab = vocab
+        self.offsets = offsets
+        self.doc_ids = doc_ids
+        self.tfs = tfs
+        self.doc_lens = doc_lens
+        self.metas = metas
+        self.n_docs = len(doc_lens)
+        self.avg_len = float(doc_lens.mean()) if self.n_docs else 0.0
+
+        df = np.diff(offsets).astype(np.float32)
+        self.idf = np.log1p((self.n_docs - df + 0.5) / (df + 0.5)).astype(np.float32)
+        # Per-document length normalisation, precomputed once
+        self._norm = (BM25_K1 * (1 - BM25_B + BM25_B * doc_lens / max(self.avg_len, 1e-6))
+                      ).astype(np.float32)
+
+    @classmethod
+    def build(cls, texts: List[str], metas: List[Dict]) -> "BM25Index":
+        vocab: Dict[str, int] = {}
+        rows: List[Tuple[int, int, int]] = []    # (term_id, doc_id, tf)
+        doc_lens = np.zeros(len(texts), dtype=np.float32)
+
+        for doc_id, text in enumerate(texts):
+            tokens = tokenize(text)
+            doc_lens[doc_id] = len(tokens)
+            for term, tf in Counter(tokens).items():
+                term_id = vocab.setdefault(term, len(vocab))
+                rows.append((term_id, doc_id, tf))
+
+        offsets, doc_ids, tfs = _postings(np.asarray(rows, dtype=np.int64).reshape(-1, 3), len(vocab))
+        return cls(vocab, offsets, doc_ids, tfs, doc_lens, metas)
+
+    def search(self, query: str, top_k: int = 5) -> List[Tuple[float, Dict]]:
+        """Top-k (score, meta) pairs for the query."""
+        term_ids = [self.vocab[t] for t in set(tokenize(query)) if t in self.vocab]
+        if not term_ids or not self.n_docs:
+            return []
+
+        scores = np.zeros(self.n_docs, dtype=np.float32)
+        for term_id in term_ids:
+            lo, hi = self.offsets[term_id], self.offsets[term_id + 1]
+            docs = self.doc_ids[lo:hi]
+            tf = self.tfs[lo:hi].astype(np.float32)
+            scores[docs] += self.idf[term_id] * tf * (BM25_K1 + 1) / (tf + self._norm[docs])
+
+        matched = np.flatnonzero(scores)
+        if not len(matched):
+            return []
+        k = min(top_k, len(matched))
+        top = matched[np.argpartition(-scores[matched], k - 1)[:k]]
+        top = top[np.argsort(-scores[top])]
+        return [(float(scores[i]), self.metas[i]) for i in top]
+
+    # ── persistence ─────────────────────────
+    def save(self, index_name: str):
+        _save(index_name, {"offsets": self.offsets, "doc_ids": self.doc_ids, "tfs": self.tfs,
+                           "doc_lens": self.doc_lens},
+              lambda f: json.dump({"vocab": self.vocab, "metas": self.metas}, f))
+
+    @classmethod
+    def load(cls, index_name: str) -> Optional["BM25Index"]:
+        try:
+            with open(os.path.join(BM25_DIR, f"{index_name}.npz"), "rb") as f:
+                return cls._read(f, index_name)
+        except (OSError, ValueError, KeyError):
+            return None
+
+    @classmethod
+    def _read(cls, f, index_name: str) -> "BM25Index":
+        arrays = np.load(f)
+        if "index.json" in arrays.files:
+            data = json.loads(arrays["index.json"])
+        else:
+            # Saved by an older version, with the JSON in a separate file
+            with open(os.path.join(BM25_DIR, f"{index_name}.json"), "r", encoding="utf-8") as meta:
+                data = json.load(meta)
+        return cls(data["vocab"], arrays["offsets"], arrays["doc_ids"], arrays["tfs"],
+                   arrays["doc_lens"], data["metas"])
+
+
+class BM25Builder:
+    """
+    Builds an index one chunk at a time, e.g. as chunks leave the ingest pipeline.
+    Postings go into compact arrays and metadata to a temporary spool, so no
+    chunk text stays in memory once it has been added.
+    """
+
+    def __init__(self):
+        self.vocab: Dict[str, int] = {}
+        self._rows = array("q")        # term_id, doc_id, tf — flattened
+        self._doc_lens = array("f")
+        self._metas = tempfile.TemporaryFile("w+", encoding="utf-8")
+
+    @property
+    def n_docs(self) -> int:
+        return len(self._doc_lens)
+
+    def add(self, text: str, meta: Dict):
+        doc_id = len(self._doc_lens)
+        tokens = tokenize(text)
+        self._doc_lens.append(len(tokens))
+        for term, tf in Counter(tokens).items():
+            self._rows.extend((self.vocab.setdefault(term, len(self.vocab)), doc_id, tf))
+        self._metas.write(json.dumps(meta) + "\n")
+
+    def _write_json(self, f):
+        # The metas are copied from the spool line by line, never loaded as a list
+        f.write('{"vocab": ')
+        json.dump(self.vocab, f)
+        f.write(', "metas": [')
+        self._metas.seek(0)
+        for i, line in enumerate(self._metas):
+            f.write(("," if i else "") + line.rstrip("\n"))
+        f.write("]}")
+
+    def save(self, index_name: str):
+        rows = np.frombuffer(self._rows, dtype=np.int64).reshape(-1, 3)
+        offsets, doc_ids, tfs = _postings(rows, len(self.vocab))
+        _save(index_name, {"offsets": offsets, "doc_ids": doc_ids, "tfs": tfs,
+                           "doc_lens": np.frombuffer(self._doc_lens, dtype=np.float32)},
+              self._write_json)
+
+    def close(self):
+        self._metas.close()
+
+
+# Loaded indexes by file version (inode, mtime), reloaded when a re-ingest replaces the file
+_loaded: Dict[str, Tuple[Tuple[int, int], BM25Index]] = {}
+_loaded_lock = threading.Lock()
+
+
+def build_bm25(index_name: str, texts: List[str], metas: List[Dict]):
+    """Build and persist the BM25 index for an Endee index's full chunk set."""
+    try:
+        with span("bm25.build"):
+            index = BM25Index.build(texts, metas)
+            index.save(index_name)
+        log.info(f"Indexed {index.n_docs} chunks, {len(index.vocab)} terms for '{index_name}'.")
+    except Exception as e:
+        log.warning(f"Build failed: {e}")
+
+
+def save_bm25(index_name: str, builder: BM25Builder):
+    """Persist an index built chunk by chunk (see BM25Builder), then release the builder."""
+    try:
+        with span("bm25.build"):
+            builder.save(index_name)
+        log.info(f"Indexed {builder.n_docs} chunks, {len(builder.vocab)} terms for '{index_name}'.")
+    except Exception as e:
+        log.warning(f"Build failed: {e}")
+    finally:
+        builder.close()
+
+
+def get_bm25(index_name: str) -> Optional[BM25Index]:
+    """Cached BM25 index for an index name, or None if none was built."""
+    try:
+        f = open(os.path.join(BM25_DIR, f"{index_name}.npz"), "rb")
+    except OSError:
+        return None
+    with f:
+        # Version and content both come from this open file, so they always match
+        stat = os.fstat(f.fileno())
+        version = (stat.st_ino, stat.st_mtime_ns)
+        with _loaded_lock:
+            cached = _loaded.get(index_name)
+            if cached and cached[0] == version:
+                return cached[1]
+        try:
+            index = BM25Index._read(f, index_name)
+        except (OSError, ValueError, KeyError):
+            return None
+    with _loaded_lock:
+        _loaded[index_name] = (version, index)
+    return index
+
+
+def delete_bm25(index_name: str):
+    with _loaded_lock:
+        _loaded.pop(index_name, None)
+    for ext in (".npz", ".json"):
+        try:
+            os.remove(os.path.join(BM25_DIR, index_name + ext))
+        except OSError:
+            pass
@@ -0,0 +1,171 @@
+# chunker.py
+# Span-based text chunker with page provenance
+# Works on (start, end) offsets over a sequence of page texts instead of one
+# giant concatenated string. The only copies made are the chunk_size windows
+# being split, and each chunk knows the pages it starts and ends on.
+
+import re
+from bisect import bisect_right
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+CHUNK_SIZE = 1000
+CHUNK_OVERLAP = 150
+# Same priorities as the RecursiveCharacterTextSplitter this replaces;
+# a window with none of them is hard-split at CHUNK_SIZE
+SEPARATORS = ["\n\n", "\n", ".", " "]
+PAGE_BREAK = "\n\n"      # pages are joined (virtually) by a paragraph break
+
+_WHITESPACE_RE = re.compile(r"\s")
+
+Page = Tuple[Optional[int], str]     # (page number or None, page text)
+
+
+class Chunk:
+    """A [start, end) span over the chunker's pages, with its text and page range."""
+
+    __slots__ = ("text", "start", "end", "page_start", "page_end")
+
+    def __init__(self, text: str, start: int, end: int,
+                 page_start: Optional[int], page_end: Optional[int]):
+        self.text = text
+        self.start = start
+        self.end = end
+        self.page_start = page_start
+        self.page_end = page_end
+
+    def __repr__(self):
+        return f"Chunk({self.start}:{self.end}, pages {self.page_start}-{self.page_end})"
+
+
+class SpanChunker:
+    """
+    Incremental chunker. feed() pages as they are extracted and collect the
+    chunks it returns; finish() flushes the tail. Only pages that the next
+    window can still touch are retained, so memory stays at a few pages.
+
+    Splitting rule per window [pos, pos + chunk_size): cut after the last
+    separator of the highest priority that leaves a chunk longer than the
+    overlap; the next chunk starts up to chunk_overlap chars earlier, at a
+    whitespace boundary.
+    """
+
+    def __init__(self, chunk_size: int = CHUNK_SIZE, chunk_overlap: int = CHUNK_OVERLAP,
+                 separators: List[str] = SEPARATORS):
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.separators = separators
+        self._starts: List[int] = []            # global offset of each retained page
+        self._texts: List[str] = []
+        self._numbers: List[Optional[int]] = []
+        self._end = 0                           # global offset after the last fed page
+        self._pos = 0                           # start of the next chunk
+
+    # ── page buffer ─────────────────────────
+    def _slice(self, start: int, end: int) -> str:
+        """Text for a global [start, end) range — copies only that range."""
+        i = max(bisect_right(self._starts, start) - 1, 0)
+        parts = []
+        while i < len(self._texts) and self._starts[i] < end:
+            page_start = self._starts[i]
+            text = self._texts[i]
+            parts.append(text[max(start - page_start, 0):end - page_start])
+            i += 1
+        return "".join(parts)
+
+    def _page_at(self, offset: int) -> Optional[int]:
+        i = max(bisect_right(self._starts, offset) - 1, 0)
+        return self._numbers[i] if self._numbers else None
+
+    def _prune(self):
+        """Drop pages that end before the next chunk's start."""
+        keep = 0
+        while keep + 1 < len(self._starts) and self._starts[keep + 1] <= self._pos:
+            keep += 1
+        if keep:
+            del self._starts[:keep], self._texts[:keep], self._numbers[:keep]
+
+    # ── splitting ───────────────────────────
+    def _next_chunk(self, final: bool) -> Optional[Chunk]:
+        while True:
+            if self._pos >= self._end:
+                return None
+            # Streaming: only decide once text beyond the window exists,
+            # so the result is identical to chunking everything at once
+            if not final and self._end <= self._pos + self.chunk_size:
+                return None
+
+            window_end = min(self._pos + self.chunk_size, self._end)
+            window = self._slice(self._pos, window_end)
+            stripped = window.lstrip()
+            if len(stripped) != len(window):
+                self._pos += len(window) - len(stripped)
+                continue
+            break
+
+        is_last = window_end == self._end
+        if is_last:
+            cut = len(window)
+        else:
+            cut = len(window)
+            for sep in self.separators:
+                i = window.rfind(sep, self.chunk_overlap + 1)
+                if i != -1:
+                    cut = i + len(sep) if sep == "." else i
+                    break
+
+        text = window[:cut].rstrip()
+        start = self._pos
+        chunk = Chunk(text, start, start + len(text),
+                      self._page_at(start), self._page_at(start + max(len(text) - 1, 0)))
+
+        if is_last:
+            self._pos = self._end
+        else:
+            overlap_from = max(cut - self.chunk_overlap, 1)
+            match = _WHITESPACE_RE.search(window, overlap_from, cut)
+            self._pos = start + (match.end() if match else cut)
+        self._prune()
+        return chunk if text else self._next_chunk(final)
+
+    def feed(self, text: str, page_number: Optional[int] = None) -> List[Chunk]:
+        """Add one page; return any chunks that are now complete."""
+        if not text:
+            return []
+        if self._texts:
+            self._texts[-1] += PAGE_BREAK
+            self._end += len(PAGE_BREAK)
+        self._starts.append(self._end)
+        self._texts.append(text)
+        self._numbers.append(page_number)
+        self._end += len(text)
+
+        chunks = []
+        chunk = self._next_chunk(final=False)
+        while chunk is not None:
+            chunks.append(chunk)
+            chunk = self._next_chunk(final=False)
+        return chunks
+
+    def finish(self) -> List[Chunk]:
+        """Chunk whatever text is left."""
+        chunks = []
+        chunk = self._next_chunk(final=True)
+        while chunk is not None:
+            chunks.append(chunk)
+            chunk = self._next_chunk(final=True)
+        return chunks
+
+
+def iter_page_chunks(pages: Iterable[Page], chunk_size: int = CHUNK_SIZE,
+                     chunk_overlap: int = CHUNK_OVERLAP) -> Iterator[Chunk]:
+    """Chunk a stream of (page number, text) pairs."""
+    chunker = SpanChunker(chunk_size, chunk_overlap)
+    for page_number, text in pages:
+        yield from chunker.feed(text, page_number)
+    yield from chunker.finish()
+
+
+def split_text(text: str, chunk_size: int = CHUNK_SIZE,
+               chunk_overlap: int = CHUNK_OVERLAP) -> List[str]:
+    """Drop-in for RecursiveCharacterTextSplitter.split_text on a single string."""
+    return [c.text for c in iter_page_chunks([(None, text)], chunk_size, chunk_overlap)]
@@ -0,0 +1,115 @@
+# context_packer.py
+# Token-budgeted context packing for the answer prompt
+# Neighbouring chunks (adjacent chunk_id, same source) are merged and their
+# 150-char splitter overlap is stripped, so shared text is only paid for once
+# Passages are labelled with the page range recorded by the chunker
+
+import os
+from typing import Dict, List, Tuple
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "3000"))
+CHARS_PER_TOKEN = 4          # rough estimate for English text with LLaMA tokenizers
+MAX_OVERLAP_CHARS = 400      # chunk_overlap is 150; leave room for separator drift
+MIN_OVERLAP_CHARS = 16       # shorter matches are treated as coincidence
+
+
+def estimate_tokens(text: str) -> int:
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def overlap_length(left: str, right: str) -> int:
+    """Length of the longest suffix of `left` that is also a prefix of `right`."""
+    longest = min(len(left), len(right), MAX_OVERLAP_CHARS)
+    for k in range(longest, MIN_OVERLAP_CHARS - 1, -1):
+        if left.endswith(right[:k]):
+            return k
+    return 0
+
+
+def _page_label(chunks: List[Dict]) -> str:
+    """"[Page 3]" / "[Pages 3-4]" for chunks with page metadata, else ""."""
+    starts = [c["page_start"] for c in chunks if c.get("page_start") is not None]
+    ends = [c["page_end"] for c in chunks if c.get("page_end") is not None]
+    if not starts:
+        return ""
+    first, last = min(starts), max(ends or starts)
+    return f"[Page {first}]\n" if first == last else f"[Pages {first}-{last}]\n"
+
+
+def _merge_run(chunks: List[Dict]) -> str:
+    """Join consecutive chunks, dropping each chunk's overlap with the previous one."""
+    merged = chunks[0]["text"]
+    for chunk in chunks[1:]:
+        text = chunk["text"]
+        k = overlap_length(merged, text)
+        merged = merged + text[k:] if k else merged + "\n" + text
+    return _page_label(chunks) + merged
+
+
+def pack_context(context_chunks: List[Dict],
+                 token_budget: int = CONTEXT_TOKEN_BUDGET) -> Tuple[List[str], Dict]:
+    """
+    Merge adjacent chunks and fill the token budget in relevance order.
+
+    context_chunks: metadata dicts from Endee, best match first.
+    Returns (context_texts, stats) where stats holds
+        {"raw_tokens", "packed_tokens", "saved_tokens", "dropped_tokens", "chunks", "passages"}.
+    saved_tokens is what merging and de-duplication removed; dropped_tokens
+    is what didn't fit the budget.
+    """
+    chunks = [c for c in context_chunks if c.get("text")]
+    raw_tokens = sum(estimate_tokens(c["text"]) for c in chunks)
+
+    # Group by source, remembering each chunk's relevance rank
+    by_source: Dict[Tuple, List[Tuple[int, int, Dict]]] = {}
+    for rank, chunk in enumerate(chunks):
+        key = (chunk.get("source"), chunk.get("topic"))
+        chunk_id = chunk.get("chunk_id")
+        by_source.setdefault(key, []).append((chunk_id, rank, chunk))
+
+    # Within a source, runs of consecutive chunk_ids become one passage
+    passages: List[Tuple[int, str]] = []
+    for members in by_source.values():
+        if any(chunk_id is None for chunk_id, _, _ in members):
+            passages.extend((rank, _merge_run([chunk])) for _, rank, chunk in members)
+            continue
+        members.sort(key=lambda m: (m[0], m[1]))
+        run = [members[0]]
+        for member in members[1:]:
+            if member[0] == run[-1][0]:
+                continue    # same chunk retrieved twice
+            if member[0] == run[-1][0] + 1:
+                run.append(member)
+            else:
+                passages.append((min(r for _, r, _ in run), _merge_run([t for _, _, t in run])))
+                run = [member]
+        passages.append((min(r for _, r, _ in run), _merge_run([t for _, _, t in run])))
+
+    # Fill the budget, most relevant passage first
+    passages.sort(key=lambda p: p[0])
+    merged_tokens = sum(estimate_tokens(text) for _, text in passages)
+    packed, used = [], 0
+    for _, text in passages:
+        tokens = estimate_tokens(text)
+        if used + tokens > token_budget:
+            if not packed:
+                text = text[:token_budget * CHARS_PER_TOKEN]
+                packed.append(text)
+                used += estimate_tokens(text)
+            break
+        packed.append(text)
+        used += tokens
+
+    stats = {
+        "raw_tokens": raw_tokens,
+        "packed_tokens": used,
+        "saved_tokens": max(raw_tokens - merged_tokens, 0),
+        "dropped_tokens": max(merged_tokens - used, 0),
+        "chunks": len(chunks),
+        "passages": len(packed),
+    }
+    return packed, stats
@@ -1,59 +1,196 @@
 # document_processor.py
 # Handles parsing and chunking of PDF and DOCX files
 # Extracts clean text and splits into manageable chunks for embedding
+# PyMuPDF and python-docx are imported on first use, not at app start
+# Every reader takes a file path or the file's bytes (bytes / memoryview, e.g.
+# an upload's buffer), which are parsed in place without a temp file
 
-import fitz  # PyMuPDF
-from docx import Document
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from typing import List, Dict
+from typing import List, Dict, Iterable, Iterator, Optional, Tuple, Union
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import io
 import os
+from dotenv import load_dotenv
+from telemetry import get_logger, span, timed_iter
 
+from chunker import Chunk, SpanChunker, split_text
 
-# Initialize text splitter
-text_splitter = RecursiveCharacterTextSplitter(
-    chunk_size=1000,
-    chunk_overlap=150,
-    separators=["\n\n", "\n", ".", " ", ""]
-)
+load_dotenv()
 
+log = get_logger("DocProcessor")
+
+
+# (page number, page text) — page number is None where the format has no pages
+Page = Tuple[Optional[int], str]
+
+# A file path, or the document's bytes
+DocumentSource = Union[str, bytes, bytearray, memoryview]
+
+# DOCX has no pages — paragraphs are grouped into unnumbered pseudo-pages of this many
+DOCX_PARAGRAPHS_PER_PAGE = 50
+
+# Parallel PDF extraction — 1 keeps the serial path
+# Documents shorter than PDF_PARALLEL_MIN_PAGES are always extracted serially,
+# since process start-up costs more than it saves on small files
+PDF_EXTRACT_WORKERS = int(os.getenv("PDF_EXTRACT_WORKERS", "1"))
+PDF_PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "64"))
+PDF_PAGES_PER_TASK = 16
+
+
+def _open_pdf(source: DocumentSource):
+    """
+    fitz document for a path or in-memory PDF.
+    bytes and memoryview are parsed in place; a bytearray is copied by PyMuPDF.
+    """
+    import fitz  # PyMuPDF
+    if isinstance(source, str):
+        return fitz.open(source)
+    return fitz.open(stream=source, filetype="pdf")
+
+
+def count_pdf_pages(source: DocumentSource) -> int:
+    """Page count without extracting any text."""
+    with _open_pdf(source) as doc:
+        return len(doc)
+
+
+def page_text(page: Page) -> str:
+    """A page as it appears in the extracted document text — PDF pages carry a [Page N] marker."""
+    number, text = page
+    return text if number is None else f"\n[Page {number}]\n{text}"
 
-def extract_text_from_pdf(file_path: str, max_pages: int = 50) -> str:
-    """Extract text from PDF. Max 50 pages to keep performance stable."""
-    text = ""
-    try:
-        doc = fitz.open(file_path)
-        total_pages = len(doc)
 
-        if total_pages > max_pages:
-            print(f"[DocProcessor] Document has {total_pages} pages. Processing first {max_pages} only.")
+# In-memory PDF handed to each pool worker once, by _set_worker_pdf
+_worker_pdf: Optional[bytes] = None
 
-        pages_to_process = min(total_pages, max_pages)
 
-        for page_num in range(pages_to_process):
-            page = doc[page_num]
-            page_text = page.get_text()
+def _set_worker_pdf(data: bytes):
+    global _worker_pdf
+    _worker_pdf = data
+
+
+def _extract_page_range(file_path: Optional[str], start: int, end: int) -> List[Page]:
+    """
+    Process-pool worker — opens its own fitz document and extracts pages [start, end).
+    file_path None means the in-memory PDF this worker was initialized with.
+    """
+    pages = []
+    with _open_pdf(file_path if file_path is not None else _worker_pdf) as doc:
+        for page_num in range(start, end):
+            page_text = doc[page_num].get_text()
             if page_text.strip():
-                text += f"\n[Page {page_num + 1}]\n{page_text}"
+                pages.append((page_num + 1, page_text))
+    return pages
+
+
+def _iter_pages_parallel(source: DocumentSource, pages_to_process: int, workers: int) -> Iterator[Page]:
+    """
+    Split the page range into PDF_PAGES_PER_TASK-page tasks across a process pool.
+    At most 2 × workers tasks are in flight, and results are yielded in page
+    order, so a 1000-page document never sits in memory all at once.
+    An in-memory PDF is sent to each worker once, not with every task.
+    """
+    ranges = (
+        (start, min(start + PDF_PAGES_PER_TASK, pages_to_process))
+        for start in range(0, pages_to_process, PDF_PAGES_PER_TASK)
+    )
+    if isinstance(source, str):
+        file_path, pool_args = source, {}
+    else:
+        file_path, pool_args = None, {"initializer": _set_worker_pdf, "initargs": (bytes(source),)}
+    with ProcessPoolExecutor(max_workers=workers, **pool_args) as pool:
+        in_flight = deque()
+        for start, end in ranges:
+            in_flight.append(pool.submit(_extract_page_range, file_path, start, end))
+            if len(in_flight) >= workers * 2:
+                yield from in_flight.popleft().result()
+        while in_flight:
+            yield from in_flight.popleft().result()
+
+
+def iter_pdf_pages(source: DocumentSource, max_pages: Optional[int] = None,
+                   workers: int = PDF_EXTRACT_WORKERS) -> Iterator[Page]:
+    """
+    Yield (page number, page text) one page at a time, numbered from 1.
+    Empty pages are skipped. max_pages=None processes the whole document.
+    workers > 1 extracts page ranges in a process pool (large documents only).
+    """
+    with _open_pdf(source) as doc:
+        total_pages = len(doc)
+        pages_to_process = total_pages if max_pages is None else min(total_pages, max_pages)
 
-        doc.close()
-        print(f"[DocProcessor] Extracted text from {pages_to_process}/{total_pages} pages.")
+        if pages_to_process < total_pages:
+            log.info(f"Document has {total_pages} pages. Processing first {max_pages} only.")
+
+        if workers <= 1 or pages_to_process < PDF_PARALLEL_MIN_PAGES:
+            for page_num in range(pages_to_process):
+                page_text = doc[page_num].get_text()
+                if page_text.strip():
+                    yield page_num + 1, page_text
+
+    if workers > 1 and pages_to_process >= PDF_PARALLEL_MIN_PAGES:
+        yield from _iter_pages_parallel(source, pages_to_process, workers)
+
+    log.info(f"Extracted text from {pages_to_process}/{total_pages} pages.")
+
+
+def iter_docx_pages(source: DocumentSource) -> Iterator[Page]:
+    """Yield (None, text) groups of DOCX_PARAGRAPHS_PER_PAGE non-empty paragraphs."""
+    from docx import Document
+    # BytesIO shares a bytes object's buffer rather than copying it
+    doc = Document(source if isinstance(source, str) else io.BytesIO(source))
+    group = []
+    for para in doc.paragraphs:
+        if para.text.strip():
+            group.append(para.text + "\n")
+            if len(group) >= DOCX_PARAGRAPHS_PER_PAGE:
+                yield None, "".join(group)
+                group = []
+    if group:
+        yield None, "".join(group)
+    log.info("Extracted text from DOCX successfully.")
+
+
+def _extension(source: DocumentSource, filename: Optional[str]) -> str:
+    name = filename or (source if isinstance(source, str) else None)
+    if name is None:
+        raise ValueError("In-memory documents need a filename to detect their type")
+    return os.path.basename(name).split(".")[-1].lower()
+
+
+def iter_document_pages(source: DocumentSource, filename: Optional[str] = None) -> Iterator[Page]:
+    """
+    Dispatch to the page iterator for the document's type. Each page is an "extract" span.
+    In-memory documents need filename (e.g. "report.pdf") to tell the type.
+    """
+    extension = _extension(source, filename)
+    if extension == "pdf":
+        return timed_iter("extract", iter_pdf_pages(source))
+    if extension == "docx":
+        return timed_iter("extract", iter_docx_pages(source))
+    raise ValueError(f"Unsupported file type: {extension}")
+
+
+def extract_text_from_pdf(source: DocumentSource, max_pages: Optional[int] = None,
+                          workers: int = PDF_EXTRACT_WORKERS) -> str:
+    """
+    Extract text from PDF. max_pages=None extracts every page.
+    Pages are joined once, in page order, each prefixed with its [Page N] marker.
+    """
+    try:
+        return "".join(page_text(page) for page in iter_pdf_pages(source, max_pages, workers))
     except Exception as e:
-        print(f"[DocProcessor] PDF extraction error: {e}")
-    return text
+        log.warning(f"PDF extraction error: {e}")
+        return ""
 
 
-def extract_text_from_docx(file_path: str) -> str:
+def extract_text_from_docx(source: DocumentSource) -> str:
     """Extract all text from a DOCX file using python-docx."""
-    text = ""
     try:
-        doc = Document(file_path)
-        for para in doc.paragraphs:
-            if para.text.strip():
-                text += para.text + "\n"
-        print(f"[DocProcessor] Extracted text from DOCX successfully.")
+        return "".join(page_text(page) for page in iter_docx_pages(source))
     except Exception as e:
-        print(f"[DocProcessor] DOCX extraction error: {e}")
-    return text
+        log.warning(f"DOCX extraction error: {e}")
+        return ""
 
 
 def chunk_text(text: str) -> List[str]:
@@ -61,62 +198,72 @@ def chunk_text(text: str) -> List[str]:
     Split extracted text into smaller overlapping chunks.
     Smaller chunks = more precise retrieval during Q&A.
     """
-    chunks = text_splitter.split_text(text)
-    print(f"[DocProcessor] Created {len(chunks)} chunks.")
+    chunks = split_text(text)
+    log.info(f"Created {len(chunks)} chunks.")
     return chunks
 
 
-def process_document(file_path: str) -> Dict:
+def iter_chunks(pages: Iterable[Page]) -> Iterator[Chunk]:
+    """
+    Chunk a stream of (page number, text) pairs without holding the whole
+    document. Chunk boundaries and overlap carry across pages, and each
+    chunk records the pages it starts and ends on. Chunking each page is a "chunk" span.
+    """
+    chunker = SpanChunker()
+    for page_number, text in pages:
+        with span("chunk"):
+            chunks = chunker.feed(text, page_number)
+        yield from chunks
+    with span("chunk"):
+        chunks = chunker.finish()
+    yield from chunks
+
+
+def process_document(source: DocumentSource, filename: Optional[str] = None) -> Dict:
     """
-    Master function — takes a file path, detects type,
-    extracts text, chunks it, and returns everything needed
-    for embedding and storing in Endee.
+    Master function — takes a file path (or the file's bytes plus its
+    filename), detects type, extracts text, chunks it, and returns
+    everything needed for embedding and storing in Endee.
 
     Returns:
         {
             "filename": "report.pdf",
             "chunks": ["chunk1 text...", "chunk2 text...", ...],
-            "metadata": [{"text": "chunk1", "source": "report.pdf", "chunk_id": 0}, ...]
+            "metadata": [{"text": "chunk1", "source": "report.pdf", "chunk_id": 0,
+                          "page_start": 1, "page_end": 2}, ...]
         }
     """
-    filename = os.path.basename(file_path)
-    extension = filename.split(".")[-1].lower()
+    if filename is None and isinstance(source, str):
+        filename = os.path.basename(source)
 
-    # Extract based on file type
-    if extension == "pdf":
-        raw_text = extract_text_from_pdf(file_path)
-    elif extension == "docx":
-        raw_text = extract_text_from_docx(file_path)
-    else:
-        print(f"[DocProcessor] Unsupported file type: {extension}")
+    try:
+        chunks = list(iter_chunks(iter_document_pages(source, filename)))
+    except ValueError as e:
+        log.warning(f"{e}")
         return {}
-
-    if not raw_text.strip():
-        print("[DocProcessor] No text extracted from document.")
+    except Exception as e:
+        log.warning(f"Extraction error: {e}")
         return {}
 
-    # Chunk the text
-    chunks = chunk_text(raw_text)
-
-    # Safety cap — max 500 chunks to keep Endee fast
-    # and embedding time under control
-    if len(chunks) > 500:
-        print(f"[DocProcessor] Capping chunks from {len(chunks)} to 500.")
-        chunks = chunks[:500]
+    if not chunks:
+        log.warning("No text extracted from document.")
+        return {}
 
     # Build metadata for each chunk
     # Stored alongside vectors in Endee so we know the source on retrieval
     metadata = [
         {
-            "text": chunk,
+            "text": chunk.text,
             "source": filename,
-            "chunk_id": i
+            "chunk_id": i,
+            "page_start": chunk.page_start,
+            "page_end": chunk.page_end
         }
         for i, chunk in enumerate(chunks)
     ]
 
     return {
         "filename": filename,
-        "chunks": chunks,
+        "chunks": [chunk.text for chunk in chunks],
         "metadata": metadata
-    }
\ No newline at end of file
+    }
@@ -0,0 +1,151 @@
+# document_store.py
+# Shared, content-addressed store of full document text for summaries
+# Text is written once under a SHA-256 key (of the uploaded file's bytes, or of
+# the text itself) and sessions keep only the key, so memory does not grow with
+# the number of sessions and identical uploads share one entry. Entries are
+# files on disk, evicted least recently used past a size cap
+
+import os
+import re
+import hashlib
+import threading
+from typing import Optional
+
+from dotenv import load_dotenv
+from telemetry import get_logger, cache_result
+
+load_dotenv()
+
+log = get_logger("DocumentStore")
+
+DOCUMENT_STORE_DIR = os.getenv("DOCUMENT_STORE_DIR", ".docusphere_cache/documents")
+DOCUMENT_STORE_MAX_MB = float(os.getenv("DOCUMENT_STORE_MAX_MB", "256"))
+
+_KEY_RE = re.compile(r"[0-9a-f]{64}")
+
+
+def text_key(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class DocumentWriter:
+    """
+    Streams text into a store entry, e.g. page by page during ingestion.
+    Nothing is visible under the key until commit(); discard() drops it.
+    """
+
+    def __init__(self, store: "DocumentStore", key: str, path: str):
+        self.store = store
+        self.key = key
+        self.path = path
+        self._tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        self._file = open(self._tmp_path, "w", encoding="utf-8")
+
+    def write(self, text: str):
+        self._file.write(text)
+
+    def commit(self) -> str:
+        self._file.close()
+        os.replace(self._tmp_path, self.path)
+        self.store._evict(keep=self.path)
+        return self.key
+
+    def discard(self):
+        self._file.close()
+        try:
+            os.remove(self._tmp_path)
+        except OSError:
+            pass
+
+
+class DocumentStore:
+    """
+    One UTF-8 file per key. As in the research cache, file mtime doubles as
+    last-access time: reads touch the file, eviction removes the oldest.
+    """
+
+    def __init__(self, store_dir: str = DOCUMENT_STORE_DIR, max_mb: float = DOCUMENT_STORE_MAX_MB):
+        self.dir = store_dir
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self._lock = threading.Lock()
+        os.makedirs(self.dir, exist_ok=True)
+
+    def _path(self, key: str) -> Optional[str]:
+        # Keys come from clients of the service too — never let one name a path
+        if not isinstance(key, str) or not _KEY_RE.fullmatch(key):
+            return None
+        return os.path.join(self.dir, f"{key}.txt")
+
+    def touch(self, key: str) -> bool:
+        """Mark an entry as recently used; False if it isn't stored."""
+        path = self._path(key)
+        try:
+            os.utime(path)
+            return True
+        except (OSError, TypeError):
+            return False
+
+    def put(self, text: str, key: Optional[str] = None) -> str:
+        """Store text (once) and return its key — text_key(text) unless given."""
+        key = key or text_key(text)
+        path = self._path(key)
+        if path is None:
+            raise ValueError(f"Invalid document key: {key!r}")
+        if self.touch(key):
+            return key
+        writer = DocumentWriter(self, key, path)
+        writer.write(text)
+        return writer.commit()
+
+    def writer(self, key: str) -> DocumentWriter:
+        """A DocumentWriter for key — for text too large to hold in memory at once."""
+        path = self._path(key)
+        if path is None:
+            raise ValueError(f"Invalid document key: {key!r}")
+        return DocumentWriter(self, key, path)
+
+    def get(self, key: str) -> Optional[str]:
+        """Stored text, or None if the key is unknown or was evicted."""
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                text = f.read()
+        except (OSError, TypeError):
+            cache_result("document_text", hit=False)
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        cache_result("document_text", hit=True)
+        return text
+
+    def _evict(self, keep: str):
+        with self._lock:
+            entries = []
+            total = 0
+            for name in os.listdir(self.dir):
+                if not name.endswith(".txt"):
+                    continue
+                try:
+                    stat = os.stat(os.path.join(self.dir, name))
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, name))
+                total += stat.st_size
+            entries.sort()
+            for _, size, name in entries:
+                if total <= self.max_bytes:
+                    break
+                path = os.path.join(self.dir, name)
+                if path == keep:
+                    continue
+                try:
+                    os.remove(path)
+                    total -= size
+                    log.info(f"Evicted {name}.")
+                except OSError:
+                    pass
+
+
+document_store = DocumentStore()
@@ -1,34 +1,199 @@
 # embedder.py
 # Converts text chunks into numerical vectors using HuggingFace sentence-transformers
 # Model: all-MiniLM-L6-v2 (lightweight, fast, 384 dimensions)
+# sentence_transformers/torch are imported on first use, not at import time;
+# warm_up() loads the model (and the reranker, if enabled) in the background while the UI renders
 
-from sentence_transformers import SentenceTransformer
-from typing import List
+from typing import List, Optional
+import os
+import threading
+import numpy as np
 import streamlit as st
+from dotenv import load_dotenv
+from telemetry import get_logger, span, cache_result
+from embedding_cache import EmbeddingCache, content_key
+from query_batcher import QueryEmbedder
+
+load_dotenv()
+
+log = get_logger("Embedder")
+
+# Batching knobs for chunk encoding
+# EMBED_BUCKETED=0 falls back to a single model.encode call with default batching
+EMBED_BUCKETED = os.getenv("EMBED_BUCKETED", "1") == "1"
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "64"))
+EMBED_NUM_THREADS = int(os.getenv("EMBED_NUM_THREADS", "0"))   # 0 = backend default
+EMBED_TOKEN_BUDGET = int(os.getenv("EMBED_TOKEN_BUDGET", "16384"))  # padded tokens per batch
+
+# Inference backend: "torch" (SentenceTransformer), "onnx" (ONNX Runtime, no torch)
+# or "onnx-int8" (ONNX Runtime with int8 dynamic quantization)
+EMBED_BACKEND = os.getenv("EMBED_BACKEND", "torch").lower()
 
 
 # Load model once globally so it doesn't reload on every function call
 # This model is free, runs locally, no API key needed
 MODEL_NAME = "all-MiniLM-L6-v2"
+MODEL_DIMENSION = 384    # known up front, so cache hits never need the model loaded
+# int8 vectors differ slightly from the float model's, so they get their own cache
+CACHE_MODEL_ID = f"{MODEL_NAME}-int8" if EMBED_BACKEND == "onnx-int8" else MODEL_NAME
 @st.cache_resource   # Loads model ONCE and keeps it in memory
 def load_model():
+    if EMBED_BACKEND in ("onnx", "onnx-int8"):
+        from onnx_embedder import OnnxEmbedder
+        return OnnxEmbedder(MODEL_NAME, quantize=EMBED_BACKEND == "onnx-int8",
+                            num_threads=EMBED_NUM_THREADS)
+    from sentence_transformers import SentenceTransformer
     return SentenceTransformer(MODEL_NAME)
 
-model = load_model()
 
-def get_embeddings(texts: List[str]) -> List[List[float]]:
+_warm_up_thread: Optional[threading.Thread] = None
+_warm_up_lock = threading.Lock()
+
+
+def _load_models():
+    load_model()
+    # The cross-encoder too, so its load isn't charged to the first rerank's budget
+    from reranker import RERANK_ENABLED, load_reranker
+    if RERANK_ENABLED:
+        load_reranker()
+
+
+def warm_up() -> threading.Thread:
+    """
+    Load the model(s) in a background thread (once per process) so the first
+    question doesn't pay for it. Safe to call on every Streamlit rerun.
+    """
+    global _warm_up_thread
+    with _warm_up_lock:
+        if _warm_up_thread is None:
+            _warm_up_thread = threading.Thread(target=_load_models, name="embedder-warm-up", daemon=True)
+            try:
+                from streamlit.runtime.scriptrunner import add_script_run_ctx
+                add_script_run_ctx(_warm_up_thread)
+            except ImportError:
+                pass
+            _warm_up_thread.start()
+        return _warm_up_thread
+
+
+@st.cache_resource   # One on-disk cache shared by every session
+def load_embedding_cache():
+    return EmbeddingCache(CACHE_MODEL_ID, MODEL_DIMENSION)
+
+
+def _token_lengths(texts: List[str]) -> np.ndarray:
+    """Token count per text, as the model's tokenizer sees it (truncated to max_seq_length)."""
+    model = load_model()
+    encoded = model.tokenizer(texts, add_special_tokens=True, truncation=True,
+                              max_length=model.max_seq_length)
+    return np.fromiter((len(ids) for ids in encoded["input_ids"]), dtype=np.int64, count=len(texts))
+
+
+def _length_buckets(lengths: np.ndarray, batch_size: int, token_budget: int) -> List[np.ndarray]:
+    """
+    Sort texts by token length and cut the order into batches.
+    A batch closes when it reaches batch_size or when padding every member
+    to the longest one would exceed token_budget, so short chunks travel
+    in large batches and long chunks in small ones.
+    """
+    order = np.argsort(lengths, kind="stable")
+    buckets, start = [], 0
+    for end in range(1, len(order) + 1):
+        size = end - start
+        longest = lengths[order[end - 1]]
+        if size > 1 and (size > batch_size or size * longest > token_budget):
+            buckets.append(order[start:end - 1])
+            start = end - 1
+    if start < len(order):
+        buckets.append(order[start:])
+    return buckets
+
+
+def encode_bucketed(texts: List[str], batch_size: int = EMBED_BATCH_SIZE,
+                    num_threads: int = EMBED_NUM_THREADS,
+                    token_budget: int = EMBED_TOKEN_BUDGET) -> np.ndarray:
+    """
+    Encode texts in length-sorted buckets to cut padding waste.
+    Returns a contiguous (len(texts), dim) float32 array in input order.
+    """
+    out = np.empty((len(texts), MODEL_DIMENSION), dtype=np.float32)
+    if not texts:
+        return out
+    model = load_model()
+
+    if num_threads > 0 and EMBED_BACKEND == "torch":
+        import torch
+        torch.set_num_threads(num_threads)
+
+    lengths = _token_lengths(texts)
+    for bucket in _length_buckets(lengths, batch_size, token_budget):
+        out[bucket] = model.encode(
+            [texts[i] for i in bucket],
+            batch_size=len(bucket),
+            convert_to_numpy=True,
+            show_progress_bar=False
+        )
+    return out
+
+
+def encode_texts(texts: List[str], bucketed: Optional[bool] = None) -> np.ndarray:
+    """Encode texts with the configured strategy. Always returns float32 ndarray."""
+    if bucketed is None:
+        bucketed = EMBED_BUCKETED
+    if bucketed:
+        return encode_bucketed(texts)
+    embeddings = load_model().encode(texts, batch_size=EMBED_BATCH_SIZE, show_progress_bar=True)
+    return np.ascontiguousarray(embeddings, dtype=np.float32)
+
+
+def get_embeddings(texts: List[str]) -> np.ndarray:
     """
     Convert a list of text chunks into embeddings.
-    Returns list of vectors, each with 384 dimensions.
+    Returns a (len(texts), 384) float32 array — kept as NumPy so it can be
+    handed straight to insert_vectors without building Python float lists.
+    Chunks already seen by this model are served from the on-disk cache;
+    only cache misses are sent to the model.
     """
-    embeddings = model.encode(texts, show_progress_bar=True)
-    return embeddings.tolist()  # Convert numpy array to plain Python list
+    embedding_cache = load_embedding_cache()
+    keys = [content_key(CACHE_MODEL_ID, text) for text in texts]
+    cached = embedding_cache.get_many(keys)
+    missing = [i for i, vector in enumerate(cached) if vector is None]
+    cache_result("embedding", hit=True, amount=len(texts) - len(missing))
+    cache_result("embedding", hit=False, amount=len(missing))
+
+    embeddings = np.empty((len(texts), MODEL_DIMENSION), dtype=np.float32)
+    for i, vector in enumerate(cached):
+        if vector is not None:
+            embeddings[i] = vector
+
+    if missing:
+        with span("embed"):
+            fresh = encode_texts([texts[i] for i in missing])
+        embedding_cache.put_many([keys[i] for i in missing], fresh)
+        embeddings[missing] = fresh
+
+    log.info(f"{len(texts) - len(missing)} cache hits, {len(missing)} encoded.")
+    return embeddings
+
+
+@st.cache_resource   # One query cache + batching worker shared by every session
+def load_query_embedder():
+    return QueryEmbedder(
+        lambda texts: load_model().encode(texts, batch_size=len(texts), show_progress_bar=False)
+    )
 
 
 def get_single_embedding(text: str) -> List[float]:
     """
     Convert a single text (like a user query) into an embedding.
     Used at query time when user asks a question.
+    Repeated questions hit an LRU cache; concurrent ones are micro-batched.
     """
-    embedding = model.encode(text)
-    return embedding.tolist()
\ No newline at end of file
+    with span("embed.query"):
+        embedding = load_query_embedder().embed(text)
+    return embedding.tolist()
+
+
+def get_cache_stats() -> dict:
+    """Hit/miss counters for the chunk embedding cache and the query cache."""
+    return {"chunks": load_embedding_cache().stats(), "queries": load_query_embedder().stats()}
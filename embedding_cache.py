@@ -0,0 +1,295 @@
+# embedding_cache.py
+# Persistent, content-addressed cache for chunk embeddings
+# Vectors live in a memory-mapped float32 file; keys in a JSON snapshot plus an
+# append-only key log, so one cache directory can be shared by several processes
+
+import os
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+try:
+    import fcntl
+except ImportError:     # Windows: no cross-process lock, so one process per cache directory
+    fcntl = None
+
+import numpy as np
+from dotenv import load_dotenv
+from telemetry import get_logger
+
+load_dotenv()
+
+log = get_logger("EmbedCache")
+
+CACHE_DIR = os.getenv("EMBED_CACHE_DIR", ".docusphere_cache/embeddings")
+CACHE_MAX_MB = float(os.getenv("EMBED_CACHE_MAX_MB", "256"))
+LOG_LINES_PER_SLOT = 2    # the key log is folded into a new snapshot past capacity × this
+
+
+def content_key(model_name: str, text: str) -> str:
+    """Cache key for a chunk — model name + SHA-256 of the chunk text."""
+    digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+    return f"{model_name}:{digest}"
+
+
+class EmbeddingCache:
+    """
+    Fixed-capacity embedding store backed by a memory-mapped array.
+
+    Each cached vector occupies one row ("slot") of vectors.f32. Which key
+    holds which slot is index.json (a snapshot, LRU order oldest first) plus
+    keys.log, appended on every put: "<slot> <key>" names a slot, a bare
+    "<slot>" frees one. When the cache is full the least recently used slot
+    is reused.
+
+    A put frees reused slots in the log before overwriting their vectors and
+    names the new keys only once those vectors are flushed, so a crash can lose
+    entries but never map a key to another key's vector. Every call holds the
+    directory's lock file and first replays lines other processes appended.
+    """
+
+    def __init__(self, model_name: str, dimension: int,
+                 cache_dir: str = CACHE_DIR, max_mb: float = CACHE_MAX_MB):
+        self.model_name = model_name
+        self.dimension = dimension
+        self.capacity = max(1, int(max_mb * 1024 * 1024) // (dimension * 4))
+
+        safe_name = model_name.replace("/", "_")
+        self.dir = os.path.join(cache_dir, safe_name)
+        os.makedirs(self.dir, exist_ok=True)
+        self.vectors_path = os.path.join(self.dir, "vectors.f32")
+        self.index_path = os.path.join(self.dir, "index.json")
+        self.log_path = os.path.join(self.dir, "keys.log")
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._lock = threading.Lock()
+        self._lock_file = open(os.path.join(self.dir, "lock"), "a")
+        self._slots: "OrderedDict[str, int]" = OrderedDict()
+        self._owners: Dict[int, str] = {}
+        self._free: List[int] = []
+        self._log_id = None       # (device, inode) of keys.log as last read
+        self._log_offset = 0
+        self._log_lines = 0
+        with self._locked(exclusive=True):
+            self._load()
+
+    @contextmanager
+    def _locked(self, exclusive: bool):
+        """The in-process lock, plus the directory's lock file across processes."""
+        with self._lock:
+            if fcntl is None:
+                yield
+                return
+            fcntl.flock(self._lock_file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+
+    # ── persistence ─────────────────────────
+    def _read_snapshot(self) -> Optional[List]:
+        """index.json's entries, or None if it is missing, corrupt or for another shape."""
+        if not (os.path.exists(self.index_path) and os.path.exists(self.vectors_path)):
+            return None
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                index = json.load(f)
+        except (OSError, ValueError) as e:
+            log.warning(f"Corrupt index, rebuilding: {e}")
+            return None
+        if index.get("dimension") != self.dimension or index.get("capacity") != self.capacity:
+            return None
+        return index.get("entries", [])
+
+    def _load(self):
+        """Open the vector file and restore the key map, resetting on any mismatch."""
+        entries = self._read_snapshot()
+        self._vectors = np.memmap(
+            self.vectors_path, dtype=np.float32, mode="r+" if entries is not None else "w+",
+            shape=(self.capacity, self.dimension)
+        )
+        self._restore(entries or [])
+        if entries is None:
+            self._write_snapshot()
+        else:
+            self._replay()
+            log.info(f"Loaded {len(self._slots)} cached embeddings.")
+
+    def _restore(self, entries: List):
+        self._slots = OrderedDict((key, slot) for key, slot in entries)
+        self._owners = {slot: key for key, slot in self._slots.items()}
+        self._free = [s for s in range(self.capacity - 1, -1, -1) if s not in self._owners]
+        self._log_id = None
+        self._log_offset = 0
+        self._log_lines = 0
+
+    def _assign(self, slot: int, key: Optional[str]):
+        """Apply one key-log line: slot now holds key (None = slot freed)."""
+        old = self._owners.pop(slot, None)
+        if old is not None:
+            self._slots.pop(old, None)
+        if key is None:
+            self._free.append(slot)
+            return
+        previous = self._slots.pop(key, None)
+        if previous is not None and previous != slot:
+            self._owners.pop(previous, None)
+            self._free.append(previous)
+        self._slots[key] = slot
+        self._owners[slot] = key
+
+    def _replay(self):
+        """Apply key-log lines appended since the last read, by this or any process."""
+        try:
+            stat = os.stat(self.log_path)
+        except OSError:
+            return
+        log_id = (stat.st_dev, stat.st_ino)
+        if self._log_id is not None and (log_id != self._log_id or stat.st_size < self._log_offset):
+            # Another process folded the log into a new snapshot — start from that
+            self._restore(self._read_snapshot() or [])
+        self._log_id = log_id
+        if stat.st_size == self._log_offset:
+            return
+        with open(self.log_path, "rb") as f:
+            f.seek(self._log_offset)
+            data = f.read()
+        # A torn trailing line (killed mid-append) is left unread
+        end = data.rfind(b"\n") + 1
+        lines = data[:end].decode("utf-8").splitlines()
+        for line in lines:
+            slot, _, key = line.partition(" ")
+            self._assign(int(slot), key or None)
+        self._log_offset += end
+        self._log_lines += len(lines)
+
+    def _append(self, lines: List[str]):
+        data = "".join(lines).encode("utf-8")
+        with open(self.log_path, "ab") as f:
+            if f.seek(0, os.SEEK_END) != self._log_offset:
+                f.truncate(self._log_offset)
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+            stat = os.fstat(f.fileno())
+        self._log_id = (stat.st_dev, stat.st_ino)
+        self._log_offset += len(data)
+        self._log_lines += len(lines)
+
+    def _write_snapshot(self):
+        """Atomically rewrite index.json, then start an empty key log (a new file, so others reload)."""
+        index = {
+            "model": self.model_name,
+            "dimension": self.dimension,
+            "capacity": self.capacity,
+            "entries": list(self._slots.items()),
+        }
+        tmp_path = self.index_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(index, f)
+        os.replace(tmp_path, self.index_path)
+        tmp_path = self.log_path + ".tmp"
+        open(tmp_path, "wb").close()
+        os.replace(tmp_path, self.log_path)
+        stat = os.stat(self.log_path)
+        self._log_id = (stat.st_dev, stat.st_ino)
+        self._log_offset = 0
+        self._log_lines = 0
+
+    def flush(self):
+        """Flush vectors to disk and fold the key log into a fresh index snapshot."""
+        with self._locked(exclusive=True):
+            self._replay()
+            self._vectors.flush()
+            self._write_snapshot()
+
+    # ── lookups ─────────────────────────────
+    def get_many(self, keys: List[str]) -> List[Optional[np.ndarray]]:
+        """Return a copy of the cached vector for each key, or None on a miss."""
+        found = []
+        with self._locked(exclusive=False):
+            self._replay()
+            for key in keys:
+                slot = self._slots.get(key)
+                if slot is None:
+                    self.misses += 1
+                    found.append(None)
+                else:
+                    self.hits += 1
+                    self._slots.move_to_end(key)
+                    found.append(np.array(self._vectors[slot]))
+        return found
+
+    def _take_free(self, taken: set) -> Optional[int]:
+        """A free slot not in `taken` (the free list can hold stale or repeated slots)."""
+        while self._free:
+            slot = self._free.pop()
+            if slot not in self._owners and slot not in taken:
+                return slot
+        return None
+
+    def put_many(self, keys: List[str], vectors: np.ndarray):
+        """Store vectors under their keys, evicting least recently used entries."""
+        with self._locked(exclusive=True):
+            self._replay()
+            fresh: Dict[str, int] = {}     # new key → its row in vectors
+            for i, key in enumerate(keys):
+                if key in self._slots:
+                    # Content-addressed: a stored key already has this vector
+                    self._slots.move_to_end(key)
+                elif key not in fresh:
+                    fresh[key] = i
+            if len(fresh) > self.capacity:
+                # More new keys than the cache holds — keep the last ones, as LRU would
+                fresh = dict(list(fresh.items())[-self.capacity:])
+
+            new: Dict[str, int] = {}
+            taken = set()
+            rows: List[int] = []
+            freed: List[int] = []
+            for key, i in fresh.items():
+                slot = self._take_free(taken)
+                if slot is None:
+                    _, slot = self._slots.popitem(last=False)
+                    del self._owners[slot]
+                    freed.append(slot)
+                    self.evictions += 1
+                new[key] = slot
+                taken.add(slot)
+                rows.append(i)
+            if not new:
+                return
+
+            # Reused slots lose their old keys before the vectors change...
+            if freed:
+                self._append([f"{slot}\n" for slot in freed])
+            for (key, slot), i in zip(new.items(), rows):
+                self._vectors[slot] = vectors[i]
+            self._vectors.flush()
+            # ...and new keys are named only once their vectors are on disk
+            self._append([f"{slot} {key}\n" for key, slot in new.items()])
+            for key, slot in new.items():
+                self._slots[key] = slot
+                self._owners[slot] = key
+
+            if self._log_lines > self.capacity * LOG_LINES_PER_SLOT:
+                self._vectors.flush()
+                self._write_snapshot()
+
+    def stats(self) -> dict:
+        """Hit/miss counters plus current occupancy."""
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / total if total else 0.0,
+            "entries": len(self._slots),
+            "capacity": self.capacity,
+        }
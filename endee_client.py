@@ -2,82 +2,335 @@
 # Endee Vector Database client using official Python SDK
 # Docs: https://docs.endee.io/python-sdk/quickstart
 
-from endee import Endee, Precision
 import os
+import json
+import time
+import random
+import threading
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from typing import Dict, List, Optional
 from dotenv import load_dotenv
+from telemetry import get_logger, observe_stage, run_in_context
+from index_manifest import delete_manifest
+from bm25_index import delete_bm25
+from local_vector_store import LocalVectorStore, precision_name
 
 load_dotenv()
 
+log = get_logger("Endee")
+
 ENDEE_TOKEN = os.getenv("ENDEE_TOKEN", "")
+# Server address, e.g. http://localhost:8080 — empty keeps the SDK default
+ENDEE_URL = os.getenv("ENDEE_URL", "").rstrip("/")
+
+# "endee" talks to the Endee server; "local" uses the embedded engine in
+# local_vector_store.py (no Docker — single-node mode, tests, benchmarks)
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "endee").lower()
+
+# Client is built on first use, so importing this module never touches the
+# Endee SDK or the network
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """The process-wide vector store client, created on first call."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                if VECTOR_BACKEND == "local":
+                    _client = LocalVectorStore()
+                else:
+                    from endee import Endee
+                    # Connects to localhost:8080 by default
+                    client = Endee(ENDEE_TOKEN) if ENDEE_TOKEN else Endee()
+                    if ENDEE_URL:
+                        base = ENDEE_URL if ENDEE_URL.endswith("/api/v1") else ENDEE_URL + "/api/v1"
+                        client.set_base_url(base)
+                    _client = client
+    return _client
+
+# Storage precision for NEW indexes: float32, float16, int16, int8 or binary.
+# Quantized indexes keep a float32 copy of every vector in a local sidecar
+# store (outside the Endee volume); queries fetch top_k × RESCORE_FACTOR
+# candidates from Endee and rescore them exactly against the sidecar
+ENDEE_PRECISION = precision_name(os.getenv("ENDEE_PRECISION", "float32"))
+RESCORE_FACTOR = int(os.getenv("ENDEE_RESCORE_FACTOR", "4"))
+RESCORE_DIR = os.getenv("ENDEE_RESCORE_DIR", ".docusphere_cache/rescore")
+
+_rescore_store: Optional[LocalVectorStore] = None
+
+
+def _get_rescore_store() -> LocalVectorStore:
+    global _rescore_store
+    if _rescore_store is None:
+        with _client_lock:
+            if _rescore_store is None:
+                _rescore_store = LocalVectorStore(RESCORE_DIR)
+    return _rescore_store
+
+
+def _rescore_index(index_name: str):
+    """The float32 sidecar for a quantized index, or None for full-precision indexes."""
+    try:
+        return _get_rescore_store().get_index(index_name)
+    except ValueError:
+        return None
+
+# Upsert tuning — batches are cut by estimated payload size, sent in parallel,
+# and retried individually with exponential backoff
+UPSERT_MAX_BYTES = int(os.getenv("ENDEE_UPSERT_MAX_BYTES", str(4 * 1024 * 1024)))
+UPSERT_MAX_VECTORS = int(os.getenv("ENDEE_UPSERT_MAX_VECTORS", "1000"))   # SDK hard limit is 10000
+UPSERT_CONCURRENCY = int(os.getenv("ENDEE_UPSERT_CONCURRENCY", "4"))
+UPSERT_MAX_RETRIES = int(os.getenv("ENDEE_UPSERT_MAX_RETRIES", "3"))
+RETRY_BASE_DELAY = 0.25    # seconds; doubled on each attempt, plus jitter
 
-# Initialize client — connects to localhost:8080 by default
-client = Endee(ENDEE_TOKEN) if ENDEE_TOKEN else Endee()
+# Index handles are reused across calls — each one keeps its own HTTP session,
+# so this also saves the get_index round-trip and connection setup per chat turn
+_index_handles: Dict[str, object] = {}
+_handles_lock = threading.Lock()
 
+# Rolling per-operation latencies (ms) for get_latency_stats()
+_latencies: Dict[str, deque] = defaultdict(lambda: deque(maxlen=1000))
+_latency_lock = threading.Lock()
 
-def create_index(index_name: str, dimension: int = 384):
-    """Create a new vector index. Skips if already exists."""
+
+def _get_index(index_name: str):
+    """Cached index handle; fetched from the server once per index."""
+    with _handles_lock:
+        index = _index_handles.get(index_name)
+    if index is None:
+        index = get_client().get_index(name=index_name)
+        with _handles_lock:
+            index = _index_handles.setdefault(index_name, index)
+    return index
+
+
+def _forget_index(index_name: str):
+    with _handles_lock:
+        _index_handles.pop(index_name, None)
+
+
+def _record_latency(operation: str, started: float) -> float:
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    with _latency_lock:
+        _latencies[operation].append(elapsed_ms)
+    observe_stage(f"endee.{operation}", elapsed_ms / 1000)
+    return elapsed_ms
+
+
+def get_latency_stats() -> Dict[str, Dict[str, float]]:
+    """p50/p95/max latency in ms for each Endee operation over recent calls."""
+    with _latency_lock:
+        snapshot = {op: list(values) for op, values in _latencies.items()}
+    stats = {}
+    for op, values in snapshot.items():
+        if values:
+            arr = np.asarray(values)
+            stats[op] = {
+                "count": len(arr),
+                "p50_ms": float(np.percentile(arr, 50)),
+                "p95_ms": float(np.percentile(arr, 95)),
+                "max_ms": float(arr.max()),
+            }
+    return stats
+
+
+def create_index(index_name: str, dimension: int = 384, precision: Optional[str] = None):
+    """
+    Create a new vector index. Skips if already exists.
+    precision defaults to ENDEE_PRECISION; anything below float32 also
+    creates the local float32 sidecar used for rescoring.
+    """
     existing = list_indexes()
     if index_name in existing:
-        print(f"[Endee] Index '{index_name}' already exists. Skipping.")
+        log.info(f"Index '{index_name}' already exists. Skipping.")
         return True
 
+    precision = precision_name(precision or ENDEE_PRECISION)
     try:
-        client.create_index(
+        if VECTOR_BACKEND == "local":
+            sdk_precision = precision
+        else:
+            from endee import Precision
+            sdk_precision = Precision(precision)
+        get_client().create_index(
             name=index_name,
             dimension=dimension,
             space_type="cosine",
-            precision="float32"    # Correct enum from official docs
+            precision=sdk_precision
         )
-        print(f"[Endee] Index '{index_name}' created successfully.")
+        # A leftover sidecar from an earlier index of the same name is never reused
+        if _rescore_index(index_name) is not None:
+            _get_rescore_store().delete_index(index_name)
+        if precision != "float32":
+            _get_rescore_store().create_index(index_name, dimension, "cosine", "float32")
+        log.info(f"Index '{index_name}' created successfully ({precision}).")
         return True
     except Exception as e:
-        print(f"[Endee] Failed to create index: {e}")
+        log.warning(f"Failed to create index: {e}")
         return False
 
 
-def insert_vectors(index_name: str, vectors: list, metadata: list):
+def _vector_rows(vectors):
+    """
+    Yield one vector per row for the upsert payload.
+    Accepts a (n, dim) float32 ndarray or a list of lists; ndarray rows are
+    converted only here, at the serialization boundary.
+    """
+    if isinstance(vectors, np.ndarray):
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        for row in vectors:
+            yield row.tolist()
+    else:
+        yield from vectors
+
+
+def _split_by_bytes(payload: List[dict], dimension: int) -> List[List[dict]]:
+    """
+    Cut the payload into batches of at most UPSERT_MAX_BYTES (estimated as
+    float32 vector + id + JSON metadata) and UPSERT_MAX_VECTORS items.
+    """
+    batches, batch, batch_bytes = [], [], 0
+    for item in payload:
+        size = 4 * dimension + len(item["id"]) + len(json.dumps(item["meta"]))
+        if batch and (batch_bytes + size > UPSERT_MAX_BYTES or len(batch) >= UPSERT_MAX_VECTORS):
+            batches.append(batch)
+            batch, batch_bytes = [], 0
+        batch.append(item)
+        batch_bytes += size
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+def _upsert_with_retry(index_name: str, batch: List[dict]):
+    """Upsert one batch, retrying transient failures with exponential backoff."""
+    for attempt in range(UPSERT_MAX_RETRIES + 1):
+        started = time.perf_counter()
+        try:
+            _get_index(index_name).upsert(batch)
+            _record_latency("upsert", started)
+            return
+        except Exception as e:
+            _record_latency("upsert_error", started)
+            if attempt == UPSERT_MAX_RETRIES:
+                raise
+            delay = RETRY_BASE_DELAY * (2 ** attempt) * (1 + random.random())
+            log.warning(f"Upsert batch of {len(batch)} failed ({e}); retrying in {delay:.2f}s.")
+            _forget_index(index_name)   # a broken session shouldn't be reused
+            time.sleep(delay)
+
+
+def insert_vectors(index_name: str, vectors, metadata: list, start_id: int = 0,
+                   ids: Optional[List[str]] = None):
     """
     Insert embeddings into Endee using SDK upsert.
-    SDK handles batching and timeouts internally.
+    vectors: (n, dim) float32 ndarray from get_embeddings, or a list of lists.
+    ids: explicit vector IDs (content hashes); defaults to vec_{start_id + i}.
+    The payload is split into size-bounded batches that are upserted
+    concurrently (ENDEE_UPSERT_CONCURRENCY) with per-batch retries.
     """
+    started = time.perf_counter()
     try:
-        index = client.get_index(name=index_name)
-
         payload = [
             {
-                "id": f"vec_{i}",
-                "vector": vectors[i],
+                "id": ids[i] if ids is not None else f"vec_{start_id + i}",
+                "vector": vector,
                 "meta": metadata[i]
             }
-            for i in range(len(vectors))
+            for i, vector in enumerate(_vector_rows(vectors))
         ]
+        if not payload:
+            return True
+
+        batches = _split_by_bytes(payload, len(payload[0]["vector"]))
+        if len(batches) == 1 or UPSERT_CONCURRENCY <= 1:
+            for batch in batches:
+                _upsert_with_retry(index_name, batch)
+        else:
+            workers = min(UPSERT_CONCURRENCY, len(batches))
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                for future in [pool.submit(run_in_context(_upsert_with_retry), index_name, b)
+                               for b in batches]:
+                    future.result()
 
-        index.upsert(payload)
-        print(f"[Endee] Inserted {len(vectors)} vectors into '{index_name}'.")
+        rescore = _rescore_index(index_name)
+        if rescore is not None:
+            rescore.upsert([{"id": item["id"], "vector": item["vector"]} for item in payload])
+
+        elapsed_ms = _record_latency("insert_vectors", started)
+        log.info(f"Inserted {len(payload)} vectors into '{index_name}' "
+                 f"({len(batches)} batches, {elapsed_ms:.0f}ms).")
         return True
 
     except Exception as e:
-        print(f"[Endee] Insert failed: {e}")
+        _record_latency("insert_vectors_error", started)
+        log.warning(f"Insert failed: {e}")
+        return False
+
+
+def delete_vectors(index_name: str, ids: List[str]):
+    """Delete specific vectors by ID (e.g. chunks removed from a re-uploaded file)."""
+    if not ids:
+        return True
+    try:
+        index = _get_index(index_name)
+        rescore = _rescore_index(index_name)
+        for vector_id in ids:
+            index.delete_vector(vector_id)
+            if rescore is not None:
+                rescore.delete_vector(vector_id)
+        log.info(f"Deleted {len(ids)} stale vectors from '{index_name}'.")
+        return True
+    except Exception as e:
+        log.warning(f"Delete vectors failed: {e}")
         return False
 
 
+def _rescore(rescore, query_vector, results: List[dict], top_k: int) -> List[dict]:
+    """
+    Re-rank quantized-index results by exact cosine against the float32 sidecar.
+    A result missing from the sidecar keeps the similarity Endee reported.
+    """
+    q = np.asarray(query_vector, dtype=np.float32).reshape(-1)
+    q = q / max(float(np.linalg.norm(q)), 1e-10)   # never normalise the caller's array in place
+    exact = rescore.fetch_vectors([str(r["id"]) for r in results])
+    scored = [
+        (float(exact[str(r["id"])] @ q) if str(r["id"]) in exact else r.get("similarity", 0.0), i)
+        for i, r in enumerate(results)
+    ]
+    scored.sort(key=lambda s: -s[0])
+    return [results[i] for _, i in scored[:top_k]]
+
+
 def query_index(index_name: str, query_vector: list, top_k: int = 5):
     """
     Query Endee for top-k similar vectors.
     Returns list of metadata dicts from nearest neighbors.
+    Quantized indexes are over-fetched by RESCORE_FACTOR and rescored exactly.
     """
+    started = time.perf_counter()
     try:
-        index = client.get_index(name=index_name)
-        results = index.query(
+        rescore = _rescore_index(index_name)
+        results = _get_index(index_name).query(
             vector=query_vector,
-            top_k=top_k,
+            top_k=top_k * RESCORE_FACTOR if rescore is not None else top_k,
             include_vectors=False
         )
-        print(f"[Endee] Search returned {len(results)} results.")
+        if rescore is not None:
+            results = _rescore(rescore, query_vector, results, top_k)
+        elapsed_ms = _record_latency("query", started)
+        log.info(f"Search returned {len(results)} results in {elapsed_ms:.1f}ms.")
         return [r.get("meta", {}) for r in results]
 
     except Exception as e:
-        print(f"[Endee] Query failed: {e}")
+        _record_latency("query_error", started)
+        _forget_index(index_name)
+        log.warning(f"Query failed: {e}")
         return []
 
 
@@ -86,21 +339,28 @@ def list_indexes():
     List all existing index names in Endee.
     Per official docs — list_indexes() returns plain list of strings.
     """
+    started = time.perf_counter()
     try:
-        indexes = client.list_indexes()
-        print(f"[Endee] Active indexes: {indexes}")
+        indexes = get_client().list_indexes()
+        _record_latency("list_indexes", started)
+        log.info(f"Active indexes: {indexes}")
         return indexes if isinstance(indexes, list) else []
     except Exception as e:
-        print(f"[Endee] List failed: {e}")
+        log.warning(f"List failed: {e}")
         return []
 
 
 def delete_index(index_name: str):
     """Permanently delete an index and all its vectors."""
     try:
-        client.delete_index(name=index_name)
-        print(f"[Endee] Index '{index_name}' deleted.")
+        get_client().delete_index(name=index_name)
+        _forget_index(index_name)
+        if _rescore_index(index_name) is not None:
+            _get_rescore_store().delete_index(index_name)
+        delete_manifest(index_name)
+        delete_bm25(index_name)
+        log.info(f"Index '{index_name}' deleted.")
         return True
     except Exception as e:
-        print(f"[Endee] Delete failed: {e}")
+        log.warning(f"Delete failed: {e}")
         return False
\ No newline at end of file
@@ -0,0 +1,125 @@
+# index_manifest.py
+# Fingerprints for incremental re-ingestion
+# Each Endee index gets a small local manifest: the source file's content hash
+# plus the deterministic vector ID → chunk_id mapping that is currently stored
+
+import os
+import re
+import json
+import hashlib
+from typing import Dict, Iterable, Iterator, List, Optional, Union
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+MANIFEST_DIR = os.getenv("INDEX_MANIFEST_DIR", ".docusphere_cache/manifests")
+
+# Endee's rule for index names. Names also become file names for the manifest,
+# BM25, local-store and rescore caches, so nothing else may reach those paths
+INDEX_NAME_MAX = 48
+_INDEX_NAME_RE = re.compile(r"[a-zA-Z0-9_]{1,%d}" % INDEX_NAME_MAX)
+
+
+def is_valid_index_name(name) -> bool:
+    return isinstance(name, str) and _INDEX_NAME_RE.fullmatch(name) is not None
+
+
+def index_name_for(label: str, max_length: int = INDEX_NAME_MAX) -> str:
+    """
+    Index name for a filename or topic: lowercased, "." and " " → "_".
+    If anything else had to be replaced, or the name is over max_length, a
+    short hash of the full label is appended so two labels never share an index.
+    """
+    base = label.strip().lower().replace(".", "_").replace(" ", "_")
+    name = re.sub(r"[^a-z0-9_]", "_", base)
+    if name and name == base and len(name) <= max_length:
+        return name
+    suffix = "_" + hashlib.sha1(label.encode("utf-8")).hexdigest()[:8]
+    return name[:max_length - len(suffix)] + suffix
+
+
+def file_fingerprint(source: Union[str, bytes, bytearray, memoryview], block_size: int = 1 << 20) -> str:
+    """SHA-256 of the file's bytes — read in 1MB blocks from a path, or hashed in place."""
+    if not isinstance(source, str):
+        return hashlib.sha256(source).hexdigest()
+    digest = hashlib.sha256()
+    with open(source, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class ChunkIdAssigner:
+    """
+    Deterministic vector IDs from chunk content.
+    The ID is a truncated SHA-256 of the chunk text; a repeated chunk gets
+    an occurrence suffix so IDs stay unique within one document.
+    """
+
+    def __init__(self):
+        self._seen: Dict[str, int] = {}
+
+    def __call__(self, text: str) -> str:
+        digest = hashlib.sha256(text.encode("utf-8")).hexdigest()[:32]
+        occurrence = self._seen.get(digest, 0)
+        self._seen[digest] = occurrence + 1
+        return digest if occurrence == 0 else f"{digest}_{occurrence}"
+
+
+def chunk_ids(texts: Iterable[str]) -> Iterator[str]:
+    """Vector IDs for a sequence of chunks, in order."""
+    assign = ChunkIdAssigner()
+    for text in texts:
+        yield assign(text)
+
+
+def _manifest_path(index_name: str) -> str:
+    return os.path.join(MANIFEST_DIR, f"{index_name}.json")
+
+
+def load_manifest(index_name: str) -> Dict:
+    """
+    Stored state for an index, or an empty manifest.
+        {"fingerprint": "ab12...", "chunks": {"<vector id>": <chunk_id>, ...}}
+    """
+    try:
+        with open(_manifest_path(index_name), "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        return {"fingerprint": manifest.get("fingerprint"), "chunks": manifest.get("chunks", {})}
+    except (OSError, ValueError):
+        return {"fingerprint": None, "chunks": {}}
+
+
+def save_manifest(index_name: str, fingerprint: Optional[str], chunks: Dict[str, int]):
+    """Atomically write the manifest for an index."""
+    os.makedirs(MANIFEST_DIR, exist_ok=True)
+    path = _manifest_path(index_name)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"fingerprint": fingerprint, "chunks": chunks}, f)
+    os.replace(tmp_path, path)
+
+
+def manifest_version(index_name: str) -> Optional[int]:
+    """
+    Cheap content version for an index — the manifest's mtime in ns.
+    Changes whenever the index is (re-)ingested; None if never ingested here.
+    """
+    try:
+        return os.stat(_manifest_path(index_name)).st_mtime_ns
+    except OSError:
+        return None
+
+
+def delete_manifest(index_name: str):
+    """Forget an index's manifest (e.g. after the index is deleted)."""
+    try:
+        os.remove(_manifest_path(index_name))
+    except OSError:
+        pass
+
+
+def removed_ids(old_chunks: Dict[str, int], new_chunks: Dict[str, int]) -> List[str]:
+    """Vector IDs stored last time that are not part of the new version."""
+    return [vector_id for vector_id in old_chunks if vector_id not in new_chunks]
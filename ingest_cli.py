@@ -0,0 +1,361 @@
+# ingest_cli.py
+# Headless bulk ingestion: a directory of PDF/DOCX files → one Endee index
+# Extraction (process_document) fans out over a process pool; a single embed
+# thread (the model is loaded once) and a single upsert thread consume its
+# output through bounded queues. Every finished file is appended to a JSONL
+# manifest, so an interrupted run resumes where it stopped
+# Run from the project root: python ingest_cli.py DOCS_DIR --index NAME [--workers 4]
+
+import os
+import sys
+import json
+import time
+import queue
+import hashlib
+import argparse
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from typing import Dict, Iterator, List, Optional
+
+from dotenv import load_dotenv
+from telemetry import get_logger, span
+
+from document_processor import process_document, count_pdf_pages
+from index_manifest import ChunkIdAssigner, file_fingerprint, save_manifest, removed_ids
+
+load_dotenv()
+
+log = get_logger("BulkIngest")
+
+BULK_MANIFEST_DIR = os.getenv("BULK_MANIFEST_DIR", ".docusphere_cache/bulk")
+SUPPORTED_EXTENSIONS = (".pdf", ".docx")
+PROGRESS_EVERY_SECONDS = 10
+
+_DONE = None
+
+
+def find_documents(root: str, recursive: bool = False) -> List[str]:
+    """Supported files under root, as sorted paths relative to root."""
+    found = []
+    if recursive:
+        for dirpath, dirnames, filenames in os.walk(root):
+            dirnames.sort()
+            for name in filenames:
+                if name.lower().endswith(SUPPORTED_EXTENSIONS):
+                    found.append(os.path.relpath(os.path.join(dirpath, name), root))
+    else:
+        for name in os.listdir(root):
+            if name.lower().endswith(SUPPORTED_EXTENSIONS) and os.path.isfile(os.path.join(root, name)):
+                found.append(name)
+    return sorted(found)
+
+
+def file_vector_ids(source: str, chunks: List[str]) -> List[str]:
+    """
+    Content-hash chunk IDs (as in ingest_pipeline) prefixed with a hash of the
+    file's relative path — many files share one index, and identical chunks
+    in two files must not overwrite each other.
+    """
+    prefix = hashlib.sha256(source.encode("utf-8")).hexdigest()[:12]
+    assign = ChunkIdAssigner()
+    return [f"{prefix}_{assign(text)}" for text in chunks]
+
+
+def _extract(root: str, source: str, known_fingerprint: Optional[str]) -> Dict:
+    """
+    Process-pool worker: fingerprint one file and, unless it matches the
+    manifest, run process_document on it. Chunk sources are the path relative
+    to root, so same-named files in different folders stay distinguishable.
+    """
+    path = os.path.join(root, source)
+    fingerprint = file_fingerprint(path)
+    if fingerprint == known_fingerprint:
+        return {"source": source, "fingerprint": fingerprint, "unchanged": True}
+
+    doc = process_document(path)
+    if not doc:
+        return {"source": source, "fingerprint": fingerprint, "error": "no text extracted"}
+    for meta in doc["metadata"]:
+        meta["source"] = source
+    return {
+        "source": source,
+        "fingerprint": fingerprint,
+        "pages": count_pdf_pages(path) if source.lower().endswith(".pdf") else 0,
+        "chunks": doc["chunks"],
+        "metadata": doc["metadata"],
+    }
+
+
+class BulkManifest:
+    """
+    Append-only JSONL record of completed files for one index:
+        {"source": "a/report.pdf", "fingerprint": "ab12...", "pages": 12,
+         "chunks": {"<vector id>": <chunk_id>, ...}}
+    The last line for a source wins; a torn trailing line (the run was killed
+    mid-write) is ignored. Chunk metadata goes to a sibling spool file that
+    the BM25 index is rebuilt from.
+    """
+
+    def __init__(self, index_name: str, path: Optional[str] = None):
+        self.path = path or os.path.join(BULK_MANIFEST_DIR, f"{index_name}.jsonl")
+        self.spool_path = os.path.splitext(self.path)[0] + ".chunks.jsonl"
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self.files: Dict[str, Dict] = {}
+        for entry in self._read_lines(self.path):
+            self.files[entry["source"]] = entry
+
+    @staticmethod
+    def _read_lines(path: str) -> Iterator[Dict]:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        yield json.loads(line)
+                    except ValueError:
+                        continue
+        except OSError:
+            return
+
+    @staticmethod
+    def _append(path: str, lines: List[str]):
+        with open(path, "a", encoding="utf-8") as f:
+            f.write("".join(lines))
+            f.flush()
+            os.fsync(f.fileno())
+
+    def record(self, entry: Dict, metadata: List[Dict]):
+        """Spool the chunks first, then mark the file done — a crash in between only re-does the file."""
+        ids = list(entry["chunks"])
+        self._append(self.spool_path, [json.dumps({"id": vector_id, "meta": meta}) + "\n"
+                                       for vector_id, meta in zip(ids, metadata)])
+        self._append(self.path, [json.dumps(entry) + "\n"])
+        self.files[entry["source"]] = entry
+
+    def all_ids(self) -> Dict[str, int]:
+        return {vector_id: chunk_id for entry in self.files.values()
+                for vector_id, chunk_id in entry["chunks"].items()}
+
+    def spooled_chunks(self) -> List[Dict]:
+        """Metadata of every chunk currently in the index, in manifest order."""
+        live = {vector_id for entry in self.files.values() for vector_id in entry["chunks"]}
+        latest = {}
+        for row in self._read_lines(self.spool_path):
+            if row["id"] in live:
+                latest[row["id"]] = row["meta"]
+        return [latest[vector_id] for entry in self.files.values()
+                for vector_id in entry["chunks"] if vector_id in latest]
+
+    def compact(self, chunks: List[Dict]):
+        """Rewrite both files without superseded lines."""
+        ids = [vector_id for entry in self.files.values() for vector_id in entry["chunks"]]
+        for path, lines in (
+            (self.spool_path, [json.dumps({"id": vector_id, "meta": meta}) + "\n"
+                               for vector_id, meta in zip(ids, chunks)]),
+            (self.path, [json.dumps(entry) + "\n" for entry in self.files.values()]),
+        ):
+            tmp_path = path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write("".join(lines))
+            os.replace(tmp_path, path)
+
+
+class Throughput:
+    """Running totals for the progress lines and the final report."""
+
+    def __init__(self, total_files: int):
+        self.total_files = total_files
+        self.started = time.perf_counter()
+        self.last_report = self.started
+        self.files = self.unchanged = self.failed = self.pages = self.chunks = 0
+        self.failures: List[str] = []
+
+    def line(self) -> str:
+        elapsed = time.perf_counter() - self.started
+        done = self.files + self.unchanged + self.failed
+        return (f"{done}/{self.total_files} files ({self.files} ingested, {self.unchanged} unchanged, "
+                f"{self.failed} failed) | {self.pages} pages, {self.chunks} chunks in {elapsed:.1f}s | "
+                f"{self.files / elapsed:.2f} files/s, {self.pages / elapsed:.1f} pages/s, "
+                f"{self.chunks / elapsed:.1f} chunks/s")
+
+    def maybe_report(self):
+        now = time.perf_counter()
+        if now - self.last_report >= PROGRESS_EVERY_SECONDS:
+            self.last_report = now
+            log.info(self.line())
+
+
+def ingest_directory(root: str, index_name: str, workers: int = 0, recursive: bool = False,
+                     manifest_path: Optional[str] = None, build_bm25_index: bool = True,
+                     queue_size: int = 8) -> Throughput:
+    """
+    Ingest every supported file under root into index_name.
+    Files whose fingerprint matches the manifest are skipped; changed files
+    have their old vectors deleted after the new ones are stored.
+    """
+    from embedder import get_embeddings, MODEL_DIMENSION
+    from endee_client import create_index, insert_vectors, delete_vectors
+
+    workers = workers or max(1, (os.cpu_count() or 2) - 1)
+    manifest = BulkManifest(index_name, manifest_path)
+    sources = find_documents(root, recursive)
+    stats = Throughput(len(sources))
+    log.info(f"{len(sources)} documents in '{root}', {len(manifest.files)} already in the manifest. "
+             f"Extracting with {workers} processes.")
+
+    if not create_index(index_name, dimension=MODEL_DIMENSION):
+        raise RuntimeError(f"cannot create index '{index_name}'")
+
+    stop = threading.Event()
+    embed_q: queue.Queue = queue.Queue(maxsize=queue_size)
+    store_q: queue.Queue = queue.Queue(maxsize=queue_size)
+    errors: List[Exception] = []
+
+    def put(q: queue.Queue, item) -> bool:
+        while not stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def drain(q: queue.Queue) -> Iterator[Dict]:
+        while not stop.is_set():
+            try:
+                item = q.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            if item is _DONE:
+                return
+            yield item
+
+    def embed():
+        try:
+            for doc in drain(embed_q):
+                with span("bulk.embed"):
+                    doc["vectors"] = get_embeddings(doc["chunks"])
+                if not put(store_q, doc):
+                    return
+            put(store_q, _DONE)
+        except Exception as e:
+            errors.append(e)
+            stop.set()
+
+    def store():
+        try:
+            for doc in drain(store_q):
+                source = doc["source"]
+                ids = file_vector_ids(source, doc["chunks"])
+                with span("bulk.store"):
+                    if not insert_vectors(index_name, doc["vectors"], doc["metadata"], ids=ids):
+                        raise RuntimeError(f"upsert of '{source}' failed")
+                    old = manifest.files.get(source, {}).get("chunks", {})
+                    new = {vector_id: meta["chunk_id"] for vector_id, meta in zip(ids, doc["metadata"])}
+                    if not delete_vectors(index_name, removed_ids(old, new)):
+                        log.warning(f"Stale vectors of '{source}' were not deleted.")
+                    manifest.record({"source": source, "fingerprint": doc["fingerprint"],
+                                     "pages": doc["pages"], "chunks": new}, doc["metadata"])
+                stats.files += 1
+                stats.pages += doc["pages"]
+                stats.chunks += len(ids)
+                stats.maybe_report()
+        except Exception as e:
+            errors.append(e)
+            stop.set()
+
+    threads = [threading.Thread(target=embed, name="bulk-embed", daemon=True),
+               threading.Thread(target=store, name="bulk-store", daemon=True)]
+    for thread in threads:
+        thread.start()
+
+    def handle(result: Dict):
+        if result.get("unchanged"):
+            stats.unchanged += 1
+        elif "error" in result:
+            stats.failed += 1
+            stats.failures.append(f"{result['source']}: {result['error']}")
+        else:
+            put(embed_q, result)
+        stats.maybe_report()
+
+    # At most 2 × workers files in flight, so extracted text for thousands of
+    # files never piles up ahead of the embedder. Spawned (not forked) workers:
+    # the embed/store threads and the loaded model must not be copied into them
+    pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+    try:
+        in_flight = {}
+        pending = iter(sources)
+        exhausted = False
+        while not stop.is_set():
+            # Top up to the cap only — a pass where nothing finished adds nothing
+            while not exhausted and len(in_flight) < workers * 2:
+                source = next(pending, None)
+                if source is None:
+                    exhausted = True
+                    break
+                known = manifest.files.get(source, {}).get("fingerprint")
+                in_flight[pool.submit(_extract, root, source, known)] = source
+            if not in_flight:
+                break
+            done, _ = wait(in_flight, timeout=0.5, return_when=FIRST_COMPLETED)
+            for future in done:
+                source = in_flight.pop(future)
+                try:
+                    handle(future.result())
+                except Exception as e:
+                    handle({"source": source, "error": str(e)})
+        put(embed_q, _DONE)
+        for thread in threads:
+            while thread.is_alive():
+                thread.join(timeout=0.5)
+    finally:
+        stop.set()
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    if errors:
+        raise RuntimeError(f"bulk ingestion stopped: {errors[0]}") from errors[0]
+
+    if stats.files:
+        chunks = manifest.spooled_chunks()
+        if build_bm25_index:
+            from bm25_index import build_bm25
+            build_bm25(index_name, [meta["text"] for meta in chunks], chunks)
+        manifest.compact(chunks)
+        # The index manifest is what the app versions cached answers by
+        save_manifest(index_name, None, manifest.all_ids())
+
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk-ingest a directory of PDF/DOCX files into one index.")
+    parser.add_argument("directory")
+    parser.add_argument("--index", required=True, help="Endee index to ingest into")
+    parser.add_argument("--workers", type=int, default=0, help="extraction processes (default: CPUs - 1)")
+    parser.add_argument("--recursive", action="store_true", help="include subdirectories")
+    parser.add_argument("--manifest", help=f"resume manifest (default: {BULK_MANIFEST_DIR}/<index>.jsonl)")
+    parser.add_argument("--no-bm25", action="store_true", help="skip rebuilding the keyword index")
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.directory):
+        parser.error(f"{args.directory} is not a directory")
+
+    try:
+        stats = ingest_directory(args.directory, args.index, args.workers, args.recursive,
+                                 args.manifest, not args.no_bm25)
+    except KeyboardInterrupt:
+        log.warning("Interrupted. Completed files are in the manifest; rerun to resume.")
+        sys.exit(130)
+    except RuntimeError as e:
+        log.warning(f"{e}. Rerun to resume.")
+        sys.exit(1)
+
+    log.info(f"Done. {stats.line()}")
+    for failure in stats.failures:
+        log.warning(f"Failed: {failure}")
+    sys.exit(1 if stats.failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,390 @@
+# ingest_pipeline.py
+# Streaming ingestion: extract → chunk → embed → upsert
+# Each stage runs in its own thread, connected by bounded queues,
+# so stages overlap and memory stays flat regardless of document size
+
+import os
+import queue
+import hashlib
+import threading
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+
+from dotenv import load_dotenv
+from telemetry import get_logger, request_context, run_in_context, span
+
+from chunker import Chunk
+from document_processor import (
+    DocumentSource, Page, iter_document_pages, iter_chunks, count_pdf_pages, page_text,
+    extract_text_from_pdf, extract_text_from_docx
+)
+from document_store import document_store
+from embedder import get_embeddings
+from endee_client import create_index, insert_vectors, delete_vectors, delete_index, list_indexes
+from answer_cache import answer_cache
+from bm25_index import BM25Builder, build_bm25, save_bm25
+from index_manifest import (
+    ChunkIdAssigner, chunk_ids, file_fingerprint, load_manifest, save_manifest, removed_ids
+)
+
+load_dotenv()
+
+log = get_logger("Pipeline")
+
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "64"))    # chunks per embed/upsert batch
+INGEST_QUEUE_SIZE = int(os.getenv("INGEST_QUEUE_SIZE", "4"))     # batches buffered between stages
+
+_DONE = object()
+
+
+class _StageError:
+    """Carries an exception from a worker stage to the consumer."""
+
+    def __init__(self, stage: str, error: Exception):
+        self.stage = stage
+        self.error = error
+
+
+def _put(q: queue.Queue, item, stop: threading.Event) -> bool:
+    """Blocking put that gives up once the pipeline is stopped."""
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _drain(q: queue.Queue, stop: threading.Event) -> Iterator:
+    """Iterate a stage's output queue until _DONE, re-raising stage errors."""
+    while True:
+        try:
+            item = q.get(timeout=0.1)
+        except queue.Empty:
+            if stop.is_set():
+                return
+            continue
+        if item is _DONE:
+            return
+        if isinstance(item, _StageError):
+            raise RuntimeError(f"{item.stage} failed: {item.error}") from item.error
+        yield item
+
+
+def _stage(name: str, target: Callable, out_q: queue.Queue, stop: threading.Event) -> threading.Thread:
+    """
+    Run target in a daemon thread; always terminate its output with _DONE or an error.
+    The thread inherits the caller's request ID.
+    """
+    def run():
+        try:
+            target()
+            _put(out_q, _DONE, stop)
+        except Exception as e:
+            _put(out_q, _StageError(name, e), stop)
+
+    thread = threading.Thread(target=run_in_context(run), name=f"ingest-{name}", daemon=True)
+    thread.start()
+    return thread
+
+
+def run_pipeline(
+    pages: Iterable[Page],
+    index_name: str,
+    make_meta: Callable[[Chunk, int], Dict],
+    progress_callback: Optional[Callable[[Dict], None]] = None,
+    total_pages: Optional[int] = None,
+    existing: Optional[Dict[str, int]] = None,
+    batch_size: int = INGEST_BATCH_SIZE,
+    queue_size: int = INGEST_QUEUE_SIZE,
+    keep_chunks: bool = False,
+    page_sink: Optional[Callable[[Page], None]] = None,
+    chunk_sink: Optional[Callable[[Dict], None]] = None,
+    upserted: Optional[Dict[str, int]] = None,
+) -> Dict:
+    """
+    Stream (page number, text) pairs through chunking, embedding and upsert.
+    make_meta(chunk, chunk_id) builds the Endee metadata for each chunk.
+
+    Extraction, chunking and embedding run in worker threads; upserts and
+    progress_callback run in the calling thread (Streamlit only allows UI
+    updates from the script thread).
+
+    existing: vector ID → chunk_id already stored in the index. Chunks whose
+    content-hash ID is stored at the same position are neither embedded nor
+    upserted again.
+
+    page_sink(page) sees every extracted page, in order, on the extract thread;
+    chunk_sink(meta) every chunk's metadata on the chunk thread. keep_chunks
+    also returns all chunks, which holds the whole document in memory.
+    upserted, if given, is filled with vector ID → chunk_id as each batch is
+    stored, so a caller can still record those vectors if a later batch fails.
+
+    Returns:
+        {"chunk_count": 812, "page_count": 1034, "chunks": [...] or None,
+         "metadata": [...] or None, "ids": {"<vector id>": chunk_id, ...},
+         "upserted": 12, "skipped": 800}
+    """
+    existing = existing or {}
+    stop = threading.Event()
+    page_q: queue.Queue = queue.Queue(maxsize=queue_size * 4)
+    chunk_q: queue.Queue = queue.Queue(maxsize=queue_size)
+    vector_q: queue.Queue = queue.Queue(maxsize=queue_size)
+    counts = {"pages": 0, "chunks": 0, "skipped": 0, "embedded": 0, "stored": 0,
+              "total_pages": total_pages}
+    ids: Dict[str, int] = {}
+    kept: Optional[List[Dict]] = [] if keep_chunks else None
+
+    def extract():
+        for page in pages:
+            counts["pages"] += 1
+            if page_sink:
+                page_sink(page)
+            if not _put(page_q, page, stop):
+                return
+
+    def chunk():
+        assign = ChunkIdAssigner()
+        batch: List[tuple] = []
+        for chunk_id, piece in enumerate(iter_chunks(_drain(page_q, stop))):
+            vector_id = assign(piece.text)
+            ids[vector_id] = chunk_id
+            counts["chunks"] += 1
+            meta = make_meta(piece, chunk_id)
+            if chunk_sink:
+                chunk_sink(meta)
+            if kept is not None:
+                kept.append(meta)
+            if existing.get(vector_id) == chunk_id:
+                counts["skipped"] += 1
+                continue
+            batch.append((vector_id, meta))
+            if len(batch) >= batch_size:
+                if not _put(chunk_q, batch, stop):
+                    return
+                batch = []
+        if batch:
+            _put(chunk_q, batch, stop)
+
+    def embed():
+        for batch in _drain(chunk_q, stop):
+            vectors = get_embeddings([meta["text"] for _, meta in batch])
+            counts["embedded"] += len(batch)
+            if not _put(vector_q, (batch, vectors), stop):
+                return
+
+    threads = [
+        _stage("extract", extract, page_q, stop),
+        _stage("chunk", chunk, chunk_q, stop),
+        _stage("embed", embed, vector_q, stop),
+    ]
+
+    try:
+        for batch, vectors in _drain(vector_q, stop):
+            batch_ids = [vector_id for vector_id, _ in batch]
+            metadata = [meta for _, meta in batch]
+            if not insert_vectors(index_name, vectors, metadata, ids=batch_ids):
+                raise RuntimeError(f"upsert failed after {counts['stored']} chunks")
+            counts["stored"] += len(batch)
+            if upserted is not None:
+                upserted.update((vector_id, ids[vector_id]) for vector_id in batch_ids)
+            if progress_callback:
+                progress_callback(dict(counts))
+    finally:
+        stop.set()
+        for thread in threads:
+            thread.join(timeout=1)
+
+    if progress_callback:
+        progress_callback(dict(counts))
+
+    log.info(f"{counts['chunks']} chunks from {counts['pages']} pages in '{index_name}': "
+             f"{counts['stored']} upserted, {counts['skipped']} unchanged.")
+    return {
+        "chunk_count": counts["chunks"],
+        "page_count": counts["pages"],
+        "chunks": [meta["text"] for meta in kept] if kept is not None else None,
+        "metadata": kept,
+        "ids": ids,
+        "upserted": counts["stored"],
+        "skipped": counts["skipped"],
+    }
+
+
+def _prepare_index(index_name: str, fingerprint: str, dimension: int) -> Optional[Dict]:
+    """
+    Decide how much of an index can be reused for a new version of its source.
+
+    Returns None if the index cannot be created, otherwise
+        {"unchanged": bool, "existing": {vector id: chunk_id}}
+    An index that exists without a manifest predates content-hash IDs, so it
+    is dropped and rebuilt rather than left with stale vec_N vectors.
+    """
+    manifest = load_manifest(index_name)
+    index_exists = index_name in list_indexes()
+
+    if index_exists and manifest["fingerprint"] == fingerprint and manifest["chunks"]:
+        return {"unchanged": True, "existing": manifest["chunks"]}
+
+    if index_exists and not manifest["chunks"]:
+        log.info(f"'{index_name}' has no manifest. Rebuilding it.")
+        delete_index(index_name)
+        manifest = {"fingerprint": None, "chunks": {}}
+
+    if not create_index(index_name, dimension=dimension):
+        return None
+    return {"unchanged": False, "existing": manifest["chunks"] if index_exists else {}}
+
+
+def _record_partial(index_name: str, existing: Dict[str, int], upserted: Dict[str, int]):
+    """
+    After a failed run, keep the vectors it did upsert in the manifest (fingerprint
+    cleared) so they aren't orphaned — the next ingest skips or removes them.
+    """
+    answer_cache.invalidate(index_name)
+    save_manifest(index_name, None, {**existing, **upserted})
+
+
+def _finish_index(index_name: str, fingerprint: str, existing: Dict[str, int], ids: Dict[str, int]):
+    """
+    Delete vectors for chunks that no longer exist and record the new manifest.
+    If deletion fails the stale IDs stay in the manifest (fingerprint cleared)
+    so the next ingest retries them.
+    """
+    stale = removed_ids(existing, ids)
+    answer_cache.invalidate(index_name)
+    if delete_vectors(index_name, stale):
+        save_manifest(index_name, fingerprint, ids)
+    else:
+        save_manifest(index_name, None, {**{vector_id: -1 for vector_id in stale}, **ids})
+
+
+def ingest_document(
+    source: DocumentSource,
+    index_name: str,
+    source_name: Optional[str] = None,
+    progress_callback: Optional[Callable[[Dict], None]] = None,
+    dimension: int = 384,
+) -> Dict:
+    """
+    Streaming, incremental replacement for process_document + process_and_store.
+    source is a file path or the file's bytes (then source_name is required).
+    An unchanged file (same fingerprint) is skipped entirely; a changed one
+    only embeds and upserts new or moved chunks and deletes removed ones.
+    Returns {} on failure, otherwise run_pipeline's result (without chunks)
+    plus "filename", "unchanged" and "doc_id" — the document_store key of the full text.
+    """
+    with request_context(), span("ingest"):
+        return _ingest_document(source, index_name, source_name, progress_callback, dimension)
+
+
+def _store_text(source: DocumentSource, extension: str, fingerprint: str) -> str:
+    """
+    Put an unchanged document's text in the shared store under its fingerprint (once).
+    Nothing was extracted for it this time, but the summary still needs the text.
+    """
+    if document_store.touch(fingerprint):
+        return fingerprint
+    text = extract_text_from_pdf(source) if extension == "pdf" else extract_text_from_docx(source)
+    return document_store.put(text, key=fingerprint)
+
+
+def _ingest_document(source: DocumentSource, index_name: str, source_name: Optional[str],
+                     progress_callback: Optional[Callable[[Dict], None]], dimension: int) -> Dict:
+    filename = source_name or (os.path.basename(source) if isinstance(source, str) else None)
+    if not filename:
+        log.warning("In-memory documents need a source_name.")
+        return {}
+    extension = filename.split(".")[-1].lower()
+
+    try:
+        fingerprint = file_fingerprint(source)
+        pages = iter_document_pages(source, filename)
+        total_pages = count_pdf_pages(source) if extension == "pdf" else None
+    except Exception as e:
+        log.warning(f"Cannot read document: {e}")
+        return {}
+
+    state = _prepare_index(index_name, fingerprint, dimension)
+    if state is None:
+        return {}
+    if state["unchanged"]:
+        log.info(f"'{filename}' is unchanged. Skipping ingestion.")
+        return {
+            "filename": filename,
+            "chunk_count": len(state["existing"]),
+            "page_count": total_pages,
+            "chunks": None,
+            "unchanged": True,
+            "doc_id": _store_text(source, extension, fingerprint),
+        }
+
+    def make_meta(chunk: Chunk, chunk_id: int) -> Dict:
+        return {"text": chunk.text, "source": filename, "chunk_id": chunk_id,
+                "page_start": chunk.page_start, "page_end": chunk.page_end}
+
+    # The extracted text goes to the store as the pipeline reads it — the same
+    # text _store_text extracts for an unchanged file — and each chunk into the
+    # BM25 index as it is cut, so neither is held whole in memory
+    text = None if document_store.touch(fingerprint) else document_store.writer(fingerprint)
+    bm25 = BM25Builder()
+    upserted: Dict[str, int] = {}
+    try:
+        result = run_pipeline(pages, index_name, make_meta, progress_callback, total_pages,
+                              existing=state["existing"],
+                              page_sink=(lambda page: text.write(page_text(page))) if text else None,
+                              chunk_sink=lambda meta: bm25.add(meta["text"], meta),
+                              upserted=upserted)
+    except Exception as e:
+        log.warning(f"Ingestion failed: {e}")
+        if upserted:
+            _record_partial(index_name, state["existing"], upserted)
+        result = None
+
+    if not result or not result["chunk_count"]:
+        bm25.close()
+        if text:
+            text.discard()
+        if result:
+            log.warning("No text extracted from document.")
+        return {}
+
+    _finish_index(index_name, fingerprint, state["existing"], result["ids"])
+    save_bm25(index_name, bm25)
+    result["filename"] = filename
+    result["unchanged"] = False
+    result["doc_id"] = text.commit() if text else fingerprint
+    return result
+
+
+def store_chunks(chunks: List[str], metadata: List[Dict], index_name: str,
+                 dimension: int = 384) -> bool:
+    """
+    Incrementally store already-chunked content (e.g. Research Mode).
+    Same fingerprint/ID scheme as ingest_document; the fingerprint is the
+    hash of the chunk IDs, so identical content is skipped.
+    """
+    vector_ids = list(chunk_ids(chunks))
+    fingerprint = hashlib.sha256("\n".join(vector_ids).encode("utf-8")).hexdigest()
+
+    state = _prepare_index(index_name, fingerprint, dimension)
+    if state is None:
+        return False
+    if state["unchanged"]:
+        log.info(f"'{index_name}' content is unchanged. Skipping.")
+        return True
+
+    existing = state["existing"]
+    ids = {vector_id: meta["chunk_id"] for vector_id, meta in zip(vector_ids, metadata)}
+    todo = [i for i, vector_id in enumerate(vector_ids) if existing.get(vector_id) != ids[vector_id]]
+
+    if todo:
+        vectors = get_embeddings([chunks[i] for i in todo])
+        if not insert_vectors(index_name, vectors, [metadata[i] for i in todo],
+                              ids=[vector_ids[i] for i in todo]):
+            return False
+
+    _finish_index(index_name, fingerprint, existing, ids)
+    build_bm25(index_name, chunks, metadata)
+    log.info(f"{len(todo)} chunks upserted, {len(chunks) - len(todo)} unchanged.")
+    return True
@@ -3,32 +3,77 @@
 # Fast inference, generous free tier
 
 import os
-from groq import Groq
+import json
+import time
+import random
+import hashlib
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
-from typing import List, Dict
+from telemetry import get_logger, count, span, observe, observe_stage, cache_result, run_in_context
+from typing import List, Dict, Iterator, Optional, Tuple
+from context_packer import pack_context, CONTEXT_TOKEN_BUDGET
 
 load_dotenv()
 
+log = get_logger("LLM")
+
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")
 
-# Initialize Groq client
-client = Groq(api_key=GROQ_API_KEY)
+# Groq client is built on first use — importing this module stays cheap
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """The process-wide Groq client, created on first call."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                from groq import Groq
+                _client = Groq(api_key=GROQ_API_KEY)
+    return _client
 
 # Best free model on Groq — fast and capable
 MODEL = "llama-3.3-70b-versatile"
 
+# Recent streaming timings: {"kind", "ttft_ms", "total_ms", "tokens"}
+generation_timings = deque(maxlen=200)
 
-def build_prompt(question: str, context_chunks: List[Dict], mode: str) -> str:
+# Map-reduce summarization — text is cut into groups of up to SUMMARY_GROUP_CHARS,
+# each summarized concurrently (bounded by the Groq rate limit), then reduced.
+# Group ends are chosen by content, so an edit only re-summarizes nearby groups
+SUMMARY_GROUP_CHARS = int(os.getenv("SUMMARY_GROUP_CHARS", "8000"))
+SUMMARY_BOUNDARY_EVERY = 8   # past half a group, about one piece in this many ends it
+SUMMARY_MAX_WORKERS = int(os.getenv("SUMMARY_MAX_WORKERS", "4"))
+SUMMARY_MAX_RETRIES = int(os.getenv("SUMMARY_MAX_RETRIES", "3"))
+SUMMARY_CACHE_DIR = os.getenv("SUMMARY_CACHE_DIR", ".docusphere_cache/summaries")
+
+
+def build_prompt(question: str, context_chunks: List[Dict], mode: str,
+                 token_budget: int = CONTEXT_TOKEN_BUDGET, stats: Optional[Dict] = None) -> str:
     """
     Build a well-structured prompt.
     context_chunks: list of metadata dicts from Endee query results
     mode: "document" or "research"
+    Context is packed by context_packer — adjacent chunks merged without their
+    overlap, then filled up to token_budget in relevance order. Packing stats
+    (raw/packed/saved/dropped tokens) are written into `stats` if given.
     """
-    context_texts = [chunk.get("text", "") for chunk in context_chunks if chunk.get("text")]
+    with span("prompt.build"):
+        context_texts, pack_stats = pack_context(context_chunks, token_budget)
+    if stats is not None:
+        stats.update(pack_stats)
 
     if not context_texts:
         return question
 
+    log.info(f"Context: {pack_stats['chunks']} chunks → {pack_stats['passages']} passages, "
+             f"{pack_stats['packed_tokens']} tokens ({pack_stats['saved_tokens']} saved, "
+             f"{pack_stats['dropped_tokens']} over budget).")
+
     context_block = "\n\n---\n\n".join(context_texts)
 
     if mode == "document":
@@ -60,6 +105,243 @@ ANSWER:"""
     return system_prompt, user_prompt
 
 
+def _answer_messages(question: str, context_chunks: List[Dict], mode: str,
+                     stats: Optional[Dict] = None) -> List[Dict]:
+    system_prompt, user_prompt = build_prompt(question, context_chunks, mode, stats=stats)
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": user_prompt}
+    ]
+
+
+def _summary_messages(text: str) -> List[Dict]:
+    if len(text) > SUMMARY_GROUP_CHARS:
+        # _map_reduce should never hand over more than fits — say so if it does
+        log.warning(f"Summary input is {len(text):,} chars; only the first "
+                    f"{SUMMARY_GROUP_CHARS:,} are sent.")
+        count("summary_truncated_total")
+    return [
+        {
+            "role": "system",
+            "content": "You are a helpful summarization assistant."
+        },
+        {
+            "role": "user",
+            "content": f"""Please provide a comprehensive yet concise summary structured with:
+- Main topic/theme
+- Key points (in bullet form)
+- Important conclusions or findings
+
+CONTENT:
+{text[:SUMMARY_GROUP_CHARS]}
+
+SUMMARY:"""
+        }
+    ]
+
+
+def _partial_summary_messages(text: str) -> List[Dict]:
+    return [
+        {
+            "role": "system",
+            "content": "You are a helpful summarization assistant."
+        },
+        {
+            "role": "user",
+            "content": f"""The following is one part of a longer document.
+Summarize it in a few dense bullet points. Keep every key fact, figure,
+name and conclusion; do not add anything that is not in the text.
+
+CONTENT:
+{text}
+
+PARTIAL SUMMARY:"""
+        }
+    ]
+
+
+def _summary_pieces(text: str, size: int) -> List[str]:
+    """
+    The text's lines; one longer than size // 4 is cut at sentence or word breaks
+    counted from its own start, so no cut depends on the text before it.
+    """
+    limit = max(size // 4, 1)
+    pieces = []
+    for line in text.splitlines(keepends=True):
+        while len(line) > limit:
+            cut = limit
+            for sep in (". ", " "):
+                found = line.rfind(sep, limit // 2, limit)
+                if found != -1:
+                    cut = found + len(sep)
+                    break
+            pieces.append(line[:cut])
+            line = line[cut:]
+        if line:
+            pieces.append(line)
+    return pieces
+
+
+def _split_for_summary(text: str, size: int = SUMMARY_GROUP_CHARS) -> List[Tuple[str, str]]:
+    """
+    Cut text into (group, key) pairs of at most `size` chars, on piece boundaries.
+    Past half of `size` a group ends after any piece whose hash picks it, so
+    groups after an edit line up again with the unedited version's and keep
+    their cached partial summaries. The key hashes the group's piece hashes.
+    """
+    groups: List[Tuple[str, str]] = []
+    pieces: List[str] = []
+    hashes: List[str] = []
+
+    def close():
+        group = "".join(pieces).strip()
+        if group:
+            groups.append((group, hashlib.sha256("\n".join(hashes).encode("utf-8")).hexdigest()))
+        pieces.clear()
+        hashes.clear()
+
+    for piece in _summary_pieces(text, size):
+        if pieces and sum(map(len, pieces)) + len(piece) > size:
+            close()
+        digest = hashlib.sha256(piece.encode("utf-8")).hexdigest()
+        pieces.append(piece)
+        hashes.append(digest)
+        if sum(map(len, pieces)) >= size // 2 and int(digest[:8], 16) % SUMMARY_BOUNDARY_EVERY == 0:
+            close()
+    close()
+    return groups
+
+
+def _complete_with_retry(messages: List[Dict], max_tokens: int = 512) -> str:
+    """Blocking completion with exponential backoff (rate limits surface as exceptions)."""
+    for attempt in range(SUMMARY_MAX_RETRIES + 1):
+        try:
+            with span("llm.partial_summary"):
+                response = get_client().chat.completions.create(
+                    model=MODEL,
+                    messages=messages,
+                    temperature=0.3,
+                    max_tokens=max_tokens
+                )
+            return response.choices[0].message.content
+        except Exception as e:
+            if attempt == SUMMARY_MAX_RETRIES:
+                raise
+            delay = (2 ** attempt) * (1 + random.random())
+            log.warning(f"Partial summary failed ({e}); retrying in {delay:.1f}s.")
+            time.sleep(delay)
+
+
+def _cached_partial_summary(text: str, key: str, stats: Dict) -> str:
+    """Partial summary for one group, cached on disk under its key (see _split_for_summary)."""
+    digest = hashlib.sha256(f"{MODEL}\n{key}".encode("utf-8")).hexdigest()
+    path = os.path.join(SUMMARY_CACHE_DIR, f"{digest}.json")
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            summary = json.load(f)["summary"]
+        stats["cache_hits"] += 1
+        cache_result("summary", hit=True)
+        return summary
+    except (OSError, ValueError, KeyError):
+        cache_result("summary", hit=False)
+
+    summary = _complete_with_retry(_partial_summary_messages(text))
+    os.makedirs(SUMMARY_CACHE_DIR, exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"summary": summary}, f)
+    os.replace(tmp_path, path)
+    return summary
+
+
+def _fit_evenly(parts: List[str], size: int) -> str:
+    """Keep the head of every part so the joined text fits in `size` — coverage of the whole document over depth."""
+    share = max(size // len(parts) - 2, 1)
+    return "\n\n".join(part[:share] for part in parts)
+
+
+def _map_reduce(text: str, stats: Dict) -> str:
+    """
+    Shrink text until it fits one final summary call.
+    Each round summarizes every group concurrently (SUMMARY_MAX_WORKERS),
+    then joins the partials — so a 300-page document takes a few rounds,
+    not one call per page in sequence.
+    """
+    while len(text) > SUMMARY_GROUP_CHARS:
+        groups = _split_for_summary(text)
+        round_started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=SUMMARY_MAX_WORKERS) as pool:
+            futures = [pool.submit(run_in_context(_cached_partial_summary), group, key, stats)
+                       for group, key in groups]
+            partials = [future.result() for future in futures]
+        elapsed = time.perf_counter() - round_started
+
+        stats["rounds"] += 1
+        stats["groups"] += len(groups)
+        log.info(f"Summary round {stats['rounds']}: {len(groups)} groups, "
+                 f"{len(text):,} chars in {elapsed:.1f}s ({len(text) / max(elapsed, 1e-6):,.0f} chars/s).")
+
+        reduced = "\n\n".join(partials)
+        if len(reduced) >= len(text):
+            # The model isn't compressing — stop rather than loop, but cut every
+            # partial evenly so the final call still sees the whole document,
+            # not just its first SUMMARY_GROUP_CHARS
+            log.warning(f"Summary round {stats['rounds']} did not compress "
+                        f"({len(text):,} → {len(reduced):,} chars); trimming {len(partials)} partials evenly.")
+            count("summary_fallback_total")
+            stats["fallback"] = True
+            return _fit_evenly(partials, SUMMARY_GROUP_CHARS)
+        text = reduced
+    return text
+
+
+def _new_summary_stats(text: str) -> Dict:
+    return {"input_chars": len(text), "rounds": 0, "groups": 0, "cache_hits": 0,
+            "map_ms": 0.0, "total_ms": 0.0}
+
+
+def _stream_completion(messages: List[Dict], kind: str,
+                       timings: Optional[Dict] = None) -> Iterator[str]:
+    """
+    Yield completion tokens as Groq streams them.
+    Time-to-first-token and total generation time are written into
+    `timings` (if given) and appended to generation_timings.
+    """
+    started = time.perf_counter()
+    record = {"kind": kind, "ttft_ms": None, "total_ms": None, "tokens": 0}
+    failed = False
+    try:
+        stream = get_client().chat.completions.create(
+            model=MODEL,
+            messages=messages,
+            temperature=0.3,
+            max_tokens=1024,
+            stream=True
+        )
+        for chunk in stream:
+            token = chunk.choices[0].delta.content if chunk.choices else None
+            if not token:
+                continue
+            if record["ttft_ms"] is None:
+                record["ttft_ms"] = (time.perf_counter() - started) * 1000
+            record["tokens"] += 1
+            yield token
+    except Exception:
+        failed = True
+        raise
+    finally:
+        record["total_ms"] = (time.perf_counter() - started) * 1000
+        generation_timings.append(record)
+        observe_stage(f"llm.{kind}", record["total_ms"] / 1000, error=failed)
+        if record["ttft_ms"] is not None:
+            observe("llm_ttft_seconds", record["ttft_ms"] / 1000, kind=kind)
+        if timings is not None:
+            timings.update(record)
+        ttft = f"{record['ttft_ms']:.0f}ms" if record["ttft_ms"] is not None else "n/a"
+        log.info(f"{kind}: first token {ttft}, total {record['total_ms']:.0f}ms, "
+                 f"{record['tokens']} chunks.")
+
+
 def get_answer(question: str, context_chunks: List[Dict], mode: str) -> str:
     """
     Main function — takes question + retrieved Endee chunks
@@ -68,56 +350,88 @@ def get_answer(question: str, context_chunks: List[Dict], mode: str) -> str:
     if not GROQ_API_KEY:
         return "Error: Groq API key not found. Please check your .env file."
 
-    system_prompt, user_prompt = build_prompt(question, context_chunks, mode)
-
     try:
-        response = client.chat.completions.create(
-            model=MODEL,
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt}
-            ],
-            temperature=0.3,
-            max_tokens=1024
-        )
+        messages = _answer_messages(question, context_chunks, mode)
+        with span("llm.answer"):
+            response = get_client().chat.completions.create(
+                model=MODEL,
+                messages=messages,
+                temperature=0.3,
+                max_tokens=1024
+            )
         return response.choices[0].message.content
 
     except Exception as e:
+        log.warning(f"Answer failed: {e}")
         return f"Error generating answer: {str(e)}"
 
 
-def get_summary(text: str) -> str:
+def stream_answer(question: str, context_chunks: List[Dict], mode: str,
+                  timings: Optional[Dict] = None) -> Iterator[str]:
+    """Streaming variant of get_answer — yields answer tokens as they arrive."""
+    if not GROQ_API_KEY:
+        yield "Error: Groq API key not found. Please check your .env file."
+        return
+
+    try:
+        messages = _answer_messages(question, context_chunks, mode, stats=timings)
+        yield from _stream_completion(messages, "answer", timings)
+    except Exception as e:
+        yield f"Error generating answer: {str(e)}"
+
+
+def get_summary(text: str, timings: Optional[Dict] = None) -> str:
     """
     Summarize entire document or research content.
+    Long text is map-reduced (see _map_reduce) instead of truncated.
     """
     if not GROQ_API_KEY:
         return "Error: Groq API key not found."
 
+    started = time.perf_counter()
+    stats = _new_summary_stats(text)
     try:
-        response = client.chat.completions.create(
-            model=MODEL,
-            messages=[
-                {
-                    "role": "system",
-                    "content": "You are a helpful summarization assistant."
-                },
-                {
-                    "role": "user",
-                    "content": f"""Please provide a comprehensive yet concise summary structured with:
-- Main topic/theme
-- Key points (in bullet form)
-- Important conclusions or findings
+        reduced = _map_reduce(text, stats)
+        stats["map_ms"] = (time.perf_counter() - started) * 1000
+        with span("llm.summary"):
+            response = get_client().chat.completions.create(
+                model=MODEL,
+                messages=_summary_messages(reduced),
+                temperature=0.3,
+                max_tokens=1024
+            )
+        return response.choices[0].message.content
 
-CONTENT:
-{text[:8000]}
+    except Exception as e:
+        log.warning(f"Summary failed: {e}")
+        return f"Error generating summary: {str(e)}"
+
+    finally:
+        stats["total_ms"] = (time.perf_counter() - started) * 1000
+        if timings is not None:
+            timings.update(stats)
+        log.info(f"Summary of {stats['input_chars']:,} chars: {stats['groups']} groups "
+                 f"({stats['cache_hits']} cached) in {stats['total_ms'] / 1000:.1f}s.")
 
-SUMMARY:"""
-                }
-            ],
-            temperature=0.3,
-            max_tokens=1024
-        )
-        return response.choices[0].message.content
 
+def stream_summary(text: str, timings: Optional[Dict] = None) -> Iterator[str]:
+    """
+    Streaming variant of get_summary — the map rounds run first,
+    then the final reduce streams its tokens as they arrive.
+    """
+    if not GROQ_API_KEY:
+        yield "Error: Groq API key not found."
+        return
+
+    started = time.perf_counter()
+    stats = _new_summary_stats(text)
+    try:
+        reduced = _map_reduce(text, stats)
+        stats["map_ms"] = (time.perf_counter() - started) * 1000
+        yield from _stream_completion(_summary_messages(reduced), "summary", timings)
     except Exception as e:
-        return f"Error generating summary: {str(e)}"
\ No newline at end of file
+        yield f"Error generating summary: {str(e)}"
+    finally:
+        stats["total_ms"] = (time.perf_counter() - started) * 1000
+        if timings is not None:
+            timings.update(stats)
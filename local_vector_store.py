@@ -0,0 +1,532 @@
+# local_vector_store.py
+# Embedded, in-process vector engine with the same surface as the Endee SDK client
+# Exact NumPy cosine search for small indexes, IVF (k-means lists) for large ones
+# Vectors can be stored as float32, float16, int16, int8 or binary codes
+# Select with VECTOR_BACKEND=local — used for single-node mode, tests and benchmarks
+
+import os
+import json
+import shutil
+import threading
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+import numpy as np
+from dotenv import load_dotenv
+from telemetry import get_logger
+
+try:
+    import fcntl
+except ImportError:     # Windows: no cross-process lock, so one writing process per index
+    fcntl = None
+
+load_dotenv()
+
+log = get_logger("LocalVector")
+
+LOCAL_VECTOR_DIR = os.getenv("LOCAL_VECTOR_DIR", ".docusphere_cache/vectors")
+IVF_MIN_VECTORS = int(os.getenv("LOCAL_IVF_MIN_VECTORS", "20000"))   # below this, search is exact
+IVF_NPROBE = int(os.getenv("LOCAL_IVF_NPROBE", "8"))
+IVF_STALE_FRACTION = 0.1      # retrain once this share of live vectors is outside the lists
+KMEANS_ITERATIONS = 10
+KMEANS_SAMPLE = 50_000
+
+
+def _kmeans(vectors: np.ndarray, k: int, seed: int = 0) -> np.ndarray:
+    """Spherical k-means on a sample — returns (k, dim) unit-norm centroids."""
+    rng = np.random.default_rng(seed)
+    sample = vectors
+    if len(vectors) > KMEANS_SAMPLE:
+        sample = vectors[rng.choice(len(vectors), KMEANS_SAMPLE, replace=False)]
+    centroids = sample[rng.choice(len(sample), k, replace=False)].copy()
+
+    for _ in range(KMEANS_ITERATIONS):
+        assign = np.argmax(sample @ centroids.T, axis=1)
+        for c in range(k):
+            members = sample[assign == c]
+            if len(members):
+                centroids[c] = members.sum(axis=0)
+        norms = np.linalg.norm(centroids, axis=1, keepdims=True)
+        centroids /= np.maximum(norms, 1e-10)
+    return centroids
+
+
+# Storage precisions, same names as the Endee SDK's Precision enum values
+PRECISIONS = ("float32", "float16", "int16", "int8", "binary")
+_INT_MAX = {"int8": 127, "int16": 32767}
+_CODE_DTYPES = {"float32": np.float32, "float16": np.float16, "int16": np.int16,
+                "int8": np.int8, "binary": np.uint8}
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def precision_name(precision) -> str:
+    """Normalise a precision given as a string or the SDK's Precision enum."""
+    value = str(getattr(precision, "value", precision) or "float32").lower()
+    if value not in PRECISIONS:
+        raise ValueError(f"Unsupported precision '{value}'. Choose from {', '.join(PRECISIONS)}.")
+    return value
+
+
+def bytes_per_vector(precision: str, dimension: int) -> int:
+    """Storage cost of one vector's codes (plus its scale for integer precisions)."""
+    if precision == "binary":
+        return (dimension + 7) // 8
+    return np.dtype(_CODE_DTYPES[precision]).itemsize * dimension + (4 if precision in _INT_MAX else 0)
+
+
+class LocalIndex:
+    """
+    One index on disk:
+        info.json     — dimension, space type, precision, capacity
+        vectors.*     — memory-mapped codes, one row per slot (cosine vectors are
+                        unit-normalized first):
+                          float32/float16 — the vector itself (vectors.f32 / .float16)
+                          int8/int16      — vector / scale, rounded (scales.f32 holds the scale)
+                          binary          — sign bits, packed 8 per byte
+        records.jsonl — append-only log of upserts/deletes (id, slot, meta), replayed on open
+        lock          — taken (shared to read, exclusive to write) by every call
+
+    Several processes can open one index (the app, the service and the bulk
+    CLI share the rescore sidecar): each call first replays records the others
+    appended, and reopens the vector files if another process grew them.
+    """
+
+    def __init__(self, path: str, name: str):
+        self.path = path
+        self.name = name
+        self._lock = threading.RLock()
+        self._lock_file = open(os.path.join(path, "lock"), "a")
+        self._lock_depth = 0
+
+        self.capacity = 0
+        self._alive = np.zeros(0, dtype=bool)
+        self._info_mtime = None
+        self._log_id = None       # (device, inode) of records.jsonl as last read
+        self._log_offset = 0
+        self._reset()
+        with self._locked(exclusive=True):
+            pass
+
+    def _reset(self):
+        self._alive[:] = False
+        self._slot_of: Dict[str, int] = {}
+        self._id_of: Dict[int, str] = {}
+        self._meta: Dict[int, dict] = {}
+        self._next_slot = 0
+        self._free: List[int] = []
+        self._log_lines = 0
+        self._log_offset = 0
+        self._ivf = None
+
+    @contextmanager
+    def _locked(self, exclusive: bool):
+        """The in-process lock plus the index's lock file; picks up other processes' writes."""
+        with self._lock:
+            outer = self._lock_depth == 0
+            if outer and fcntl is not None:
+                fcntl.flock(self._lock_file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            self._lock_depth += 1
+            try:
+                if outer:
+                    self._sync()
+                yield
+            finally:
+                self._lock_depth -= 1
+                if outer and fcntl is not None:
+                    fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+
+    # ── persistence ─────────────────────────
+    @staticmethod
+    def _codes_file(precision: str) -> str:
+        return "vectors.f32" if precision == "float32" else f"vectors.{precision}"
+
+    @staticmethod
+    def _row_width(precision: str, dimension: int) -> int:
+        return (dimension + 7) // 8 if precision == "binary" else dimension
+
+    def _open_codes(self, mode: str, capacity: int, suffix: str = "") -> np.memmap:
+        return np.memmap(
+            os.path.join(self.path, self._codes_file(self.precision) + suffix),
+            dtype=_CODE_DTYPES[self.precision], mode=mode,
+            shape=(capacity, self._row_width(self.precision, self.dimension))
+        )
+
+    def _open_scales(self, mode: str, capacity: int, suffix: str = "") -> Optional[np.memmap]:
+        if self.precision not in _INT_MAX:
+            return None
+        return np.memmap(os.path.join(self.path, "scales.f32" + suffix), dtype=np.float32,
+                         mode=mode, shape=(capacity,))
+
+    def _write_info(self):
+        info_path = os.path.join(self.path, "info.json")
+        with open(info_path, "w", encoding="utf-8") as f:
+            json.dump({"dimension": self.dimension, "space_type": self.space_type,
+                       "precision": self.precision, "capacity": self.capacity}, f)
+        self._info_mtime = os.stat(info_path).st_mtime_ns
+
+    def _load_info(self, mtime: int):
+        """(Re)open the vector files at the capacity info.json records."""
+        with open(os.path.join(self.path, "info.json"), "r", encoding="utf-8") as f:
+            info = json.load(f)
+        self.dimension = info["dimension"]
+        self.space_type = info.get("space_type", "cosine")
+        self.precision = info.get("precision", "float32")
+        capacity = info["capacity"]
+        self._codes = self._open_codes("r+", capacity)
+        self._scales = self._open_scales("r+", capacity)
+        alive = np.zeros(capacity, dtype=bool)
+        alive[:min(capacity, self.capacity)] = self._alive[:capacity]
+        self._alive = alive
+        self.capacity = capacity
+        self._info_mtime = mtime
+        self._ivf = None
+
+    def _sync(self):
+        """Catch up with info.json and records.jsonl as other processes left them."""
+        mtime = os.stat(os.path.join(self.path, "info.json")).st_mtime_ns
+        if mtime != self._info_mtime:
+            self._load_info(mtime)
+        stat = os.stat(os.path.join(self.path, "records.jsonl"))
+        log_id = (stat.st_dev, stat.st_ino)
+        if log_id != self._log_id or stat.st_size < self._log_offset:
+            # First open, or another process compacted the log — replay it whole
+            self._reset()
+            self._log_id = log_id
+        if stat.st_size > self._log_offset:
+            self._replay()
+
+    @classmethod
+    def create(cls, path: str, name: str, dimension: int, space_type: str,
+               precision: str = "float32", capacity: int = 1024):
+        os.makedirs(path, exist_ok=True)
+        width = cls._row_width(precision, dimension)
+        np.memmap(os.path.join(path, cls._codes_file(precision)), dtype=_CODE_DTYPES[precision],
+                  mode="w+", shape=(capacity, width)).flush()
+        if precision in _INT_MAX:
+            np.memmap(os.path.join(path, "scales.f32"), dtype=np.float32, mode="w+",
+                      shape=(capacity,)).flush()
+        open(os.path.join(path, "records.jsonl"), "w").close()
+        with open(os.path.join(path, "info.json"), "w", encoding="utf-8") as f:
+            json.dump({"dimension": dimension, "space_type": space_type,
+                       "precision": precision, "capacity": capacity}, f)
+        return cls(path, name)
+
+    def _replay(self):
+        """Apply records appended since the last read, by this or any process."""
+        with open(os.path.join(self.path, "records.jsonl"), "rb") as f:
+            f.seek(self._log_offset)
+            for line in f:
+                try:
+                    if not line.endswith(b"\n"):
+                        raise ValueError("no newline")
+                    record = json.loads(line)
+                except ValueError:
+                    break    # torn final write — cut off before the next append
+                self._log_offset += len(line)
+                self._log_lines += 1
+                if record["op"] == "put":
+                    self._apply_put(record["id"], record["slot"], record.get("meta", {}))
+                else:
+                    self._apply_delete(record["id"])
+        used = set(self._slot_of.values())
+        self._free = [s for s in range(self._next_slot) if s not in used]
+
+    def _apply_put(self, vector_id: str, slot: int, meta: dict):
+        if self._ivf is not None:
+            self._ivf["indexed"][slot] = False
+        self._slot_of[vector_id] = slot
+        self._id_of[slot] = vector_id
+        self._meta[slot] = meta
+        self._alive[slot] = True
+        self._next_slot = max(self._next_slot, slot + 1)
+
+    def _apply_delete(self, vector_id: str) -> Optional[int]:
+        slot = self._slot_of.pop(vector_id, None)
+        if slot is not None:
+            self._alive[slot] = False
+            self._id_of.pop(slot, None)
+            self._meta.pop(slot, None)
+        return slot
+
+    def _append_log(self, records: List[dict]):
+        data = "".join(json.dumps(record) + "\n" for record in records).encode("utf-8")
+        with open(os.path.join(self.path, "records.jsonl"), "ab") as f:
+            if f.seek(0, os.SEEK_END) != self._log_offset:
+                # Cut a torn tail off, or these records would land behind it and be lost
+                log.warning(f"Dropping a torn record at the end of '{self.name}'s log.")
+                f.truncate(self._log_offset)
+            f.write(data)
+        self._log_offset += len(data)
+        self._log_lines += len(records)
+        if self._log_lines > 2 * max(len(self._slot_of), 1024):
+            self._compact_log()
+
+    def _compact_log(self):
+        """Rewrite the log with one put per live vector."""
+        log_path = os.path.join(self.path, "records.jsonl")
+        tmp_path = log_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for vector_id, slot in self._slot_of.items():
+                f.write(json.dumps({"op": "put", "id": vector_id, "slot": slot,
+                                    "meta": self._meta.get(slot, {})}) + "\n")
+        os.replace(tmp_path, log_path)
+        stat = os.stat(log_path)
+        self._log_id = (stat.st_dev, stat.st_ino)
+        self._log_offset = stat.st_size
+        self._log_lines = len(self._slot_of)
+
+    def _grow(self, needed: int):
+        """Double capacity (at least to `needed`) by copying into larger memmaps."""
+        capacity = max(self.capacity * 2, needed)
+        grown_codes = self._open_codes("w+", capacity, ".tmp")
+        grown_codes[:self.capacity] = self._codes
+        grown_codes.flush()
+        del grown_codes
+        self._codes.flush()
+        del self._codes
+        codes_path = os.path.join(self.path, self._codes_file(self.precision))
+        os.replace(codes_path + ".tmp", codes_path)
+
+        if self._scales is not None:
+            grown_scales = self._open_scales("w+", capacity, ".tmp")
+            grown_scales[:self.capacity] = self._scales
+            grown_scales.flush()
+            del grown_scales
+            self._scales.flush()
+            self._scales = None
+            scales_path = os.path.join(self.path, "scales.f32")
+            os.replace(scales_path + ".tmp", scales_path)
+
+        self._codes = self._open_codes("r+", capacity)
+        self._scales = self._open_scales("r+", capacity)
+        alive = np.zeros(capacity, dtype=bool)
+        alive[:self.capacity] = self._alive
+        self._alive = alive
+        self.capacity = capacity
+        self._write_info()
+        self._ivf = None
+
+    # ── quantization ────────────────────────
+    def _encode(self, vectors: np.ndarray):
+        """float32 rows → (codes, scales or None) in this index's precision."""
+        if self.precision == "binary":
+            return np.packbits(vectors > 0, axis=1), None
+        if self.precision in _INT_MAX:
+            scales = np.abs(vectors).max(axis=1) / _INT_MAX[self.precision]
+            scales = np.maximum(scales, 1e-10).astype(np.float32)
+            codes = np.rint(vectors / scales[:, None]).astype(_CODE_DTYPES[self.precision])
+            return codes, scales
+        return vectors.astype(_CODE_DTYPES[self.precision]), None
+
+    def _decode(self, slots) -> np.ndarray:
+        """Approximate float32 vectors for the given slots."""
+        codes = self._codes[slots]
+        if self.precision == "binary":
+            bits = np.unpackbits(codes, axis=1, count=self.dimension).astype(np.float32)
+            return (bits * 2 - 1) / np.sqrt(self.dimension, dtype=np.float32)
+        vectors = codes.astype(np.float32)
+        if self._scales is not None:
+            vectors *= self._scales[slots][:, None]
+        return vectors
+
+    def _score(self, slots, q: np.ndarray) -> np.ndarray:
+        """Similarity of q to the vectors in `slots` (an index array or a prefix slice)."""
+        codes = self._codes[slots]
+        if self.precision == "binary":
+            # Sign agreement → cosine estimate in [-1, 1]
+            q_bits = np.packbits(q > 0)
+            hamming = _POPCOUNT[codes ^ q_bits].sum(axis=1, dtype=np.int32)
+            return 1.0 - 2.0 * hamming / self.dimension
+        if self.precision == "float32":
+            return codes @ q
+        scores = codes.astype(np.float32) @ q
+        if self._scales is not None:
+            scores *= self._scales[slots]
+        return scores
+
+    def fetch_vectors(self, ids: List[str]) -> Dict[str, np.ndarray]:
+        """Stored vectors by ID (decoded to float32); unknown IDs are left out."""
+        with self._locked(exclusive=False):
+            found = [(vector_id, self._slot_of[vector_id]) for vector_id in ids
+                     if vector_id in self._slot_of]
+            if not found:
+                return {}
+            vectors = self._decode(np.asarray([slot for _, slot in found]))
+            return {vector_id: vectors[i] for i, (vector_id, _) in enumerate(found)}
+
+    # ── SDK-compatible API ──────────────────
+    def upsert(self, input_array: List[dict]):
+        """Insert or update vectors: [{"id", "vector", "meta"}, ...]."""
+        if not input_array:
+            return "Vectors inserted successfully"
+        vectors = np.asarray([item["vector"] for item in input_array], dtype=np.float32)
+        if vectors.ndim != 2 or vectors.shape[1] != self.dimension:
+            raise ValueError(f"Expected shape (N, {self.dimension}), got {vectors.shape}")
+        if self.space_type == "cosine":
+            norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+            vectors /= np.maximum(norms, 1e-10)
+        codes, scales = self._encode(vectors)
+
+        with self._locked(exclusive=True):
+            new_ids = sum(1 for item in input_array if str(item["id"]) not in self._slot_of)
+            needed = self._next_slot + max(0, new_ids - len(self._free))
+            if needed > self.capacity:
+                self._grow(needed)
+
+            records = []
+            for i, item in enumerate(input_array):
+                vector_id = str(item["id"])
+                slot = self._slot_of.get(vector_id)
+                if slot is None:
+                    slot = self._free.pop() if self._free else self._next_slot
+                    self._next_slot = max(self._next_slot, slot + 1)
+                self._codes[slot] = codes[i]
+                if scales is not None:
+                    self._scales[slot] = scales[i]
+                meta = item.get("meta") or {}
+                self._apply_put(vector_id, slot, meta)
+                records.append({"op": "put", "id": vector_id, "slot": slot, "meta": meta})
+
+            self._codes.flush()
+            if self._scales is not None:
+                self._scales.flush()
+            self._append_log(records)
+        return "Vectors inserted successfully"
+
+    def delete_vector(self, id):
+        with self._locked(exclusive=True):
+            slot = self._apply_delete(str(id))
+            if slot is None:
+                return "0 rows deleted"
+            self._free.append(slot)
+            self._append_log([{"op": "delete", "id": str(id)}])
+        return "1 rows deleted"
+
+    def query(self, vector=None, top_k: int = 10, include_vectors: bool = False, **_ignored):
+        """Top-k by cosine similarity — exact below IVF_MIN_VECTORS, IVF above."""
+        q = np.asarray(vector, dtype=np.float32).reshape(-1)
+        if self.space_type == "cosine":
+            q = q / max(float(np.linalg.norm(q)), 1e-10)
+
+        with self._locked(exclusive=False):
+            live = len(self._slot_of)
+            if live == 0:
+                return []
+            if live >= IVF_MIN_VECTORS:
+                candidates = self._ivf_candidates(q)
+                scores = self._score(candidates, q)
+            else:
+                # Exact: one matmul over the contiguous prefix, dead slots masked out
+                alive = self._alive[:self._next_slot]
+                candidates = np.flatnonzero(alive)
+                scores = self._score(slice(0, self._next_slot), q)[alive]
+
+            k = min(top_k, len(candidates))
+            if k <= 0:
+                return []
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+
+            results = []
+            for i in top:
+                slot = int(candidates[i])
+                similarity = float(scores[i])
+                results.append({
+                    "id": self._id_of[slot],
+                    "similarity": similarity,
+                    "distance": 1.0 - similarity,
+                    "meta": self._meta.get(slot, {}),
+                    "vector": self._decode([slot])[0].tolist() if include_vectors else [],
+                })
+            return results
+
+    def describe(self) -> dict:
+        with self._locked(exclusive=False):
+            return {"name": self.name, "dimension": self.dimension, "space_type": self.space_type,
+                    "precision": self.precision, "count": len(self._slot_of),
+                    "bytes_per_vector": bytes_per_vector(self.precision, self.dimension),
+                    "ivf": self._ivf is not None}
+
+    # ── IVF ─────────────────────────────────
+    def _build_ivf(self):
+        slots = np.flatnonzero(self._alive[:self._next_slot])
+        vectors = self._decode(slots)
+        nlist = max(1, int(np.sqrt(len(slots))))
+        centroids = _kmeans(vectors, nlist)
+        assign = np.argmax(vectors @ centroids.T, axis=1)
+        order = np.argsort(assign, kind="stable")
+        offsets = np.searchsorted(assign[order], np.arange(nlist + 1))
+        indexed = np.zeros(self.capacity, dtype=bool)
+        indexed[slots] = True
+        self._ivf = {"centroids": centroids, "slots": slots[order], "offsets": offsets,
+                     "indexed": indexed}
+        log.info(f"Built IVF for '{self.name}': {nlist} lists over {len(slots)} vectors.")
+
+    def _ivf_candidates(self, q: np.ndarray) -> np.ndarray:
+        """Slots in the nprobe closest lists, plus live vectors added since training."""
+        alive = self._alive[:self._next_slot]
+        if self._ivf is not None:
+            unindexed = np.flatnonzero(alive & ~self._ivf["indexed"][:self._next_slot])
+            if len(unindexed) > IVF_STALE_FRACTION * len(self._slot_of):
+                self._ivf = None
+        if self._ivf is None:
+            self._build_ivf()
+            unindexed = np.empty(0, dtype=np.int64)
+
+        ivf = self._ivf
+        nprobe = min(IVF_NPROBE, len(ivf["centroids"]))
+        lists = np.argpartition(-(ivf["centroids"] @ q), nprobe - 1)[:nprobe]
+        probed = [ivf["slots"][ivf["offsets"][c]:ivf["offsets"][c + 1]] for c in lists]
+        # A reused slot is both unindexed and still in its old list — count it once
+        candidates = np.unique(np.concatenate(probed + [unindexed]))
+        return candidates[self._alive[candidates]]
+
+
+class LocalVectorStore:
+    """Drop-in for the Endee client: create_index / get_index / list_indexes / delete_index."""
+
+    def __init__(self, root: str = LOCAL_VECTOR_DIR):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+        self._indexes: Dict[str, LocalIndex] = {}
+        self._lock = threading.Lock()
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.root, name)
+
+    def create_index(self, name: str, dimension: int, space_type: str = "cosine",
+                     precision=None, **_ignored):
+        precision = precision_name(precision)
+        with self._lock:
+            if os.path.exists(os.path.join(self._path(name), "info.json")):
+                raise ValueError(f"Index '{name}' already exists")
+            self._indexes[name] = LocalIndex.create(self._path(name), name, dimension,
+                                                    space_type, precision)
+        return "Index created successfully"
+
+    def get_index(self, name: str) -> LocalIndex:
+        with self._lock:
+            index = self._indexes.get(name)
+            if index is not None and not os.path.exists(os.path.join(self._path(name), "info.json")):
+                # Deleted by another process
+                self._indexes.pop(name)
+                index = None
+            if index is None:
+                if not os.path.exists(os.path.join(self._path(name), "info.json")):
+                    raise ValueError(f"Index '{name}' does not exist")
+                index = self._indexes[name] = LocalIndex(self._path(name), name)
+            return index
+
+    def list_indexes(self) -> List[str]:
+        return sorted(
+            name for name in os.listdir(self.root)
+            if os.path.exists(os.path.join(self._path(name), "info.json"))
+        )
+
+    def delete_index(self, name: str):
+        with self._lock:
+            self._indexes.pop(name, None)
+            if not os.path.exists(self._path(name)):
+                raise ValueError(f"Index '{name}' does not exist")
+            shutil.rmtree(self._path(name))
+        return f"Index {name} deleted successfully"
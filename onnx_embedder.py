@@ -0,0 +1,125 @@
+# onnx_embedder.py
+# Runs the sentence-transformers model through ONNX Runtime instead of PyTorch
+# Same tokenizer, mean pooling and normalization as the SentenceTransformer
+# pipeline, without importing torch. Optional int8 dynamic quantization
+# Select with EMBED_BACKEND=onnx or EMBED_BACKEND=onnx-int8
+
+import os
+import json
+from typing import Dict, List, Optional
+
+import numpy as np
+from dotenv import load_dotenv
+from telemetry import get_logger
+
+load_dotenv()
+
+log = get_logger("Embedder")
+
+ONNX_DIR = os.getenv("EMBED_ONNX_DIR", ".docusphere_cache/onnx")
+HF_ORG = "sentence-transformers"
+ONNX_FILE = "onnx/model.onnx"       # exported graph published in the model repo
+
+
+def _hub_file(repo_id: str, filename: str) -> str:
+    from huggingface_hub import hf_hub_download
+    return hf_hub_download(repo_id=repo_id, filename=filename)
+
+
+def _quantized_model(model_path: str, model_name: str) -> str:
+    """int8 dynamic-quantized copy of the model, built once and kept in ONNX_DIR."""
+    out_path = os.path.join(ONNX_DIR, f"{model_name.replace('/', '_')}.int8.onnx")
+    if not os.path.exists(out_path):
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+        os.makedirs(ONNX_DIR, exist_ok=True)
+        tmp_path = out_path + ".tmp"
+        quantize_dynamic(model_path, tmp_path, weight_type=QuantType.QInt8)
+        os.replace(tmp_path, out_path)
+        log.info(f"Quantized ONNX model written to {out_path}.")
+    return out_path
+
+
+class _Tokenizer:
+    """
+    The subset of the HF tokenizer call that embedder._token_lengths uses.
+    Truncation is set once here: the tokenizer is shared by every encoding
+    thread, so reconfiguring it per call would race.
+    """
+
+    def __init__(self, tokenizer, max_length: int):
+        self._tokenizer = tokenizer
+        self._tokenizer.no_padding()
+        self._tokenizer.enable_truncation(max_length)
+        self._max_length = max_length
+
+    def __call__(self, texts: List[str], add_special_tokens: bool = True,
+                 truncation: bool = True, max_length: Optional[int] = None) -> Dict:
+        if not truncation or (max_length or self._max_length) != self._max_length:
+            raise ValueError(f"Tokenizer truncates to {self._max_length} tokens; "
+                             f"got truncation={truncation}, max_length={max_length}")
+        encodings = self._tokenizer.encode_batch(texts, add_special_tokens=add_special_tokens)
+        return {"input_ids": [e.ids for e in encodings]}
+
+
+class OnnxEmbedder:
+    """
+    Drop-in for the parts of SentenceTransformer that embedder.py uses:
+    encode(), tokenizer, max_seq_length and get_sentence_embedding_dimension().
+    """
+
+    def __init__(self, model_name: str, quantize: bool = False, num_threads: int = 0):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        repo_id = model_name if "/" in model_name else f"{HF_ORG}/{model_name}"
+        model_path = _hub_file(repo_id, ONNX_FILE)
+        if quantize:
+            model_path = _quantized_model(model_path, model_name)
+
+        with open(_hub_file(repo_id, "sentence_bert_config.json"), "r", encoding="utf-8") as f:
+            self.max_seq_length = json.load(f).get("max_seq_length", 256)
+        with open(_hub_file(repo_id, "modules.json"), "r", encoding="utf-8") as f:
+            self._normalize = any(m.get("type", "").endswith("Normalize") for m in json.load(f))
+
+        self._tokenizer = Tokenizer.from_file(_hub_file(repo_id, "tokenizer.json"))
+        self._tokenizer.enable_truncation(self.max_seq_length)
+        self._tokenizer.enable_padding()
+        self.tokenizer = _Tokenizer(Tokenizer.from_file(_hub_file(repo_id, "tokenizer.json")),
+                                    self.max_seq_length)
+
+        options = ort.SessionOptions()
+        if num_threads > 0:
+            options.intra_op_num_threads = num_threads
+        self._session = ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        self._input_names = {i.name for i in self._session.get_inputs()}
+        self._dimension = self._session.get_outputs()[0].shape[-1]
+        self.quantized = quantize
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self._dimension
+
+    def _encode_batch(self, texts: List[str]) -> np.ndarray:
+        encodings = self._tokenizer.encode_batch(texts)
+        input_ids = np.asarray([e.ids for e in encodings], dtype=np.int64)
+        attention_mask = np.asarray([e.attention_mask for e in encodings], dtype=np.int64)
+        feeds = {"input_ids": input_ids, "attention_mask": attention_mask}
+        if "token_type_ids" in self._input_names:
+            feeds["token_type_ids"] = np.asarray([e.type_ids for e in encodings], dtype=np.int64)
+
+        token_embeddings = self._session.run(None, feeds)[0]
+        # Mean pooling over real tokens, as the SentenceTransformer Pooling module does
+        mask = attention_mask[:, :, None].astype(np.float32)
+        embeddings = (token_embeddings * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+        if self._normalize:
+            embeddings /= np.maximum(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12)
+        return embeddings.astype(np.float32)
+
+    def encode(self, texts, batch_size: int = 32, convert_to_numpy: bool = True,
+               show_progress_bar: bool = False, **_ignored) -> np.ndarray:
+        """(len(texts), dim) float32 embeddings; a single string gives a (dim,) vector."""
+        single = isinstance(texts, str)
+        texts = [texts] if single else list(texts)
+        out = np.empty((len(texts), self._dimension), dtype=np.float32)
+        for start in range(0, len(texts), max(batch_size, 1)):
+            out[start:start + batch_size] = self._encode_batch(texts[start:start + batch_size])
+        return out[0] if single else out
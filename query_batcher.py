@@ -0,0 +1,150 @@
+# query_batcher.py
+# Query-time embedding: in-process LRU cache + dynamic micro-batching
+# Streamlit runs each session in its own thread, so everything here is thread-safe
+
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Callable, List, Optional
+
+import numpy as np
+from dotenv import load_dotenv
+from telemetry import cache_result
+
+load_dotenv()
+
+QUERY_CACHE_SIZE = int(os.getenv("QUERY_CACHE_SIZE", "1024"))
+QUERY_BATCH_MAX_WAIT_MS = float(os.getenv("QUERY_BATCH_MAX_WAIT_MS", "5"))
+QUERY_BATCH_MAX_SIZE = int(os.getenv("QUERY_BATCH_MAX_SIZE", "32"))
+
+
+def normalize_query(text: str) -> str:
+    """
+    Cache key for a query — collapsed whitespace, case-folded.
+    all-MiniLM-L6-v2 uses an uncased tokenizer, so case never changes the vector.
+    """
+    return " ".join(text.split()).casefold()
+
+
+class QueryEmbedder:
+    """
+    Embeds user queries one at a time from many threads.
+
+    Cache hits return immediately. Misses are queued; a single worker thread
+    waits up to max_wait_ms after the first queued query for more to arrive,
+    then encodes up to max_batch_size of them in one encode_fn call.
+    """
+
+    def __init__(self, encode_fn: Callable[[List[str]], np.ndarray],
+                 cache_size: int = QUERY_CACHE_SIZE,
+                 max_wait_ms: float = QUERY_BATCH_MAX_WAIT_MS,
+                 max_batch_size: int = QUERY_BATCH_MAX_SIZE):
+        self.encode_fn = encode_fn
+        self.cache_size = cache_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.max_batch_size = max(1, max_batch_size)
+
+        self.hits = 0
+        self.misses = 0
+        self.batches = 0
+
+        self._cache: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._queue: "queue.Queue[tuple]" = queue.Queue()
+        self._worker: Optional[threading.Thread] = None
+        self._worker_lock = threading.Lock()
+
+    # ── cache ───────────────────────────────
+    def _cache_get(self, key: str) -> Optional[np.ndarray]:
+        with self._cache_lock:
+            vector = self._cache.get(key)
+            if vector is None:
+                self.misses += 1
+                cache_result("query_embedding", hit=False)
+                return None
+            self.hits += 1
+            cache_result("query_embedding", hit=True)
+            self._cache.move_to_end(key)
+            return vector
+
+    def _cache_put(self, key: str, vector: np.ndarray):
+        if self.cache_size <= 0:
+            return
+        with self._cache_lock:
+            self._cache[key] = vector
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    # ── batching ────────────────────────────
+    def _ensure_worker(self):
+        with self._worker_lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(
+                    target=self._run, name="query-embedder", daemon=True
+                )
+                self._worker.start()
+
+    def _collect_batch(self) -> list:
+        """Block for the first request, then gather more until max_wait or max_batch_size."""
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect_batch()
+
+            # Identical queries in one window share a single row
+            pending = {}
+            for key, future in batch:
+                pending.setdefault(key, []).append(future)
+            keys = list(pending)
+
+            try:
+                vectors = np.asarray(self.encode_fn(keys), dtype=np.float32)
+            except Exception as e:
+                for futures in pending.values():
+                    for future in futures:
+                        future.set_exception(e)
+                continue
+
+            self.batches += 1
+            for key, vector in zip(keys, vectors):
+                self._cache_put(key, vector)
+                for future in pending[key]:
+                    future.set_result(vector)
+
+    # ── public API ──────────────────────────
+    def embed(self, text: str, timeout: Optional[float] = None) -> np.ndarray:
+        """Embedding for one query, from cache or via the next micro-batch."""
+        key = normalize_query(text)
+        vector = self._cache_get(key)
+        if vector is not None:
+            return vector
+
+        future: Future = Future()
+        self._ensure_worker()
+        self._queue.put((key, future))
+        return future.result(timeout=timeout)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "batches": self.batches,
+            "cached_queries": len(self._cache),
+        }
@@ -0,0 +1,118 @@
+# query_engine.py
+# Question answering over an index: embed → (answer cache) → retrieve → rerank → LLM
+# plus summaries of stored documents (see document_store)
+# UI-free, so the Streamlit app, benchmarks and services share one code path
+
+import time
+from typing import Dict, Iterator, List, Optional
+
+from embedder import get_single_embedding
+from retrieval import retrieve
+from reranker import rerank, RERANK_ENABLED, RERANK_CANDIDATES
+from llm_handler import get_answer, stream_answer, stream_summary
+from answer_cache import answer_cache, is_cacheable
+from document_store import document_store
+from index_manifest import manifest_version
+from telemetry import cache_result, request_context, span
+
+NO_CONTEXT_ANSWER = "I couldn't find relevant information to answer your question."
+MISSING_DOCUMENT = "Error: the document text is no longer stored. Please process it again."
+
+
+def _elapsed_ms(started: float) -> float:
+    return (time.perf_counter() - started) * 1000
+
+
+def retrieve_context(question: str, question_vector, index_name: str, top_k: int = 5) -> List[Dict]:
+    """Retrieve chunks for the prompt — optionally a wider set reranked down to top_k."""
+    if not RERANK_ENABLED:
+        with span("retrieve"):
+            return retrieve(index_name, question, question_vector, top_k=top_k)
+    with span("retrieve"):
+        candidates = retrieve(index_name, question, question_vector, top_k=RERANK_CANDIDATES)
+    with span("rerank"):
+        return rerank(question, candidates, top_n=top_k)
+
+
+def query_and_answer(question: str, index_name: str, mode: str,
+                     timings: Optional[Dict] = None) -> str:
+    """
+    Embed question, query Endee, get the LLM answer — semantic cache first.
+    Per-stage times (embed_ms, retrieve_ms, llm_ms) and "cached" are written
+    into `timings` if given. Runs as one request (see telemetry.request_context).
+    """
+    with request_context(), span("query"):
+        return _query_and_answer(question, index_name, mode,
+                                 timings if timings is not None else {})
+
+
+def _query_and_answer(question: str, index_name: str, mode: str, timings: Dict) -> str:
+    started = time.perf_counter()
+    question_vector = get_single_embedding(question)
+    timings["embed_ms"] = _elapsed_ms(started)
+
+    version = manifest_version(index_name)
+    cached = answer_cache.lookup(index_name, version, mode, question_vector)
+    timings["cached"] = cached is not None
+    cache_result("answer", hit=cached is not None)
+    if cached is not None:
+        return cached
+
+    started = time.perf_counter()
+    context_chunks = retrieve_context(question, question_vector, index_name)
+    timings["retrieve_ms"] = _elapsed_ms(started)
+
+    if not context_chunks:
+        return NO_CONTEXT_ANSWER
+
+    started = time.perf_counter()
+    answer = get_answer(question, context_chunks, mode)
+    timings["llm_ms"] = _elapsed_ms(started)
+    if is_cacheable(answer):
+        answer_cache.store(index_name, version, mode, question, question_vector, answer)
+    return answer
+
+
+def stream_query_and_answer(question: str, index_name: str, mode: str,
+                            timings: Optional[Dict] = None) -> Iterator[str]:
+    """
+    Streaming variant of query_and_answer — yields answer tokens as Groq produces them.
+    The request (and its "query" span) lasts until the stream is consumed.
+    """
+    with request_context(), span("query"):
+        yield from _stream_query_and_answer(question, index_name, mode, timings)
+
+
+def _stream_query_and_answer(question: str, index_name: str, mode: str,
+                             timings: Optional[Dict]) -> Iterator[str]:
+    question_vector = get_single_embedding(question)
+    version = manifest_version(index_name)
+    cached = answer_cache.lookup(index_name, version, mode, question_vector)
+    cache_result("answer", hit=cached is not None)
+    if cached is not None:
+        if timings is not None:
+            timings.update({"cached": True})
+        yield cached
+        return
+
+    context_chunks = retrieve_context(question, question_vector, index_name)
+
+    if not context_chunks:
+        yield NO_CONTEXT_ANSWER
+        return
+
+    answer = ""
+    for token in stream_answer(question, context_chunks, mode, timings):
+        answer += token
+        yield token
+    if is_cacheable(answer):
+        answer_cache.store(index_name, version, mode, question, question_vector, answer)
+
+
+def stream_document_summary(doc_id: str, timings: Optional[Dict] = None) -> Iterator[str]:
+    """Stream a summary of the document_store text under doc_id."""
+    text = document_store.get(doc_id)
+    if text is None:
+        yield MISSING_DOCUMENT
+        return
+    yield from stream_summary(text, timings)
@@ -0,0 +1,88 @@
+# reranker.py
+# Optional cross-encoder rerank stage between retrieval and the LLM
+# Scores a wide candidate set in one batched CPU forward pass; if scoring
+# doesn't finish inside the latency budget, retrieval order is used instead
+
+import os
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from typing import Dict, List
+
+import streamlit as st
+from dotenv import load_dotenv
+from telemetry import get_logger
+
+load_dotenv()
+
+log = get_logger("Reranker")
+
+RERANK_ENABLED = os.getenv("RERANK_ENABLED", "0") == "1"
+RERANK_MODEL = os.getenv("RERANK_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+RERANK_CANDIDATES = int(os.getenv("RERANK_CANDIDATES", "50"))
+RERANK_TOP_N = int(os.getenv("RERANK_TOP_N", "5"))
+RERANK_BUDGET_MS = float(os.getenv("RERANK_BUDGET_MS", "300"))
+RERANK_BATCH_SIZE = 64
+
+# One scoring thread: a CPU forward pass is already multi-threaded inside torch.
+# While a pass that ran over budget is still finishing, later requests skip
+# reranking instead of queueing behind it
+_scorer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="rerank")
+_overrun = None
+_overrun_lock = threading.Lock()
+
+
+def _clear_overrun(future):
+    global _overrun
+    with _overrun_lock:
+        if _overrun is future:
+            _overrun = None
+
+
+@st.cache_resource   # Loads the cross-encoder ONCE, shared across sessions
+def load_reranker():
+    from sentence_transformers import CrossEncoder
+    return CrossEncoder(RERANK_MODEL, device="cpu")
+
+
+def _score(question: str, texts: List[str]):
+    model = load_reranker()
+    return model.predict([(question, text) for text in texts],
+                         batch_size=RERANK_BATCH_SIZE, show_progress_bar=False)
+
+
+def rerank(question: str, candidates: List[Dict], top_n: int = RERANK_TOP_N,
+           budget_ms: float = RERANK_BUDGET_MS) -> List[Dict]:
+    """
+    Reorder candidate chunk metadata by cross-encoder relevance.
+    Returns the top_n; falls back to the incoming order on timeout or error.
+    """
+    texts = [c.get("text", "") for c in candidates]
+    if len(candidates) <= 1:
+        return candidates[:top_n]
+
+    global _overrun
+    started = time.perf_counter()
+    with _overrun_lock:
+        if _overrun is not None:
+            log.warning("An over-budget pass is still running; using retrieval order.")
+            return candidates[:top_n]
+    future = _scorer.submit(_score, question, texts)
+    try:
+        scores = future.result(timeout=budget_ms / 1000)
+    except FutureTimeout:
+        if not future.cancel():
+            # Already running: hold later requests off until it finishes
+            with _overrun_lock:
+                _overrun = future
+            future.add_done_callback(_clear_overrun)
+        log.warning(f"Over {budget_ms:.0f}ms budget; using retrieval order.")
+        return candidates[:top_n]
+    except Exception as e:
+        log.warning(f"Failed ({e}); using retrieval order.")
+        return candidates[:top_n]
+
+    order = sorted(range(len(candidates)), key=lambda i: float(scores[i]), reverse=True)
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    log.info(f"Scored {len(candidates)} candidates in {elapsed_ms:.0f}ms.")
+    return [candidates[i] for i in order[:top_n]]
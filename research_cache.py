@@ -0,0 +1,136 @@
+# research_cache.py
+# Persistent cache of raw Research Mode source responses
+# Keyed by (source, normalized query), with per-source TTLs and a size cap.
+# RESEARCH_OFFLINE=1 replays from the cache only — no network — which makes
+# research_topic reproducible for benchmarks
+
+import os
+import json
+import time
+import hashlib
+import threading
+from typing import Any, Callable, Dict, Optional
+
+from dotenv import load_dotenv
+from telemetry import get_logger, cache_result
+
+load_dotenv()
+
+log = get_logger("ResearchCache")
+
+RESEARCH_CACHE_DIR = os.getenv("RESEARCH_CACHE_DIR", ".docusphere_cache/research")
+RESEARCH_CACHE_MAX_MB = float(os.getenv("RESEARCH_CACHE_MAX_MB", "64"))
+RESEARCH_OFFLINE = os.getenv("RESEARCH_OFFLINE", "0") == "1"
+
+# Seconds each source's responses stay fresh
+SOURCE_TTLS = {
+    "wikipedia": float(os.getenv("RESEARCH_TTL_WIKIPEDIA", str(7 * 24 * 3600))),
+    "duckduckgo": float(os.getenv("RESEARCH_TTL_DUCKDUCKGO", str(24 * 3600))),
+    "page": float(os.getenv("RESEARCH_TTL_PAGE", str(3 * 24 * 3600))),
+}
+DEFAULT_TTL = 24 * 3600
+
+
+def normalize_topic(topic: str) -> str:
+    return " ".join(topic.split()).casefold()
+
+
+class ResearchCache:
+    """
+    One JSON file per (source, key). File mtime doubles as last-access time:
+    reads touch the file, and eviction removes the least recently used files
+    until the directory is back under the size cap.
+    """
+
+    def __init__(self, cache_dir: str = RESEARCH_CACHE_DIR, max_mb: float = RESEARCH_CACHE_MAX_MB,
+                 offline: bool = RESEARCH_OFFLINE):
+        self.dir = cache_dir
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.offline = offline
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(self.dir, exist_ok=True)
+
+    def _path(self, source: str, key: str) -> str:
+        digest = hashlib.sha256(f"{source}\n{key}".encode("utf-8")).hexdigest()
+        return os.path.join(self.dir, f"{source}_{digest[:40]}.json")
+
+    def get(self, source: str, key: str) -> Optional[Any]:
+        """Cached data, or None if missing or stale (staleness is ignored offline)."""
+        path = self._path(source, key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+
+        age = time.time() - entry.get("fetched_at", 0)
+        if not self.offline and age > SOURCE_TTLS.get(source, DEFAULT_TTL):
+            self.misses += 1
+            return None
+
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        self.hits += 1
+        return entry["data"]
+
+    def put(self, source: str, key: str, data: Any):
+        path = self._path(source, key)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"source": source, "key": key, "fetched_at": time.time(), "data": data}, f)
+        os.replace(tmp_path, path)
+        self._evict()
+
+    def _evict(self):
+        with self._lock:
+            entries = []
+            total = 0
+            for name in os.listdir(self.dir):
+                if not name.endswith(".json"):
+                    continue
+                try:
+                    stat = os.stat(os.path.join(self.dir, name))
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, name))
+                total += stat.st_size
+            entries.sort()
+            for _, size, name in entries:
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(os.path.join(self.dir, name))
+                    total -= size
+                except OSError:
+                    pass
+
+    def fetch(self, source: str, key: str, fetch_fn: Callable[[], Any], empty: Any) -> Any:
+        """
+        Serve from cache, else call fetch_fn and cache a non-empty result.
+        Offline, a miss returns `empty` without calling fetch_fn.
+        """
+        cached = self.get(source, key)
+        cache_result(f"research_{source}", hit=cached is not None)
+        if cached is not None:
+            log.info(f"{source} hit for '{key}'.")
+            return cached
+        if self.offline:
+            log.warning(f"Offline — no cached {source} response for '{key}'.")
+            return empty
+        data = fetch_fn()
+        if data:
+            self.put(source, key, data)
+        return data
+
+    def stats(self) -> Dict:
+        total = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0, "offline": self.offline}
+
+
+research_cache = ResearchCache()
@@ -0,0 +1,61 @@
+# retrieval.py
+# Hybrid retrieval: Endee vector search + local BM25, fused with reciprocal rank fusion
+# Both queries run in parallel, so hybrid costs max(vector, bm25) rather than the sum
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+from dotenv import load_dotenv
+
+from bm25_index import get_bm25
+from endee_client import query_index
+from telemetry import run_in_context, span
+
+load_dotenv()
+
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "hybrid").lower()     # "hybrid" or "vector"
+RRF_K = 60              # standard RRF rank constant
+CANDIDATE_FACTOR = 4    # each retriever contributes top_k × this candidates to the fusion
+
+_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="retrieval")
+
+
+def _chunk_key(meta: Dict):
+    """Identity of a chunk across both retrievers."""
+    return (meta.get("source"), meta.get("topic"), meta.get("chunk_id"))
+
+
+def reciprocal_rank_fusion(rankings: List[List[Dict]], top_k: int, k: int = RRF_K) -> List[Dict]:
+    """Fuse ranked metadata lists: score = Σ 1 / (k + rank)."""
+    scores: Dict = {}
+    metas: Dict = {}
+    for ranking in rankings:
+        for rank, meta in enumerate(ranking):
+            key = _chunk_key(meta)
+            scores[key] = scores.get(key, 0.0) + 1.0 / (k + rank + 1)
+            metas.setdefault(key, meta)
+    best = sorted(scores, key=scores.get, reverse=True)[:top_k]
+    return [metas[key] for key in best]
+
+
+def retrieve(index_name: str, question: str, question_vector: list, top_k: int = 5,
+             mode: str = RETRIEVAL_MODE) -> List[Dict]:
+    """
+    Top-k chunk metadata for a question.
+    Falls back to vector-only when hybrid is off or the index has no BM25 data
+    (e.g. ingested before BM25 existed).
+    """
+    bm25 = get_bm25(index_name) if mode == "hybrid" else None
+    if bm25 is None:
+        return query_index(index_name, question_vector, top_k=top_k)
+
+    candidates = top_k * CANDIDATE_FACTOR
+    vector_future = _pool.submit(run_in_context(query_index), index_name, question_vector, candidates)
+    with span("bm25.search"):
+        lexical = [meta for _, meta in bm25.search(question, candidates)]
+    vector = vector_future.result()
+
+    if not vector and not lexical:
+        return []
+    return reciprocal_rank_fusion([vector, lexical], top_k)
@@ -0,0 +1,476 @@
+# service.py
+# Standalone asyncio HTTP service: ingest, research, query and summarize
+# One process holds the embedding model and the Endee / Groq clients; blocking
+# work runs on a fixed thread pool fed by a bounded job queue, so when the
+# service is saturated new work is refused (503 + Retry-After) instead of
+# piling up. Identical in-flight requests — the same question on the same
+# index, the same upload, the same text to summarize — share one job, and a
+# request that joins late replays the tokens streamed so far
+# Run from the project root: python service.py
+# (app.py becomes a thin client when DOCUSPHERE_SERVICE_URL points at it)
+
+import os
+import json
+import time
+import asyncio
+import hashlib
+from http import HTTPStatus
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+from dotenv import load_dotenv
+from index_manifest import INDEX_NAME_MAX, index_name_for, is_valid_index_name
+from telemetry import (
+    get_logger, count, observe, current_request_id, request_context, render_prometheus, start_exporters
+)
+
+load_dotenv()
+
+log = get_logger("Service")
+
+SERVICE_HOST = os.getenv("SERVICE_HOST", "127.0.0.1")
+SERVICE_PORT = int(os.getenv("SERVICE_PORT", "8600"))
+SERVICE_WORKERS = int(os.getenv("SERVICE_WORKERS", "8"))          # blocking jobs run at once
+SERVICE_QUEUE_SIZE = int(os.getenv("SERVICE_QUEUE_SIZE", "64"))   # jobs waiting for a worker
+SERVICE_MAX_BODY_MB = float(os.getenv("SERVICE_MAX_BODY_MB", "16"))
+INDEX_LIST_TTL = 5.0      # seconds a fetched index list is reused
+RETRY_AFTER_SECONDS = 1
+
+_END = object()
+
+
+class HTTPError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+class Request:
+    __slots__ = ("method", "path", "query", "headers", "body")
+
+    def __init__(self, method: str, target: str, headers: Dict[str, str], body: bytes):
+        parts = urlsplit(target)
+        self.method = method
+        self.path = parts.path
+        self.query = {k: v[-1] for k, v in parse_qs(parts.query).items()}
+        self.headers = headers
+        self.body = body
+
+    def json(self) -> Dict:
+        try:
+            payload = json.loads(self.body or b"{}")
+        except ValueError:
+            raise HTTPError(400, "body is not valid JSON")
+        if not isinstance(payload, dict):
+            raise HTTPError(400, "body must be a JSON object")
+        return payload
+
+
+def _require(payload: Dict, field: str) -> str:
+    value = payload.get(field)
+    if not isinstance(value, str) or not value.strip():
+        raise HTTPError(400, f"'{field}' is required")
+    return value
+
+
+def _index_name(value, label: str = "", max_length: int = INDEX_NAME_MAX) -> str:
+    """A client-given index name (400 unless valid), else one derived from label."""
+    if value is None or value == "":
+        if not label.strip():
+            raise HTTPError(400, "'index' is required")
+        return index_name_for(label, max_length)
+    if not is_valid_index_name(value):
+        raise HTTPError(400, f"'index' must be 1-{INDEX_NAME_MAX} letters, digits or underscores")
+    return value
+
+
+def _digest(data) -> str:
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    return hashlib.sha256(data).hexdigest()
+
+
+class Job:
+    """
+    One unit of blocking work, shared by every request with the same key.
+    fn returns either a result dict or a generator: its tokens are streamed
+    to every listener and its return value becomes the result.
+    """
+
+    def __init__(self, key: Tuple, fn: Callable, request_id: Optional[str] = None):
+        self.key = key
+        self.fn = fn
+        self.request_id = request_id
+        self.tokens: List[str] = []
+        self.result: Optional[Dict] = None
+        self.error: Optional[Exception] = None
+        self.done = asyncio.Event()
+        self._listeners: List[asyncio.Queue] = []
+
+    # Called on the event loop (via call_soon_threadsafe) by the worker thread
+    def push(self, token: str):
+        self.tokens.append(token)
+        for listener in self._listeners:
+            listener.put_nowait(token)
+
+    def finish(self, result: Optional[Dict], error: Optional[Exception]):
+        self.result = result or {}
+        self.error = error
+        self.done.set()
+        for listener in self._listeners:
+            listener.put_nowait(_END)
+
+    async def stream(self) -> AsyncIterator[str]:
+        """Every token from the start, then new ones as they arrive."""
+        listener: asyncio.Queue = asyncio.Queue()
+        for token in self.tokens:
+            listener.put_nowait(token)
+        if self.done.is_set():
+            listener.put_nowait(_END)
+        else:
+            self._listeners.append(listener)
+        try:
+            while True:
+                token = await listener.get()
+                if token is _END:
+                    break
+                yield token
+        finally:
+            if listener in self._listeners:
+                self._listeners.remove(listener)
+        if self.error is not None:
+            raise self.error
+
+    async def wait(self) -> Dict:
+        await self.done.wait()
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+def _run_job(job: Job, loop: asyncio.AbstractEventLoop):
+    """Worker-thread side: run fn, forwarding streamed tokens to the loop."""
+    with request_context(job.request_id):
+        try:
+            output = job.fn()
+            if isinstance(output, dict):
+                result = output
+            else:
+                result = None
+                iterator = iter(output)
+                while True:
+                    try:
+                        token = next(iterator)
+                    except StopIteration as stop:
+                        result = stop.value
+                        break
+                    loop.call_soon_threadsafe(job.push, token)
+        except Exception as e:
+            log.warning(f"{job.key[0]} failed: {e}")
+            loop.call_soon_threadsafe(job.finish, None, e)
+            return
+    loop.call_soon_threadsafe(job.finish, result, None)
+
+
+class DocuSphereService:
+    """Routes, the in-flight job table, the bounded job queue and its workers."""
+
+    def __init__(self, workers: int = SERVICE_WORKERS, queue_size: int = SERVICE_QUEUE_SIZE):
+        self.workers = workers
+        self.queue_size = queue_size
+        self.jobs: Dict[Tuple, Job] = {}
+        self.queue: Optional[asyncio.Queue] = None
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="service")
+        self._indexes: Tuple[float, List[str]] = (0.0, [])
+        self._routes = {
+            ("GET", "/health"): self.health,
+            ("GET", "/metrics"): self.metrics,
+            ("GET", "/indexes"): self.indexes,
+            ("POST", "/ingest"): self.ingest,
+            ("POST", "/research"): self.research,
+            ("POST", "/query"): self.query,
+            ("POST", "/summarize"): self.summarize,
+        }
+
+    # ── jobs ──
+
+    def submit(self, key: Tuple, fn: Callable) -> Tuple[Job, bool]:
+        """
+        Join the in-flight job for key, or queue a new one.
+        Returns (job, shared). Raises HTTPError(503) if the queue is full.
+        """
+        job = self.jobs.get(key)
+        if job is not None:
+            count("service_coalesced_total", kind=key[0])
+            return job, True
+        job = Job(key, fn, current_request_id())
+        try:
+            self.queue.put_nowait(job)
+        except asyncio.QueueFull:
+            count("service_rejected_total", kind=key[0])
+            raise HTTPError(503, "service busy, retry later")
+        self.jobs[key] = job
+        return job, False
+
+    async def _worker(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            job = await self.queue.get()
+            try:
+                await loop.run_in_executor(self.executor, _run_job, job, loop)
+            finally:
+                if self.jobs.get(job.key) is job:
+                    del self.jobs[job.key]
+
+    # ── routes ──
+
+    async def health(self, request: Request):
+        return {"status": "ok", "workers": self.workers, "queued": self.queue.qsize(),
+                "in_flight": len(self.jobs)}
+
+    async def metrics(self, request: Request):
+        return render_prometheus()
+
+    async def indexes(self, request: Request):
+        fetched_at, names = self._indexes
+        if time.monotonic() - fetched_at > INDEX_LIST_TTL:
+            from endee_client import list_indexes
+            job, _ = self.submit(("indexes",), lambda: {"indexes": list_indexes()})
+            names = (await job.wait())["indexes"]
+            self._indexes = (time.monotonic(), names)
+        return {"indexes": names}
+
+    async def ingest(self, request: Request):
+        """Raw file bytes; ?filename=report.pdf&index=name (index defaults to the app's naming)."""
+        filename = request.query.get("filename", "")
+        extension = filename.rsplit(".", 1)[-1].lower() if "." in filename else ""
+        if extension not in ("pdf", "docx"):
+            raise HTTPError(400, "'filename' must end in .pdf or .docx")
+        if not request.body:
+            raise HTTPError(400, "empty upload")
+        index_name = _index_name(request.query.get("index"), filename)
+        body = request.body
+
+        def run() -> Dict:
+            from ingest_pipeline import ingest_document
+            # Parsed straight from the request body — no temp file
+            result = ingest_document(body, index_name, source_name=filename)
+            if not result:
+                raise HTTPError(422, "could not process document")
+            self._indexes = (0.0, [])
+            return {"index": index_name, "filename": filename, "chunk_count": result["chunk_count"],
+                    "upserted": result.get("upserted", 0), "unchanged": result["unchanged"],
+                    "doc_id": result["doc_id"]}
+
+        job, shared = self.submit(("ingest", index_name, _digest(body)), run)
+        return {**await job.wait(), "shared": shared}
+
+    async def research(self, request: Request):
+        """{"topic": "...", "index": optional} — research the web and store the result."""
+        payload = request.json()
+        topic = _require(payload, "topic")
+        index_name = _index_name(payload.get("index"), topic, max_length=30)
+
+        def run() -> Dict:
+            from web_researcher import research_topic
+            from ingest_pipeline import store_chunks
+            from document_store import document_store
+            result = research_topic(topic)
+            if not result:
+                raise HTTPError(404, "no content found for this topic")
+            if not store_chunks(result["chunks"], result["metadata"], index_name):
+                raise HTTPError(502, "failed to store in Endee")
+            self._indexes = (0.0, [])
+            return {"index": index_name, "chunk_count": len(result["chunks"]),
+                    "doc_id": document_store.put(result["text"])}
+
+        job, shared = self.submit(("research", index_name, topic.strip().casefold()), run)
+        return {**await job.wait(), "shared": shared}
+
+    async def query(self, request: Request):
+        """{"question", "index", "mode": "document" | "research", "stream": bool}"""
+        from query_batcher import normalize_query
+        payload = request.json()
+        question = _require(payload, "question")
+        index_name = _index_name(_require(payload, "index"))
+        mode = payload.get("mode", "document")
+
+        def run():
+            from query_engine import stream_query_and_answer
+            timings = {}
+            yield from stream_query_and_answer(question, index_name, mode, timings)
+            return {"timings": timings}
+
+        job, shared = self.submit(("query", index_name, mode, normalize_query(question)), run)
+        if payload.get("stream"):
+            return self._ndjson(job, shared)
+        result = await job.wait()
+        return {"answer": "".join(job.tokens), **result, "shared": shared}
+
+    async def summarize(self, request: Request):
+        """{"doc_id": "..."} (from /ingest or /research) or {"text": "..."}, plus "stream": bool"""
+        payload = request.json()
+        if payload.get("doc_id"):
+            doc_id = _require(payload, "doc_id")
+
+            def run():
+                from query_engine import stream_document_summary
+                timings = {}
+                yield from stream_document_summary(doc_id, timings)
+                return {"timings": timings}
+            key = ("summarize", doc_id)
+        else:
+            text = _require(payload, "text")
+
+            def run():
+                from llm_handler import stream_summary
+                timings = {}
+                yield from stream_summary(text, timings)
+                return {"timings": timings}
+            key = ("summarize", _digest(text))
+
+        job, shared = self.submit(key, run)
+        if payload.get("stream"):
+            return self._ndjson(job, shared)
+        result = await job.wait()
+        return {"summary": "".join(job.tokens), **result, "shared": shared}
+
+    @staticmethod
+    async def _ndjson(job: Job, shared: bool) -> AsyncIterator[Dict]:
+        """Streamed responses: {"token": ...} lines, then {"done": true, ...} or {"error": ...}."""
+        try:
+            async for token in job.stream():
+                yield {"token": token}
+        except Exception as e:
+            yield {"error": str(e)}
+            return
+        yield {"done": True, **job.result, "shared": shared}
+
+    # ── HTTP ──
+
+    async def dispatch(self, request: Request):
+        handler = self._routes.get((request.method, request.path))
+        if handler is None:
+            if any(path == request.path for _, path in self._routes):
+                raise HTTPError(405, f"{request.method} not allowed on {request.path}")
+            raise HTTPError(404, f"no route for {request.path}")
+        return await handler(request)
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """HTTP/1.1 with keep-alive; one request at a time per connection."""
+        max_body = int(SERVICE_MAX_BODY_MB * 1024 * 1024)
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                try:
+                    method, target, version = request_line.decode("latin-1").split()
+                except ValueError:
+                    await _send(writer, 400, {"error": "malformed request line"}, keep_alive=False)
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                keep_alive = (version == "HTTP/1.1"
+                              and headers.get("connection", "").lower() != "close")
+
+                try:
+                    length = int(headers.get("content-length") or 0)
+                except ValueError:
+                    length = -1
+                if length < 0:
+                    await _send(writer, 400, {"error": "malformed Content-Length"}, keep_alive=False)
+                    break
+                if length > max_body:
+                    await _send(writer, 413, {"error": f"body over {SERVICE_MAX_BODY_MB:g}MB"},
+                                keep_alive=False)
+                    break
+                body = await reader.readexactly(length) if length else b""
+
+                started = time.perf_counter()
+                request = Request(method.upper(), target, headers, body)
+                # The caller's request ID (if sent) tags the job this request starts
+                with request_context(headers.get("x-request-id")):
+                    try:
+                        status, response = 200, await self.dispatch(request)
+                    except HTTPError as e:
+                        status, response = e.status, {"error": str(e)}
+                    except Exception as e:
+                        status, response = 500, {"error": str(e)}
+                    await _send(writer, status, response, keep_alive)
+                observe("service_request_seconds", time.perf_counter() - started, route=request.path)
+                count("service_requests_total", route=request.path, status=status)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host: str = SERVICE_HOST, port: int = SERVICE_PORT,
+                    ready: Optional[Callable[[int], None]] = None):
+        """Run until cancelled. ready(port) is called once the socket is listening."""
+        self.queue = asyncio.Queue(maxsize=self.queue_size)
+        workers = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        server = await asyncio.start_server(self.handle_connection, host, port)
+        bound_port = server.sockets[0].getsockname()[1]
+        log.info(f"Listening on http://{host}:{bound_port} "
+                 f"({self.workers} workers, queue {self.queue_size}).")
+        if ready:
+            ready(bound_port)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            for worker in workers:
+                worker.cancel()
+            self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+async def _send(writer: asyncio.StreamWriter, status: int, response, keep_alive: bool):
+    """Write a JSON, plain-text (str) or streamed NDJSON (async iterator) response."""
+    head = [f"HTTP/1.1 {status} {HTTPStatus(status).phrase}",
+            f"Connection: {'keep-alive' if keep_alive else 'close'}"]
+    if status == 503:
+        head.append(f"Retry-After: {RETRY_AFTER_SECONDS}")
+
+    if hasattr(response, "__aiter__"):
+        head += ["Content-Type: application/x-ndjson", "Transfer-Encoding: chunked"]
+        writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1"))
+        async for message in response:
+            line = (json.dumps(message) + "\n").encode("utf-8")
+            writer.write(f"{len(line):x}\r\n".encode("latin-1") + line + b"\r\n")
+            await writer.drain()
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+        return
+
+    if isinstance(response, str):
+        body = response.encode("utf-8")
+        head.append("Content-Type: text/plain; version=0.0.4; charset=utf-8")
+    else:
+        body = json.dumps(response).encode("utf-8")
+        head.append("Content-Type: application/json")
+    head.append(f"Content-Length: {len(body)}")
+    writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + body)
+    await writer.drain()
+
+
+def main():
+    from embedder import warm_up
+    warm_up()
+    start_exporters()
+    try:
+        asyncio.run(DocuSphereService().serve())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+# service_client.py
+# Thin HTTP client for service.py
+# Same call shapes as the in-process functions app.py uses (list_indexes,
+# ingest_document, stream_query_and_answer, stream_document_summary), so the UI runs
+# unchanged against either; failures are logged and surface the same way
+# (empty results, "Error ..." text in streams)
+
+import os
+import json
+import threading
+from typing import Callable, Dict, Iterator, List, Optional, Union
+
+from dotenv import load_dotenv
+from telemetry import get_logger, current_request_id
+
+load_dotenv()
+
+log = get_logger("ServiceClient")
+
+SERVICE_URL = os.getenv("DOCUSPHERE_SERVICE_URL", "").rstrip("/")
+SERVICE_TIMEOUT = float(os.getenv("SERVICE_TIMEOUT", "300"))   # seconds per request
+
+_local = threading.local()
+
+
+def _session():
+    """One keep-alive session per thread (Streamlit runs each session's script in its own thread)."""
+    session = getattr(_local, "session", None)
+    if session is None:
+        import requests
+        session = _local.session = requests.Session()
+    return session
+
+
+def _headers() -> Dict[str, str]:
+    request_id = current_request_id()
+    return {"X-Request-ID": request_id} if request_id else {}
+
+
+def _request(method: str, path: str, **kwargs):
+    response = _session().request(method, f"{SERVICE_URL}{path}", timeout=SERVICE_TIMEOUT,
+                                  headers=_headers(), **kwargs)
+    if response.status_code != 200:
+        try:
+            message = response.json().get("error", response.text)
+        except ValueError:
+            message = response.text
+        raise RuntimeError(f"{path} returned {response.status_code}: {message}")
+    return response
+
+
+def list_indexes() -> List[str]:
+    return _request("GET", "/indexes").json()["indexes"]
+
+
+def ingest_document(source: Union[str, bytes, memoryview], index_name: str,
+                    source_name: Optional[str] = None,
+                    progress_callback: Optional[Callable[[Dict], None]] = None) -> Dict:
+    """
+    Upload a file (path, or bytes plus source_name) for ingestion. Returns {} on failure,
+    otherwise the service's result — chunk_count, upserted, unchanged and
+    doc_id. progress_callback only sees the final counts.
+    """
+    filename = source_name or os.path.basename(source)
+    params = {"filename": filename, "index": index_name}
+    try:
+        if isinstance(source, str):
+            with open(source, "rb") as f:
+                result = _request("POST", "/ingest", params=params, data=f).json()
+        else:
+            # requests sends only bytes as-is, so a memoryview is copied once here
+            body = source if isinstance(source, bytes) else bytes(source)
+            result = _request("POST", "/ingest", params=params, data=body).json()
+    except Exception as e:
+        log.warning(f"Ingest failed: {e}")
+        return {}
+    if progress_callback:
+        progress_callback({"pages": 0, "chunks": result["chunk_count"], "stored": result["upserted"],
+                           "skipped": result["chunk_count"] - result["upserted"], "total_pages": None})
+    return result
+
+
+def research(topic: str, index_name: str) -> Dict:
+    """Research and store a topic server-side. Returns {} on failure, else chunk_count and doc_id."""
+    try:
+        return _request("POST", "/research", json={"topic": topic, "index": index_name}).json()
+    except Exception as e:
+        log.warning(f"Research failed: {e}")
+        return {}
+
+
+def _stream(path: str, payload: Dict, timings: Optional[Dict]) -> Iterator[str]:
+    """Yield tokens from an NDJSON response; the final line's timings go into `timings`."""
+    try:
+        response = _request("POST", path, json={**payload, "stream": True}, stream=True)
+        with response:
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                message = json.loads(line)
+                if "token" in message:
+                    yield message["token"]
+                elif "error" in message:
+                    raise RuntimeError(message["error"])
+                elif message.get("done") and timings is not None:
+                    timings.update(message.get("timings") or {})
+    except Exception as e:
+        log.warning(f"{path} failed: {e}")
+        yield f"Error: {e}"
+
+
+def stream_query_and_answer(question: str, index_name: str, mode: str,
+                            timings: Optional[Dict] = None) -> Iterator[str]:
+    return _stream("/query", {"question": question, "index": index_name, "mode": mode}, timings)
+
+
+def stream_document_summary(doc_id: str, timings: Optional[Dict] = None) -> Iterator[str]:
+    return _stream("/summarize", {"doc_id": doc_id}, timings)
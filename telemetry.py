@@ -0,0 +1,332 @@
+# telemetry.py
+# Logging, timed spans with request IDs, and in-process metrics
+# Stage latencies go into histograms, cache hits/misses and errors into counters;
+# both are exported in Prometheus text format on METRICS_PORT (/metrics) and/or
+# rewritten to METRICS_FILE every METRICS_FLUSH_SECONDS
+# TELEMETRY_ENABLED=0 turns spans and metrics into no-ops (logging stays on)
+
+import os
+import sys
+import time
+import uuid
+import atexit
+import logging
+import threading
+import contextvars
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+TELEMETRY_ENABLED = os.getenv("TELEMETRY_ENABLED", "1") == "1"
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))           # 0 = no HTTP endpoint
+METRICS_FILE = os.getenv("METRICS_FILE", "")                 # empty = no metrics file
+METRICS_FLUSH_SECONDS = float(os.getenv("METRICS_FLUSH_SECONDS", "15"))
+
+# Prometheus default buckets, in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_request_id: contextvars.ContextVar = contextvars.ContextVar("request_id", default=None)
+
+# ─────────────────────────────────────────────
+# LOGGING
+# ─────────────────────────────────────────────
+
+
+class _ContextFilter(logging.Filter):
+    """Adds the component tag and the current request ID (if any) to every record."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.component = record.name.rsplit(".", 1)[-1]
+        request_id = _request_id.get()
+        record.request_suffix = f" (req {request_id})" if request_id else ""
+        return True
+
+
+class _ErrorCounter(logging.Handler):
+    """Counts warnings and errors per component — failures that are logged and swallowed."""
+
+    def emit(self, record: logging.LogRecord):
+        count("log_events_total", component=record.name.rsplit(".", 1)[-1],
+              level=record.levelname.lower())
+
+
+def _configure_logging() -> logging.Logger:
+    root = logging.getLogger("docusphere")
+    if not root.handlers:
+        handler = logging.StreamHandler(sys.stdout)
+        handler.addFilter(_ContextFilter())
+        handler.setFormatter(logging.Formatter("[%(component)s] %(message)s%(request_suffix)s"))
+        root.addHandler(handler)
+        counter = _ErrorCounter(level=logging.WARNING)
+        root.addHandler(counter)
+        root.setLevel(LOG_LEVEL)
+        root.propagate = False
+    return root
+
+
+def get_logger(component: str) -> logging.Logger:
+    """Logger whose lines read "[component] message" — the format the app always printed."""
+    _configure_logging()
+    return logging.getLogger(f"docusphere.{component}")
+
+
+log = get_logger("Telemetry")
+
+# ─────────────────────────────────────────────
+# REQUEST IDS
+# ─────────────────────────────────────────────
+
+
+def current_request_id() -> Optional[str]:
+    return _request_id.get()
+
+
+@contextmanager
+def request_context(request_id: Optional[str] = None) -> Iterator[str]:
+    """
+    Tag everything logged or traced inside the block with a request ID.
+    Nested blocks keep the outer ID, so one user action is one request.
+    """
+    existing = _request_id.get()
+    if existing is not None and request_id is None:
+        yield existing
+        return
+    token = _request_id.set(request_id or uuid.uuid4().hex[:12])
+    try:
+        yield _request_id.get()
+    finally:
+        _request_id.reset(token)
+
+
+def run_in_context(target):
+    """
+    Wrap a thread / pool target so it sees the caller's request ID.
+    Wrap once per call — a copied context can't be entered by two threads at once.
+    """
+    context = contextvars.copy_context()
+    return lambda *args, **kwargs: context.run(target, *args, **kwargs)
+
+# ─────────────────────────────────────────────
+# METRICS
+# ─────────────────────────────────────────────
+
+_Labels = Tuple[Tuple[str, str], ...]
+
+_lock = threading.Lock()
+_counters: Dict[str, Dict[_Labels, float]] = defaultdict(lambda: defaultdict(float))
+# name → labels → [bucket counts..., +Inf count], sum
+_histograms: Dict[str, Dict[_Labels, list]] = defaultdict(dict)
+recent_spans = deque(maxlen=500)    # {"name", "request_id", "ms", "error"} — newest last
+
+
+def _labels(labels: Dict) -> _Labels:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def count(name: str, amount: float = 1, **labels):
+    """Increment a counter, e.g. count("cache_requests_total", cache="answer", result="hit")."""
+    if not TELEMETRY_ENABLED:
+        return
+    key = _labels(labels)
+    with _lock:
+        _counters[name][key] += amount
+
+
+def observe(name: str, seconds: float, **labels):
+    """Record one latency sample in a histogram."""
+    if not TELEMETRY_ENABLED:
+        return
+    key = _labels(labels)
+    with _lock:
+        series = _histograms[name].get(key)
+        if series is None:
+            series = _histograms[name][key] = [[0] * (len(LATENCY_BUCKETS) + 1), 0.0]
+        buckets = series[0]
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if seconds <= bound:
+                buckets[i] += 1
+                break
+        else:
+            buckets[-1] += 1
+        series[1] += seconds
+
+
+def observe_stage(stage: str, seconds: float, error: bool = False):
+    """A finished unit of work: latency histogram, error counter, recent-spans ring."""
+    if not TELEMETRY_ENABLED:
+        return
+    observe("stage_seconds", seconds, stage=stage)
+    if error:
+        count("stage_errors_total", stage=stage)
+    recent_spans.append({"name": stage, "request_id": _request_id.get(),
+                         "ms": seconds * 1000, "error": error})
+    if log.isEnabledFor(logging.DEBUG):
+        log.debug(f"span {stage} {seconds * 1000:.1f}ms{' (error)' if error else ''}")
+
+
+class _Span:
+    __slots__ = ("stage", "started")
+
+    def __init__(self, stage: str):
+        self.stage = stage
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        observe_stage(self.stage, time.perf_counter() - self.started, exc_type is not None)
+        return False
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+def span(stage: str):
+    """Time a block: `with span("embed"): ...`. Exceptions are counted and re-raised."""
+    return _Span(stage) if TELEMETRY_ENABLED else _NOOP_SPAN
+
+
+def timed_iter(stage: str, items: Iterable) -> Iterable:
+    """Yield from items, timing the production of each one as a `stage` span."""
+    return _timed_iter(stage, items) if TELEMETRY_ENABLED else items
+
+
+def _timed_iter(stage: str, items: Iterable) -> Iterator:
+    iterator = iter(items)
+    while True:
+        started = time.perf_counter()
+        try:
+            item = next(iterator)
+        except StopIteration:
+            return
+        except Exception:
+            observe_stage(stage, time.perf_counter() - started, error=True)
+            raise
+        observe_stage(stage, time.perf_counter() - started)
+        yield item
+
+
+def cache_result(cache: str, hit: bool, amount: int = 1):
+    if amount:
+        count("cache_requests_total", amount, cache=cache, result="hit" if hit else "miss")
+
+# ─────────────────────────────────────────────
+# EXPORT
+# ─────────────────────────────────────────────
+
+
+def _format_labels(labels: _Labels, extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+    pairs = labels + extra
+    if not pairs:
+        return ""
+    escaped = (v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+def render_prometheus() -> str:
+    """All metrics in the Prometheus text exposition format."""
+    with _lock:
+        counters = {name: dict(series) for name, series in _counters.items()}
+        histograms = {name: {k: (list(v[0]), v[1]) for k, v in series.items()}
+                      for name, series in _histograms.items()}
+
+    lines: List[str] = []
+    for name, series in sorted(counters.items()):
+        lines.append(f"# TYPE docusphere_{name} counter")
+        for labels, value in sorted(series.items()):
+            lines.append(f"docusphere_{name}{_format_labels(labels)} {value:g}")
+    for name, series in sorted(histograms.items()):
+        lines.append(f"# TYPE docusphere_{name} histogram")
+        for labels, (buckets, total) in sorted(series.items()):
+            cumulative = 0
+            for bound, n in zip(LATENCY_BUCKETS, buckets):
+                cumulative += n
+                lines.append(f"docusphere_{name}_bucket{_format_labels(labels, (('le', f'{bound:g}'),))} {cumulative}")
+            cumulative += buckets[-1]
+            lines.append(f"docusphere_{name}_bucket{_format_labels(labels, (('le', '+Inf'),))} {cumulative}")
+            lines.append(f"docusphere_{name}_sum{_format_labels(labels)} {total:.6f}")
+            lines.append(f"docusphere_{name}_count{_format_labels(labels)} {cumulative}")
+    return "\n".join(lines) + "\n"
+
+
+def write_metrics_file(path: str = METRICS_FILE):
+    """Atomically replace `path` with the current metrics."""
+    if not path:
+        return
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(render_prometheus())
+    os.replace(tmp_path, path)
+
+
+def _serve_metrics(port: int):
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = render_prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("0.0.0.0", port), Handler)
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    log.info(f"Metrics at http://localhost:{port}/metrics")
+
+
+def _flush_loop(path: str, interval: float):
+    while True:
+        time.sleep(interval)
+        try:
+            write_metrics_file(path)
+        except OSError as e:
+            log.warning(f"Writing {path} failed: {e}")
+
+
+_exporters_started = False
+_exporters_lock = threading.Lock()
+
+
+def start_exporters():
+    """Start the /metrics endpoint and/or metrics-file writer once per process."""
+    global _exporters_started
+    if not TELEMETRY_ENABLED:
+        return
+    with _exporters_lock:
+        if _exporters_started:
+            return
+        _exporters_started = True
+        if METRICS_PORT:
+            try:
+                _serve_metrics(METRICS_PORT)
+            except OSError as e:
+                log.warning(f"Metrics endpoint on port {METRICS_PORT} failed: {e}")
+        if METRICS_FILE:
+            threading.Thread(target=_flush_loop, args=(METRICS_FILE, METRICS_FLUSH_SECONDS),
+                             name="metrics-file", daemon=True).start()
+            atexit.register(write_metrics_file, METRICS_FILE)
@@ -0,0 +1,39 @@
+import numpy as np
+
+from embedding_cache import EmbeddingCache
+
+DIM = 4
+
+
+def _cache(path, capacity):
+    return EmbeddingCache("model", DIM, str(path), max_mb=capacity * DIM * 4 / (1024 * 1024))
+
+
+def _vector(i):
+    return np.full(DIM, i, dtype=np.float32)
+
+
+def test_batch_larger_than_capacity_keeps_the_last_keys(tmp_path):
+    cache = _cache(tmp_path, capacity=3)
+    cache.put_many(["old"], _vector(9)[None])
+    keys = [f"k{i}" for i in range(5)]
+    cache.put_many(keys, np.stack([_vector(i) for i in range(5)]))
+
+    reopened = _cache(tmp_path, capacity=3)
+    found = reopened.get_many(["old"] + keys)
+    assert [v is not None for v in found] == [False, False, False, True, True, True]
+    for i in (2, 3, 4):
+        assert np.array_equal(found[i + 1], _vector(i))
+    assert reopened.stats()["entries"] == 3
+
+
+def test_reused_slot_never_returns_the_evicted_vector(tmp_path):
+    cache = _cache(tmp_path, capacity=2)
+    cache.put_many(["a", "b"], np.stack([_vector(1), _vector(2)]))
+    cache.put_many(["c"], _vector(3)[None])
+
+    reopened = _cache(tmp_path, capacity=2)
+    a, b, c = reopened.get_many(["a", "b", "c"])
+    assert a is None
+    assert np.array_equal(b, _vector(2))
+    assert np.array_equal(c, _vector(3))
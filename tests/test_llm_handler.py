@@ -0,0 +1,25 @@
+import random
+
+from llm_handler import _split_for_summary
+
+
+def _document(n_lines, seed=0):
+    rng = random.Random(seed)
+    words = ["alpha", "beta", "gamma", "delta", "vector", "index", "query", "model", "cache"]
+    return "".join(" ".join(rng.choice(words) for _ in range(rng.randint(5, 15))) + ".\n"
+                   for _ in range(n_lines))
+
+
+def test_groups_respect_size_and_cover_text():
+    text = _document(2000)
+    groups = _split_for_summary(text, size=4000)
+    assert all(len(group) <= 4000 for group, _ in groups)
+    assert "".join(group.replace("\n", "") for group, _ in groups) == text.replace("\n", "")
+
+
+def test_edit_near_start_keeps_later_group_keys():
+    text = _document(2000)
+    edited = "An inserted opening sentence.\n" + text
+    before = [key for _, key in _split_for_summary(text, size=4000)]
+    after = [key for _, key in _split_for_summary(edited, size=4000)]
+    assert len(set(before) & set(after)) >= len(before) - 3
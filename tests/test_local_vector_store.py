@@ -0,0 +1,50 @@
+import numpy as np
+
+import local_vector_store
+from local_vector_store import LocalVectorStore
+
+
+def _vectors(n, dim=8, seed=0):
+    return np.random.default_rng(seed).standard_normal((n, dim)).astype(np.float32)
+
+
+def test_write_after_torn_log_line_survives_reopen(tmp_path):
+    store = LocalVectorStore(str(tmp_path))
+    store.create_index("docs", dimension=8)
+    vectors = _vectors(2)
+    store.get_index("docs").upsert([{"id": "a", "vector": vectors[0]}])
+
+    # A crash mid-append leaves a partial last line
+    with open(tmp_path / "docs" / "records.jsonl", "a", encoding="utf-8") as f:
+        f.write('{"op": "put", "id": "tor')
+
+    index = LocalVectorStore(str(tmp_path)).get_index("docs")
+    index.upsert([{"id": "b", "vector": vectors[1]}])
+
+    reopened = LocalVectorStore(str(tmp_path)).get_index("docs")
+    assert set(reopened.fetch_vectors(["a", "b", "tor"])) == {"a", "b"}
+
+
+def test_ivf_query_does_not_repeat_a_reused_slot(tmp_path, monkeypatch):
+    monkeypatch.setattr(local_vector_store, "IVF_MIN_VECTORS", 10)
+    monkeypatch.setattr(local_vector_store, "IVF_NPROBE", 64)
+    store = LocalVectorStore(str(tmp_path))
+    store.create_index("docs", dimension=8)
+    index = store.get_index("docs")
+    vectors = _vectors(31)
+    index.upsert([{"id": f"v{i}", "vector": vectors[i]} for i in range(30)])
+    index.query(vectors[0], top_k=5)    # trains the IVF lists
+
+    index.delete_vector("v3")
+    index.upsert([{"id": "new", "vector": vectors[30]}])
+    ids = [r["id"] for r in index.query(vectors[30], top_k=10)]
+    assert ids[0] == "new"
+    assert len(ids) == len(set(ids))
+
+
+def test_query_with_top_k_zero(tmp_path):
+    store = LocalVectorStore(str(tmp_path))
+    store.create_index("docs", dimension=8)
+    index = store.get_index("docs")
+    index.upsert([{"id": "a", "vector": _vectors(1)[0]}])
+    assert index.query(_vectors(1)[0], top_k=0) == []
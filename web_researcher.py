@@ -2,29 +2,79 @@
 # Agentic web research module
 # Takes a topic, searches the web, fetches content,
 # and returns clean chunked text ready for embedding into Endee
+# Search/HTTP libraries are imported on first research call, not at app start
+# Sources are fetched concurrently under one time budget, so research
+# latency is bounded by the slowest source rather than their sum
 
-from duckduckgo_search import DDGS
-import wikipedia
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from typing import List, Dict
+from typing import List, Dict, Optional
+from concurrent.futures import ThreadPoolExecutor, wait
+from urllib.parse import urlparse
+from html import unescape
+from dotenv import load_dotenv
+from telemetry import get_logger, run_in_context, span
+from research_cache import research_cache, normalize_topic
+from chunker import split_text
+import os
+import re
+import threading
 import time
 
+load_dotenv()
 
-# Same chunk settings as document_processor for consistency
-text_splitter = RecursiveCharacterTextSplitter(
-    chunk_size=1000,
-    chunk_overlap=150,
-    separators=["\n\n", "\n", ".", " ", ""]
-)
+log = get_logger("WebResearcher")
+
+
+# Research tuning
+RESEARCH_TIME_BUDGET = float(os.getenv("RESEARCH_TIME_BUDGET", "15"))      # seconds, whole run
+RESEARCH_FETCH_PAGES = os.getenv("RESEARCH_FETCH_PAGES", "0") == "1"       # full text of top results
+RESEARCH_FETCH_TOP_N = int(os.getenv("RESEARCH_FETCH_TOP_N", "3"))
+RESEARCH_PAGE_CHARS = int(os.getenv("RESEARCH_PAGE_CHARS", "6000"))        # cap per fetched page
+RESEARCH_HOST_INTERVAL = float(os.getenv("RESEARCH_HOST_INTERVAL", "0.5")) # min gap per host
+RESEARCH_MAX_WORKERS = 8
+
+USER_AGENT = "DocuSphere/1.0 (research mode)"
+
+
+class HostRateLimiter:
+    """
+    Spaces out requests to the same host by at least `interval` seconds.
+    Different hosts never wait on each other.
+    """
+
+    def __init__(self, interval: float = RESEARCH_HOST_INTERVAL):
+        self.interval = interval
+        self._next_allowed: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def wait(self, host: str):
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_allowed.get(host, 0.0))
+            self._next_allowed[host] = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+rate_limiter = HostRateLimiter()
 
 
 def search_duckduckgo(topic: str, max_results: int = 5) -> List[Dict]:
     """
     Search DuckDuckGo for a topic and return top results.
     Returns list of dicts with title, url, and snippet.
+    Responses are served from research_cache while fresh.
     """
+    return research_cache.fetch(
+        "duckduckgo", f"{normalize_topic(topic)}|{max_results}",
+        lambda: _search_duckduckgo(topic, max_results), []
+    )
+
+
+def _search_duckduckgo(topic: str, max_results: int) -> List[Dict]:
     results = []
     try:
+        from duckduckgo_search import DDGS
+        rate_limiter.wait("duckduckgo.com")
         with DDGS() as ddgs:
             search_results = ddgs.text(
                 topic,
@@ -36,9 +86,9 @@ def search_duckduckgo(topic: str, max_results: int = 5) -> List[Dict]:
                     "url": r.get("href", ""),
                     "snippet": r.get("body", "")
                 })
-        print(f"[WebResearcher] Found {len(results)} DuckDuckGo results.")
+        log.info(f"Found {len(results)} DuckDuckGo results.")
     except Exception as e:
-        print(f"[WebResearcher] DuckDuckGo search error: {e}")
+        log.warning(f"DuckDuckGo search error: {e}")
     return results
 
 
@@ -46,52 +96,137 @@ def fetch_wikipedia_content(topic: str, sentences: int = 50) -> str:
     """
     Fetch detailed Wikipedia article for the topic.
     sentences=50 gives a comprehensive summary.
+    One wikipedia.summary call resolves the page and fetches the extract.
+    Responses are served from research_cache while fresh.
     """
+    return research_cache.fetch(
+        "wikipedia", f"{normalize_topic(topic)}|{sentences}",
+        lambda: _fetch_wikipedia_content(topic, sentences), ""
+    )
+
+
+def _fetch_wikipedia_content(topic: str, sentences: int) -> str:
+    import wikipedia
     content = ""
     try:
+        rate_limiter.wait("wikipedia.org")
         # Auto-suggest finds closest matching article
-        page = wikipedia.page(topic, auto_suggest=True)
-        content = wikipedia.summary(topic, sentences=sentences)
-        print(f"[WebResearcher] Wikipedia content fetched: {page.title}")
+        content = wikipedia.summary(topic, sentences=sentences, auto_suggest=True)
+        log.info(f"Wikipedia content fetched for: {topic}")
     except wikipedia.exceptions.DisambiguationError as e:
         # If topic is ambiguous, take the first option
         try:
-            content = wikipedia.summary(e.options[0], sentences=sentences)
-            print(f"[WebResearcher] Disambiguation resolved to: {e.options[0]}")
+            rate_limiter.wait("wikipedia.org")
+            content = wikipedia.summary(e.options[0], sentences=sentences, auto_suggest=False)
+            log.info(f"Disambiguation resolved to: {e.options[0]}")
         except Exception:
-            print("[WebResearcher] Wikipedia disambiguation failed.")
+            log.warning("Wikipedia disambiguation failed.")
     except wikipedia.exceptions.PageError:
-        print(f"[WebResearcher] No Wikipedia page found for: {topic}")
+        log.warning(f"No Wikipedia page found for: {topic}")
     except Exception as e:
-        print(f"[WebResearcher] Wikipedia error: {e}")
+        log.warning(f"Wikipedia error: {e}")
     return content
 
 
-def build_research_content(topic: str) -> str:
+_SCRIPT_RE = re.compile(r"<(script|style|noscript|header|footer|nav)\b.*?</\1>", re.S | re.I)
+_TAG_RE = re.compile(r"<[^>]+>")
+_BLANK_RE = re.compile(r"\n\s*\n+")
+_SPACE_RE = re.compile(r"[ \t\r\f\v]+")
+
+
+def extract_page_text(html: str) -> str:
+    """Readable text from an HTML page — scripts/navigation dropped, tags stripped."""
+    text = _SCRIPT_RE.sub(" ", html)
+    text = re.sub(r"<(br|/p|/div|/li|/h[1-6])\b[^>]*>", "\n", text, flags=re.I)
+    text = unescape(_TAG_RE.sub(" ", text))
+    text = _SPACE_RE.sub(" ", text)
+    return _BLANK_RE.sub("\n\n", text).strip()
+
+
+def fetch_page_text(url: str, timeout: float) -> str:
+    """Download one result URL and extract its text (capped at RESEARCH_PAGE_CHARS)."""
+    return research_cache.fetch("page", url, lambda: _fetch_page_text(url, timeout), "")
+
+
+def _fetch_page_text(url: str, timeout: float) -> str:
+    try:
+        import requests
+        rate_limiter.wait(urlparse(url).netloc)
+        response = requests.get(url, timeout=timeout, headers={"User-Agent": USER_AGENT})
+        response.raise_for_status()
+        if "html" not in response.headers.get("Content-Type", "html"):
+            return ""
+        return extract_page_text(response.text)[:RESEARCH_PAGE_CHARS]
+    except Exception as e:
+        log.warning(f"Page fetch failed for {url}: {e}")
+        return ""
+
+
+def _result(future, default):
+    """Value of a finished future, or default if it is unfinished or failed."""
+    if not future.done():
+        return default
+    try:
+        return future.result()
+    except Exception:
+        return default
+
+
+def build_research_content(topic: str, fetch_pages: Optional[bool] = None,
+                           time_budget: float = RESEARCH_TIME_BUDGET) -> str:
     """
     Combines DuckDuckGo snippets + Wikipedia into
     one rich text body for the given topic.
+    Wikipedia and DuckDuckGo run in parallel; with fetch_pages the top result
+    URLs are downloaded concurrently too. Anything not finished when the
+    time budget runs out is left out.
     """
-    full_content = f"RESEARCH TOPIC: {topic}\n\n"
+    if fetch_pages is None:
+        fetch_pages = RESEARCH_FETCH_PAGES
+    deadline = time.monotonic() + time_budget
+    pool = ThreadPoolExecutor(max_workers=RESEARCH_MAX_WORKERS, thread_name_prefix="research")
+
+    try:
+        log.info("Fetching Wikipedia + DuckDuckGo in parallel...")
+        wiki_future = pool.submit(run_in_context(fetch_wikipedia_content), topic)
+        ddg_future = pool.submit(run_in_context(search_duckduckgo), topic, 5)
+
+        # Page fetches can only start once search results exist
+        wait([ddg_future], timeout=max(deadline - time.monotonic(), 0))
+        ddg_results = _result(ddg_future, [])
+
+        page_futures = {}
+        if fetch_pages and ddg_results:
+            for result in ddg_results[:RESEARCH_FETCH_TOP_N]:
+                remaining = deadline - time.monotonic()
+                if result["url"] and remaining > 0:
+                    page_futures[result["url"]] = pool.submit(run_in_context(fetch_page_text),
+                                                              result["url"], remaining)
+
+        wait([wiki_future, *page_futures.values()], timeout=max(deadline - time.monotonic(), 0))
+        wiki_content = _result(wiki_future, "")
+        pages = {url: _result(f, "") for url, f in page_futures.items()}
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    parts = [f"RESEARCH TOPIC: {topic}\n\n"]
 
     # Wikipedia gives deep structured knowledge
-    print("[WebResearcher] Fetching Wikipedia content...")
-    wiki_content = fetch_wikipedia_content(topic)
     if wiki_content:
-        full_content += f"=== Wikipedia ===\n{wiki_content}\n\n"
+        parts.append(f"=== Wikipedia ===\n{wiki_content}\n\n")
 
     # DuckDuckGo gives recent/diverse web snippets
-    print("[WebResearcher] Searching DuckDuckGo...")
-    ddg_results = search_duckduckgo(topic, max_results=5)
     if ddg_results:
-        full_content += "=== Web Search Results ===\n"
+        parts.append("=== Web Search Results ===\n")
         for i, result in enumerate(ddg_results):
-            full_content += f"\n[Source {i+1}] {result['title']}\n"
-            full_content += f"URL: {result['url']}\n"
-            full_content += f"{result['snippet']}\n"
-            time.sleep(0.5)  # polite delay between requests
+            parts.append(f"\n[Source {i+1}] {result['title']}\n")
+            parts.append(f"URL: {result['url']}\n")
+            parts.append(f"{result['snippet']}\n")
+            if pages.get(result["url"]):
+                parts.append(f"\n{pages[result['url']]}\n")
 
-    print(f"[WebResearcher] Total content length: {len(full_content)} characters.")
+    full_content = "".join(parts)
+    log.info(f"Total content length: {len(full_content)} characters.")
     return full_content
 
 
@@ -103,22 +238,25 @@ def research_topic(topic: str) -> Dict:
     Returns:
         {
             "topic": "Quantum Computing",
+            "text": "...",      # the combined research text the chunks were cut from
             "chunks": ["chunk1...", "chunk2...", ...],
             "metadata": [{"text": "...", "source": "web_research", "topic": "Quantum Computing", "chunk_id": 0}, ...]
         }
     """
-    print(f"[WebResearcher] Starting research on: {topic}")
+    log.info(f"Starting research on: {topic}")
 
     # Build combined content from all sources
-    raw_content = build_research_content(topic)
+    with span("research.fetch"):
+        raw_content = build_research_content(topic)
 
     if not raw_content.strip():
-        print("[WebResearcher] No content found for topic.")
+        log.warning("No content found for topic.")
         return {}
 
-    # Chunk the content
-    chunks = text_splitter.split_text(raw_content)
-    print(f"[WebResearcher] Created {len(chunks)} chunks from research.")
+    # Chunk the content — same span chunker and settings as document_processor
+    with span("chunk"):
+        chunks = split_text(raw_content)
+    log.info(f"Created {len(chunks)} chunks from research.")
 
     # Build metadata
     metadata = [
@@ -133,6 +271,7 @@ def research_topic(topic: str) -> Dict:
 
     return {
         "topic": topic,
+        "text": raw_content,
         "chunks": chunks,
         "metadata": metadata
-    }
\ No newline at end of file
+    }